@@ -1,21 +1,30 @@
+import asyncio
 import base64
 from datetime import datetime
-from typing import Optional
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
 
 from fastapi import APIRouter, Body, Form, HTTPException, Path, Query, Request, UploadFile
 from starlette.datastructures import UploadFile as StarletteUploadFile
 from pydantic import BaseModel, Field
 
-from core.bazi_advanced import get_advanced_analysis
-from core.bazi_core import BaZiChart
-from core.consult.summarizers import generate_simple_analysis
+from core.charts import build_bazi_result
 from core.decision.kernel import build_visual_rule_scores
 from core.llm_helper import llm_helper
 from core.qimen import divine_qimen
 from core.zeri import get_today_fortune
 
 from .bazi import BaZiRequest
-from .common import AI_RUNTIME_STATE, mark_ai_failure, mark_ai_success, success_response
+from .common import (
+    AI_RUNTIME_STATE,
+    error_payload,
+    mark_ai_failure,
+    mark_ai_success,
+    run_compute,
+    sse_event,
+    sse_response,
+    success_payload,
+    success_response,
+)
 from .divination import LiuYaoRequest, QiMenRequest, get_liuyao_question, get_qimen_payload
 from .divination import divine as liuyao_divine
 
@@ -28,6 +37,124 @@ class AIChatRequest(BaseModel):
     context: Optional[str] = Field("", max_length=2000)
 
 
+def resolve_chat_input(
+    question: Optional[str],
+    context: Optional[str],
+    payload: Optional[AIChatRequest],
+) -> Tuple[str, str]:
+    body_question = payload.question.strip() if payload and payload.question else ""
+    body_context = payload.context if payload else ""
+    final_question = (question or body_question).strip()
+    final_context = context if context is not None else body_context
+
+    if not final_question:
+        raise HTTPException(
+            status_code=422,
+            detail={
+                "code": "missing_question",
+                "message": "question 不能为空",
+                "retryable": False,
+            },
+        )
+
+    if not llm_helper.is_available():
+        raise HTTPException(
+            status_code=503,
+            detail={
+                "code": "ai_unconfigured",
+                "message": "AI服务未配置，请设置ARK_API_KEY环境变量",
+                "retryable": False,
+            },
+        )
+    return final_question, final_context or ""
+
+
+async def iter_enhancement_events(
+    request: Request,
+    result: Dict[str, Any],
+    field: str,
+    chunks: AsyncIterator[str],
+    failure_label: str,
+) -> AsyncIterator[str]:
+    """AI 增强的 SSE 事件流：base（基础盘）→ delta*（增量文本）→ done（完整 success_payload 外壳）；上游中途失败时以 error 事件结束。"""
+    yield sse_event("base", result)
+
+    ai_enabled = llm_helper.is_available()
+    ai_enhanced = False
+    ai_message = "AI服务未配置，已返回基础解读"
+
+    if ai_enabled:
+        pieces = []
+        try:
+            async for text in chunks:
+                pieces.append(text)
+                yield sse_event("delta", {"text": text})
+        except Exception:
+            # 已发出的 delta 只是半截文本，不能当作增强成功收尾
+            mark_ai_failure("enhancement_stream_interrupted")
+            yield sse_event("error", error_payload(request, "ai_upstream_error", "AI服务中断，已返回基础解读", True))
+            return
+        content = "".join(pieces).strip()
+        if content:
+            result[field] = content
+            ai_enhanced = True
+            ai_message = ""
+            mark_ai_success()
+        else:
+            ai_message = "AI服务暂时不可用，已返回基础解读"
+            mark_ai_failure(failure_label)
+
+    result["ai"] = {
+        "enabled": ai_enabled,
+        "enhanced": ai_enhanced,
+        "message": ai_message,
+    }
+    yield sse_event(
+        "done",
+        success_payload(
+            result,
+            request=request,
+            ai_enabled=ai_enabled,
+            ai_enhanced=ai_enhanced,
+            ai_message=ai_message,
+        ),
+    )
+
+
+async def iter_chat_events(request: Request, question: str, context: str) -> AsyncIterator[str]:
+    """AI 对话的 SSE 事件流：start → delta* → done；上游无输出或中途失败时以 error 事件结束。"""
+    yield sse_event("start", {"question": question, "context": context})
+
+    pieces = []
+    try:
+        async for text in llm_helper.astream_chat(question, context if context else None):
+            pieces.append(text)
+            yield sse_event("delta", {"text": text})
+    except Exception:
+        mark_ai_failure("chat_stream_interrupted")
+        yield sse_event("error", error_payload(request, "ai_upstream_error", "AI服务中断，请稍后重试", True))
+        return
+
+    answer = "".join(pieces).strip()
+    if not answer:
+        mark_ai_failure("chat_empty_response")
+        yield sse_event("error", error_payload(request, "ai_upstream_empty", "AI服务暂时不可用", True))
+        return
+
+    mark_ai_success()
+    yield sse_event(
+        "done",
+        success_payload(
+            {
+                "question": question,
+                "answer": answer,
+                "context": context,
+            },
+            request=request,
+        ),
+    )
+
+
 @router.post("/api/ai/visual-insight")
 async def ai_visual_insight(
     request: Request,
@@ -96,19 +223,22 @@ async def ai_visual_insight(
             ))
             image_names.append(uploaded.filename or "uploaded-image")
 
-        structure = llm_helper.extract_visual_structure(
-            image_data_urls=image_data_urls,
-            mode=normalized_mode,
-            question=question,
-            location=location,
-            scene_type=scene_type,
-        )
-        analysis = llm_helper.analyze_visual_insight(
-            image_data_urls=image_data_urls,
-            mode=normalized_mode,
-            question=question,
-            location=location,
-            scene_type=scene_type,
+        # 结构提取与文字分析互不依赖，并发请求
+        structure, analysis = await asyncio.gather(
+            llm_helper.aextract_visual_structure(
+                image_data_urls=image_data_urls,
+                mode=normalized_mode,
+                question=question,
+                location=location,
+                scene_type=scene_type,
+            ),
+            llm_helper.aanalyze_visual_insight(
+                image_data_urls=image_data_urls,
+                mode=normalized_mode,
+                question=question,
+                location=location,
+                scene_type=scene_type,
+            ),
         )
         if not analysis:
             mark_ai_failure("visual_insight_empty")
@@ -164,13 +294,13 @@ async def ai_enhance_liuyao(
 ):
     """AI增强六爻占卜"""
     try:
-        result = liuyao_divine(get_liuyao_question(question, payload))
+        result = await run_compute(liuyao_divine, get_liuyao_question(question, payload))
         ai_enabled = llm_helper.is_available()
         ai_enhanced = False
         ai_message = "AI服务未配置，已返回基础解读"
 
         if ai_enabled:
-            ai_interpretation = llm_helper.enhance_liuyao_interpretation(result)
+            ai_interpretation = await llm_helper.aenhance_liuyao_interpretation(result)
             if ai_interpretation:
                 result["ai_interpretation"] = ai_interpretation
                 ai_enhanced = True
@@ -192,9 +322,55 @@ async def ai_enhance_liuyao(
             ai_enhanced=ai_enhanced,
             ai_message=ai_message,
         )
+    except HTTPException:
+        raise
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=f"占卜错误: {str(exc)}")
+
+
+@router.post("/api/ai/enhance-liuyao/stream")
+async def ai_enhance_liuyao_stream(
+    request: Request,
+    question: Optional[str] = Query(None, max_length=500),
+    payload: Optional[LiuYaoRequest] = Body(default=None),
+):
+    """AI增强六爻占卜（SSE 流式）"""
+    try:
+        result = await run_compute(liuyao_divine, get_liuyao_question(question, payload))
+    except HTTPException:
+        raise
     except Exception as exc:
         raise HTTPException(status_code=500, detail=f"占卜错误: {str(exc)}")
 
+    return sse_response(
+        iter_enhancement_events(
+            request,
+            result,
+            "ai_interpretation",
+            llm_helper.astream_enhance_liuyao_interpretation(result),
+            "enhance_liuyao_empty",
+        )
+    )
+
+
+async def compute_qimen_base(final_payload: QiMenRequest) -> Dict[str, Any]:
+    datetime(
+        final_payload.year,
+        final_payload.month,
+        final_payload.day,
+        final_payload.hour,
+        final_payload.minute,
+    )
+    return await run_compute(
+        divine_qimen,
+        final_payload.year,
+        final_payload.month,
+        final_payload.day,
+        final_payload.hour,
+        final_payload.minute,
+        final_payload.matter_type,
+    )
+
 
 @router.post("/api/ai/enhance-qimen")
 async def ai_enhance_qimen(
@@ -210,27 +386,13 @@ async def ai_enhance_qimen(
     """AI增强奇门遁甲占卜"""
     try:
         final_payload = get_qimen_payload(year, month, day, hour, minute, matter_type, payload)
-        datetime(
-            final_payload.year,
-            final_payload.month,
-            final_payload.day,
-            final_payload.hour,
-            final_payload.minute,
-        )
-        result = divine_qimen(
-            final_payload.year,
-            final_payload.month,
-            final_payload.day,
-            final_payload.hour,
-            final_payload.minute,
-            final_payload.matter_type,
-        )
+        result = await compute_qimen_base(final_payload)
         ai_enabled = llm_helper.is_available()
         ai_enhanced = False
         ai_message = "AI服务未配置，已返回基础解读"
 
         if ai_enabled:
-            ai_interpretation = llm_helper.enhance_qimen_interpretation(result, final_payload.matter_type)
+            ai_interpretation = await llm_helper.aenhance_qimen_interpretation(result, final_payload.matter_type)
             if ai_interpretation:
                 result["ai_interpretation"] = ai_interpretation
                 ai_enhanced = True
@@ -260,6 +422,39 @@ async def ai_enhance_qimen(
         raise HTTPException(status_code=500, detail=f"占卜错误: {str(exc)}")
 
 
+@router.post("/api/ai/enhance-qimen/stream")
+async def ai_enhance_qimen_stream(
+    request: Request,
+    year: Optional[int] = Query(None, ge=1900, le=2100),
+    month: Optional[int] = Query(None, ge=1, le=12),
+    day: Optional[int] = Query(None, ge=1, le=31),
+    hour: Optional[int] = Query(None, ge=0, le=23),
+    minute: Optional[int] = Query(None, ge=0, le=59),
+    matter_type: Optional[str] = Query(None, min_length=1, max_length=20),
+    payload: Optional[QiMenRequest] = Body(default=None),
+):
+    """AI增强奇门遁甲占卜（SSE 流式）"""
+    try:
+        final_payload = get_qimen_payload(year, month, day, hour, minute, matter_type, payload)
+        result = await compute_qimen_base(final_payload)
+    except HTTPException:
+        raise
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"日期格式错误: {str(exc)}")
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=f"占卜错误: {str(exc)}")
+
+    return sse_response(
+        iter_enhancement_events(
+            request,
+            result,
+            "ai_interpretation",
+            llm_helper.astream_enhance_qimen_interpretation(result, final_payload.matter_type),
+            "enhance_qimen_empty",
+        )
+    )
+
+
 @router.post("/api/ai/chat")
 async def ai_chat(
     request: Request,
@@ -269,32 +464,8 @@ async def ai_chat(
 ):
     """AI对话接口"""
     try:
-        body_question = payload.question.strip() if payload and payload.question else ""
-        body_context = payload.context if payload else ""
-        final_question = (question or body_question).strip()
-        final_context = context if context is not None else body_context
-
-        if not final_question:
-            raise HTTPException(
-                status_code=422,
-                detail={
-                    "code": "missing_question",
-                    "message": "question 不能为空",
-                    "retryable": False,
-                },
-            )
-
-        if not llm_helper.is_available():
-            raise HTTPException(
-                status_code=503,
-                detail={
-                    "code": "ai_unconfigured",
-                    "message": "AI服务未配置，请设置ARK_API_KEY环境变量",
-                    "retryable": False,
-                },
-            )
-
-        response = llm_helper.chat(final_question, final_context if final_context else None)
+        final_question, final_context = resolve_chat_input(question, context, payload)
+        response = await llm_helper.achat(final_question, final_context if final_context else None)
         if not response:
             mark_ai_failure("chat_empty_response")
             raise HTTPException(
@@ -322,28 +493,42 @@ async def ai_chat(
         raise HTTPException(status_code=500, detail=f"对话错误: {str(exc)}")
 
 
+@router.post("/api/ai/chat/stream")
+async def ai_chat_stream(
+    request: Request,
+    question: Optional[str] = Query(None, min_length=1, max_length=500),
+    context: Optional[str] = Query(None, max_length=2000),
+    payload: Optional[AIChatRequest] = Body(default=None),
+):
+    """AI对话接口（SSE 流式，长度截断时在同一流内续写）"""
+    final_question, final_context = resolve_chat_input(question, context, payload)
+    return sse_response(iter_chat_events(request, final_question, final_context))
+
+
+async def compute_bazi_base(payload: BaZiRequest) -> Dict[str, Any]:
+    datetime(payload.year, payload.month, payload.day, payload.hour, payload.minute)
+    return await run_compute(
+        build_bazi_result,
+        payload.year,
+        payload.month,
+        payload.day,
+        payload.hour,
+        payload.minute,
+        payload.gender,
+    )
+
+
 @router.post("/api/ai/enhance-bazi")
 async def ai_enhance_bazi(payload: BaZiRequest, request: Request):
     """AI增强八字分析"""
     try:
-        datetime(payload.year, payload.month, payload.day, payload.hour, payload.minute)
-        chart = BaZiChart(
-            payload.year,
-            payload.month,
-            payload.day,
-            payload.hour,
-            payload.minute,
-            payload.gender,
-        )
-        result = chart.to_dict()
-        result["analysis"] = generate_simple_analysis(chart)
-        result["advanced_analysis"] = get_advanced_analysis(chart)
+        result = await compute_bazi_base(payload)
         ai_enabled = llm_helper.is_available()
         ai_enhanced = False
         ai_message = "AI服务未配置，已返回基础解读"
 
         if ai_enabled:
-            ai_analysis = llm_helper.enhance_bazi_analysis(result)
+            ai_analysis = await llm_helper.aenhance_bazi_analysis(result)
             if ai_analysis:
                 result["ai_analysis"] = ai_analysis
                 ai_enhanced = True
@@ -365,12 +550,37 @@ async def ai_enhance_bazi(payload: BaZiRequest, request: Request):
             ai_enhanced=ai_enhanced,
             ai_message=ai_message,
         )
+    except HTTPException:
+        raise
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=f"日期格式错误: {str(exc)}")
     except Exception as exc:
         raise HTTPException(status_code=500, detail=f"计算错误: {str(exc)}")
 
 
+@router.post("/api/ai/enhance-bazi/stream")
+async def ai_enhance_bazi_stream(payload: BaZiRequest, request: Request):
+    """AI增强八字分析（SSE 流式）"""
+    try:
+        result = await compute_bazi_base(payload)
+    except HTTPException:
+        raise
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"日期格式错误: {str(exc)}")
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=f"计算错误: {str(exc)}")
+
+    return sse_response(
+        iter_enhancement_events(
+            request,
+            result,
+            "ai_analysis",
+            llm_helper.astream_enhance_bazi_analysis(result),
+            "enhance_bazi_empty",
+        )
+    )
+
+
 @router.get("/api/ai/status")
 async def ai_status(request: Request):
     """检查AI服务状态"""
@@ -393,6 +603,7 @@ async def ai_status(request: Request):
             "message": message,
             "last_error": AI_RUNTIME_STATE["last_error"],
             "last_error_at": AI_RUNTIME_STATE["last_error_at"],
+            "cache": llm_helper.cache.stats(),
         },
         request=request,
     )
@@ -408,6 +619,16 @@ async def ai_enhance_zeri_today(
     return await ai_enhance_zeri(request, today.year, today.month, today.day, purpose)
 
 
+@router.get("/api/ai/enhance-zeri/today/stream")
+async def ai_enhance_zeri_today_stream(
+    request: Request,
+    purpose: str = Query("通用", min_length=1, max_length=20),
+):
+    """获取服务端今日日期的AI增强择日分析（SSE 流式）"""
+    today = datetime.now()
+    return await ai_enhance_zeri_stream(request, today.year, today.month, today.day, purpose)
+
+
 @router.get("/api/ai/enhance-zeri/{year}/{month}/{day}")
 async def ai_enhance_zeri(
     request: Request,
@@ -418,13 +639,13 @@ async def ai_enhance_zeri(
 ):
     """AI增强择日分析"""
     try:
-        fortune = get_today_fortune(year, month, day)
+        fortune = await run_compute(get_today_fortune, year, month, day)
         ai_enabled = llm_helper.is_available()
         ai_enhanced = False
         ai_message = "AI服务未配置，已返回基础解读"
 
         if ai_enabled:
-            ai_advice = llm_helper.enhance_zeri_advice(fortune, purpose)
+            ai_advice = await llm_helper.aenhance_zeri_advice(fortune, purpose)
             if ai_advice:
                 fortune["ai_advice"] = ai_advice
                 ai_enhanced = True
@@ -446,7 +667,38 @@ async def ai_enhance_zeri(
             ai_enhanced=ai_enhanced,
             ai_message=ai_message,
         )
+    except HTTPException:
+        raise
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"日期格式错误: {str(exc)}")
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=f"计算错误: {str(exc)}")
+
+
+@router.get("/api/ai/enhance-zeri/{year}/{month}/{day}/stream")
+async def ai_enhance_zeri_stream(
+    request: Request,
+    year: int = Path(..., ge=1900, le=2100),
+    month: int = Path(..., ge=1, le=12),
+    day: int = Path(..., ge=1, le=31),
+    purpose: str = Query("通用", min_length=1, max_length=20),
+):
+    """AI增强择日分析（SSE 流式）"""
+    try:
+        fortune = await run_compute(get_today_fortune, year, month, day)
+    except HTTPException:
+        raise
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=f"日期格式错误: {str(exc)}")
     except Exception as exc:
         raise HTTPException(status_code=500, detail=f"计算错误: {str(exc)}")
+
+    return sse_response(
+        iter_enhancement_events(
+            request,
+            fortune,
+            "ai_advice",
+            llm_helper.astream_enhance_zeri_advice(fortune, purpose),
+            "enhance_zeri_empty",
+        )
+    )
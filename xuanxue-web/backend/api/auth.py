@@ -4,11 +4,13 @@ from fastapi import APIRouter, HTTPException, Query, Request
 from pydantic import BaseModel, Field, model_validator
 
 from core.auth import (
+    check_login_rate_limit,
     delete_user_consult_preset,
     extract_token_from_request,
     login_user,
     list_user_consult_presets,
     logout_session,
+    password_executor,
     public_user,
     register_user,
     resolve_authenticated_user,
@@ -17,7 +19,7 @@ from core.auth import (
 )
 from core.consult_history import get_consult_history_detail, list_consult_history
 
-from .common import success_response
+from .common import run_on_executor, success_response
 
 
 router = APIRouter()
@@ -67,9 +69,16 @@ class ConsultPresetRequest(BaseModel):
     is_default: bool = False
 
 
+def _client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
 @router.post("/api/auth/register")
 async def auth_register(payload: RegisterRequest, request: Request):
-    result = register_user(
+    check_login_rate_limit(_client_ip(request))
+    result = await run_on_executor(
+        password_executor,
+        register_user,
         email=payload.email,
         password=payload.password,
         display_name=payload.display_name,
@@ -79,7 +88,8 @@ async def auth_register(payload: RegisterRequest, request: Request):
 
 @router.post("/api/auth/login")
 async def auth_login(payload: LoginRequest, request: Request):
-    result = login_user(email=payload.email, password=payload.password)
+    check_login_rate_limit(_client_ip(request), payload.email)
+    result = await run_on_executor(password_executor, login_user, email=payload.email, password=payload.password)
     return success_response(result, request=request)
 
 
@@ -101,7 +111,12 @@ async def auth_me(request: Request):
 @router.patch("/api/auth/profile")
 async def auth_profile_update(payload: ProfileUpdateRequest, request: Request):
     user = resolve_authenticated_user(request)
-    updated_user = update_user_account(str(user.get("user_id")), payload.model_dump(exclude_unset=True))
+    updates = payload.model_dump(exclude_unset=True)
+    if updates.get("new_password"):
+        # 改密码要做两次 PBKDF2，放到密码哈希线程池
+        updated_user = await run_on_executor(password_executor, update_user_account, str(user.get("user_id")), updates)
+    else:
+        updated_user = update_user_account(str(user.get("user_id")), updates)
     return success_response({"user": updated_user}, request=request)
 
 
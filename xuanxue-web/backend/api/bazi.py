@@ -1,15 +1,17 @@
+import json
 from datetime import datetime
+from typing import Iterator, List
 
 from fastapi import APIRouter, HTTPException, Path, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field, field_validator
 
-from core.bazi_advanced import get_advanced_analysis
-from core.bazi_core import BaZiChart
+from core.bazi_core import compute_pillars_batch
 from core.calendar import lunar_to_solar, solar_to_lunar
-from core.consult.summarizers import generate_simple_analysis
+from core.charts import build_bazi_result
 from core.ganzhi import get_year_ganzhi
 
-from .common import success_response
+from .common import resolve_projection, run_compute, success_response
 
 
 router = APIRouter()
@@ -31,6 +33,16 @@ class BaZiRequest(BaseModel):
         return value
 
 
+class BaZiBatchRequest(BaseModel):
+    births: List[BaZiRequest] = Field(..., min_length=1, max_length=50000)
+
+
+BATCH_CHUNK_SIZE = 1000
+
+# view=compact 时省略的子树（计算过程与进阶分析）
+BAZI_COMPACT_EXCLUDE = ("calc_trace", "advanced_analysis")
+
+
 class CalendarRequest(BaseModel):
     year: int = Field(..., ge=1900, le=2100)
     month: int = Field(..., ge=1, le=12)
@@ -47,24 +59,70 @@ async def calculate_bazi(payload: BaZiRequest, request: Request):
     try:
         datetime(payload.year, payload.month, payload.day, payload.hour, payload.minute)
 
-        chart = BaZiChart(
+        projection = resolve_projection(request, BAZI_COMPACT_EXCLUDE)
+        result = await run_compute(
+            build_bazi_result,
             payload.year,
             payload.month,
             payload.day,
             payload.hour,
             payload.minute,
             payload.gender,
+            projection.includes("calc_trace"),
+            projection.includes("advanced_analysis"),
         )
-        result = chart.to_dict()
-        result["analysis"] = generate_simple_analysis(chart)
-        result["advanced_analysis"] = get_advanced_analysis(chart)
-        return success_response(result, request=request)
+        return success_response(result, request=request, projection=projection)
+    except HTTPException:
+        raise
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=f"日期格式错误: {str(exc)}")
     except Exception as exc:
         raise HTTPException(status_code=500, detail=f"计算错误: {str(exc)}")
 
 
+def iter_bazi_batch_lines(births: List[BaZiRequest]) -> Iterator[str]:
+    """按块批量排盘并逐行输出 NDJSON，每行沿用 success / error 外壳。"""
+    for chunk_start in range(0, len(births), BATCH_CHUNK_SIZE):
+        chunk = births[chunk_start:chunk_start + BATCH_CHUNK_SIZE]
+        pillars = compute_pillars_batch(
+            (item.year, item.month, item.day, item.hour, item.minute) for item in chunk
+        )
+        lines = []
+        for offset, (item, result) in enumerate(zip(chunk, pillars)):
+            index = chunk_start + offset
+            if "error" in result:
+                line = {
+                    "index": index,
+                    "success": False,
+                    "error": {
+                        "code": "bad_request",
+                        "message": f"日期格式错误: {result['error']}",
+                        "retryable": False,
+                    },
+                }
+            else:
+                line = {
+                    "index": index,
+                    "success": True,
+                    "data": {
+                        "gender": item.gender,
+                        "bazi": result,
+                    },
+                }
+            lines.append(json.dumps(line, ensure_ascii=False) + "\n")
+        yield "".join(lines)
+
+
+@router.post("/api/bazi/batch")
+async def calculate_bazi_batch(payload: BaZiBatchRequest, request: Request):
+    """批量八字四柱（NDJSON 流式输出，每行对应一条出生记录）"""
+    return StreamingResponse(
+        iter_bazi_batch_lines(payload.births),
+        media_type="application/x-ndjson",
+        headers={"x-batch-count": str(len(payload.births))},
+    )
+
+
 @router.post("/api/calendar/solar-to-lunar")
 async def convert_solar_to_lunar(payload: CalendarRequest, request: Request):
     """阳历转农历"""
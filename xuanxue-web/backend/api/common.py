@@ -1,13 +1,23 @@
+import json
+import math
 from datetime import datetime, timezone
 from os import getenv
-from typing import Any, Dict, Optional
+from typing import Any, AsyncIterator, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
 from uuid import uuid4
 
 from fastapi import HTTPException, Request
 from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from core.runtime.executor import ComputeExecutor, ComputeSaturatedError, compute_executor
+from core.runtime.store import RuntimeLockTimeout
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 未安装时回退标准库
+    orjson = None
 
 
 SCHEMA_VERSION = "1.1"
@@ -18,6 +28,47 @@ AI_RUNTIME_STATE = {
 }
 
 
+def _json_default(value: Any) -> Any:
+    # orjson 不认识的类型（pydantic 模型、set、Decimal 等）交给 jsonable_encoder
+    return jsonable_encoder(value)
+
+
+def _null_non_finite(value: Any) -> Any:
+    # 与 orjson 一致：NaN / Infinity 输出为 null
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: _null_non_finite(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_null_non_finite(item) for item in value]
+    return value
+
+
+def dumps_json(content: Any) -> bytes:
+    """
+    响应 JSON 编码：优先 orjson（原生处理 dict / list / dataclass / datetime），失败或缺失时走标准库。
+    两条路径对非有限浮点数的处理相同，都输出 null。
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(content, default=_json_default, option=orjson.OPT_NON_STR_KEYS)
+        except (TypeError, orjson.JSONEncodeError):
+            pass
+    return json.dumps(
+        _null_non_finite(jsonable_encoder(content)),
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """所有路由的默认响应类；success_response 直接返回它，跳过 FastAPI 的 jsonable_encoder 预处理。"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps_json(content)
+
+
 def build_meta(request: Optional[Request] = None) -> Dict[str, Any]:
     """统一返回元信息，便于追踪与解析。"""
     request_id = None
@@ -32,17 +83,101 @@ def build_meta(request: Optional[Request] = None) -> Dict[str, Any]:
     }
 
 
-def success_response(data: Any, request: Optional[Request] = None, **extra_fields: Any) -> Dict[str, Any]:
-    """统一成功响应外壳。"""
+FieldPath = Tuple[str, ...]
+
+
+class ResponseProjection(NamedTuple):
+    """响应裁剪：fields 为保留的点分路径（None 表示全部），exclude 为 view=compact 时剔除的路径。"""
+
+    fields: Optional[Tuple[FieldPath, ...]] = None
+    exclude: Tuple[FieldPath, ...] = ()
+
+    @property
+    def is_full(self) -> bool:
+        return self.fields is None and not self.exclude
+
+    def includes(self, path: str) -> bool:
+        """路径（或其子树的一部分）是否会出现在响应里，供路由决定是否跳过对应计算。"""
+        parts = tuple(path.split("."))
+        if any(parts[:len(item)] == item for item in self.exclude):
+            return False
+        if self.fields is None:
+            return True
+        return any(parts[:len(item)] == item or item[:len(parts)] == parts for item in self.fields)
+
+    def apply(self, data: Any) -> Any:
+        if self.is_full:
+            return data
+        return _prune(data, None if self.fields is None else list(self.fields), list(self.exclude))
+
+
+def _parse_paths(raw: str) -> Tuple[FieldPath, ...]:
+    """解析逗号分隔的点分路径；空段被忽略，只剩空段的路径（如 "." 或 ",,"）整条丢弃。"""
+    paths = (tuple(part for part in item.strip().split(".") if part) for item in raw.split(","))
+    return tuple(path for path in paths if path)
+
+
+def _prune(value: Any, include: Optional[List[FieldPath]], exclude: List[FieldPath]) -> Any:
+    # 列表按元素逐个裁剪，fields=days.score 保留每一天的 score
+    if isinstance(value, list):
+        return [_prune(item, include, exclude) for item in value]
+    if not isinstance(value, dict):
+        return value
+    pruned: Dict[str, Any] = {}
+    for key, child in value.items():
+        if (key,) in exclude:
+            continue
+        child_exclude = [path[1:] for path in exclude if path[0] == key and len(path) > 1]
+        if include is None:
+            child_include = None
+        else:
+            matched = [path for path in include if path[0] == key]
+            if not matched:
+                continue
+            child_include = None if any(len(path) == 1 for path in matched) else [path[1:] for path in matched]
+        pruned[key] = child if child_include is None and not child_exclude else _prune(child, child_include, child_exclude)
+    return pruned
+
+
+def resolve_projection(request: Optional[Request], compact_exclude: Sequence[str] = ()) -> ResponseProjection:
+    """读取 ?fields=a,b.c 与 ?view=compact|full；未知 view 按 full 处理。"""
+    if request is None:
+        return ResponseProjection()
+    raw_fields = request.query_params.get("fields")
+    view = (request.query_params.get("view") or "full").strip().lower()
+    fields = _parse_paths(raw_fields) if raw_fields and raw_fields.strip() else None
+    exclude = _parse_paths(",".join(compact_exclude)) if view == "compact" else ()
+    return ResponseProjection(fields=fields or None, exclude=exclude)
+
+
+def success_payload(
+    data: Any,
+    request: Optional[Request] = None,
+    projection: Optional[ResponseProjection] = None,
+    **extra_fields: Any,
+) -> Dict[str, Any]:
+    """统一成功响应外壳；按 fields / view 在编码前裁剪 data。SSE done 事件等需要 dict 的场景直接用它。"""
+    if projection is None:
+        projection = resolve_projection(request)
     payload: Dict[str, Any] = {
         "success": True,
-        "data": data,
+        "data": projection.apply(data),
         "meta": build_meta(request),
     }
     payload.update(extra_fields)
     return payload
 
 
+def success_response(
+    data: Any,
+    request: Optional[Request] = None,
+    projection: Optional[ResponseProjection] = None,
+    **extra_fields: Any,
+) -> FastJSONResponse:
+    """统一成功响应，直接编码为 FastJSONResponse。"""
+    return FastJSONResponse(success_payload(data, request=request, projection=projection, **extra_fields))
+
+
 def default_error_code(status_code: int) -> str:
     mapping = {
         400: "bad_request",
@@ -79,6 +214,27 @@ def normalize_error_detail(detail: Any, status_code: int) -> Dict[str, Any]:
     }
 
 
+def error_payload(
+    request: Optional[Request],
+    code: str,
+    message: str,
+    retryable: bool,
+    details: Any = None,
+) -> Dict[str, Any]:
+    """统一失败响应外壳（JSON 响应与 SSE error 事件共用）。"""
+    safe_details = jsonable_encoder(details) if details is not None else None
+    return {
+        "success": False,
+        "error": {
+            "code": code,
+            "message": message,
+            "retryable": retryable,
+            "details": safe_details,
+        },
+        "meta": build_meta(request),
+    }
+
+
 def error_response(
     request: Request,
     status_code: int,
@@ -86,19 +242,28 @@ def error_response(
     message: str,
     retryable: bool,
     details: Any = None,
-) -> JSONResponse:
-    safe_details = jsonable_encoder(details) if details is not None else None
-    return JSONResponse(
+    headers: Optional[Dict[str, str]] = None,
+) -> FastJSONResponse:
+    return FastJSONResponse(
         status_code=status_code,
-        content={
-            "success": False,
-            "error": {
-                "code": code,
-                "message": message,
-                "retryable": retryable,
-                "details": safe_details,
-            },
-            "meta": build_meta(request),
+        headers=headers,
+        content=error_payload(request, code, message, retryable, details),
+    )
+
+
+def sse_event(event: str, data: Any) -> str:
+    """编码一条 server-sent event。"""
+    return f"event: {event}\ndata: {dumps_json(data).decode('utf-8')}\n\n"
+
+
+def sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    """SSE 流式响应；关闭代理缓冲，保证首字节尽快到达浏览器。"""
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
         },
     )
 
@@ -113,6 +278,28 @@ def mark_ai_success() -> None:
     AI_RUNTIME_STATE["last_error_at"] = None
 
 
+async def run_compute(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """把 CPU 密集的排盘 / 分析派发到计算执行器；排队已满时返回 429 + Retry-After。"""
+    return await run_on_executor(compute_executor, fn, *args, **kwargs)
+
+
+async def run_on_executor(executor: ComputeExecutor, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """run_compute 的通用版本，供有独立线程池的调用方（如密码哈希）使用。"""
+    try:
+        return await executor.run(fn, *args, **kwargs)
+    except ComputeSaturatedError as exc:
+        raise HTTPException(
+            status_code=429,
+            detail={
+                "code": "compute_saturated",
+                "message": "计算服务繁忙，请稍后重试",
+                "retryable": True,
+                "details": {"retry_after": exc.retry_after},
+            },
+            headers={"Retry-After": str(exc.retry_after)},
+        )
+
+
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     return error_response(
         request=request,
@@ -133,6 +320,19 @@ async def http_exception_handler(request: Request, exc: HTTPException):
         message=normalized["message"],
         retryable=normalized["retryable"],
         details=normalized["details"],
+        headers=getattr(exc, "headers", None),
+    )
+
+
+async def runtime_lock_timeout_handler(request: Request, exc: RuntimeLockTimeout):
+    return error_response(
+        request=request,
+        status_code=503,
+        code="storage_busy",
+        message="存储繁忙，请稍后重试",
+        retryable=True,
+        details={"timeout": exc.timeout},
+        headers={"Retry-After": "1"},
     )
 
 
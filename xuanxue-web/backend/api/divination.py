@@ -1,16 +1,18 @@
-from datetime import datetime
-from typing import Dict, Optional
+from datetime import date, datetime
+from typing import Dict, List, Optional
 
 from fastapi import APIRouter, Body, HTTPException, Path, Query, Request
 from pydantic import BaseModel, Field, field_validator
 
+from core.almanac_index import ACTIVITY_INDEX, search_auspicious_days
 from core.liuyao import divine
 from core.llm_helper import llm_helper
 from core.meihua import divine_meihua
 from core.qimen import divine_qimen, get_current_qimen
-from core.zeri import find_auspicious_days, get_today_fortune
+from core.zeshi import MATTER_TYPES, search_auspicious_hours
+from core.zeri import MAX_RANGE_DAYS, find_auspicious_days, get_today_fortune, scan_almanac
 
-from .common import mark_ai_failure, mark_ai_success, success_response
+from .common import mark_ai_failure, mark_ai_success, run_compute, success_response
 
 
 router = APIRouter()
@@ -129,8 +131,10 @@ async def liuyao_divination(
 ):
     """六爻占卜API"""
     try:
-        result = divine(get_liuyao_question(question, payload))
+        result = await run_compute(divine, get_liuyao_question(question, payload))
         return success_response(result, request=request)
+    except HTTPException:
+        raise
     except Exception as exc:
         raise HTTPException(status_code=500, detail=f"占卜错误: {str(exc)}")
 
@@ -146,12 +150,15 @@ async def meihua_divination(
     """梅花易数占卜 API"""
     try:
         final_payload = get_meihua_payload(question, method, numbers, payload)
-        result = divine_meihua(
+        result = await run_compute(
+            divine_meihua,
             question=final_payload.question or "",
             method=final_payload.method,
             numbers=final_payload.numbers,
         )
         return success_response(result, request=request)
+    except HTTPException:
+        raise
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=f"起卦参数错误: {str(exc)}")
     except Exception as exc:
@@ -179,7 +186,8 @@ async def qimen_divination(
             final_payload.hour,
             final_payload.minute,
         )
-        result = divine_qimen(
+        result = await run_compute(
+            divine_qimen,
             final_payload.year,
             final_payload.month,
             final_payload.day,
@@ -200,8 +208,10 @@ async def qimen_divination(
 async def get_current_qimen_api(request: Request, matter_type: str = Query("通用", min_length=1, max_length=20)):
     """获取当前时刻的奇门遁甲盘"""
     try:
-        result = get_current_qimen(matter_type)
+        result = await run_compute(get_current_qimen, matter_type)
         return success_response(result, request=request)
+    except HTTPException:
+        raise
     except Exception as exc:
         raise HTTPException(status_code=500, detail=f"占卜错误: {str(exc)}")
 
@@ -211,8 +221,10 @@ async def get_today_fortune_api(request: Request):
     """获取今日运势"""
     try:
         today = datetime.now()
-        fortune = get_today_fortune(today.year, today.month, today.day)
+        fortune = await run_compute(get_today_fortune, today.year, today.month, today.day)
         return success_response(fortune, request=request)
+    except HTTPException:
+        raise
     except Exception as exc:
         raise HTTPException(status_code=500, detail=f"计算错误: {str(exc)}")
 
@@ -226,8 +238,10 @@ async def get_date_fortune_api(
 ):
     """获取指定日期运势"""
     try:
-        fortune = get_today_fortune(year, month, day)
+        fortune = await run_compute(get_today_fortune, year, month, day)
         return success_response(fortune, request=request)
+    except HTTPException:
+        raise
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=f"日期格式错误: {str(exc)}")
     except Exception as exc:
@@ -244,7 +258,7 @@ async def find_auspicious_days_api(
 ):
     """查找吉日"""
     try:
-        auspicious_days = find_auspicious_days(year, month, purpose, days)
+        auspicious_days = await run_compute(find_auspicious_days, year, month, purpose, days)
         return success_response(
             {
                 "purpose": purpose,
@@ -253,7 +267,148 @@ async def find_auspicious_days_api(
             },
             request=request,
         )
+    except HTTPException:
+        raise
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=f"日期格式错误: {str(exc)}")
     except Exception as exc:
         raise HTTPException(status_code=500, detail=f"查找错误: {str(exc)}")
+
+
+def _bad_request(message: str) -> HTTPException:
+    return HTTPException(status_code=400, detail={"code": "bad_request", "message": message, "retryable": False})
+
+
+def _check_almanac_range(start: date, end: date) -> None:
+    if not (date(1900, 1, 1) <= start <= end <= date(2100, 12, 31)) or (end - start).days + 1 > MAX_RANGE_DAYS:
+        raise _bad_request(f"日期区间需在 1900-2100 年内、start 不晚于 end，且不超过 {MAX_RANGE_DAYS} 天")
+
+
+def _split_csv(raw: Optional[str]) -> List[str]:
+    items: List[str] = []
+    for item in (raw or "").replace("，", ",").split(","):
+        item = item.strip()
+        if item and item not in items:
+            items.append(item)
+    return items
+
+
+def _parse_purposes(raw: Optional[str]) -> List[str]:
+    purpose_list = _split_csv(raw)
+    unknown = [item for item in purpose_list if item != "通用" and item not in ACTIVITY_INDEX]
+    if unknown:
+        raise _bad_request(f"未知用途: {'、'.join(unknown)}")
+    return purpose_list
+
+
+def _parse_exclude(raw: Optional[str]) -> List[date]:
+    try:
+        return [date.fromisoformat(item) for item in _split_csv(raw)]
+    except ValueError:
+        raise _bad_request("exclude 需为 YYYY-MM-DD 日期，以逗号分隔")
+
+
+@router.get("/api/zeri/range")
+async def scan_almanac_range_api(
+    request: Request,
+    start: date = Query(...),
+    end: date = Query(...),
+    purpose: str = Query("通用", min_length=1, max_length=20),
+    limit: int = Query(10, ge=1, le=100),
+    min_score: int = Query(50, ge=0, le=100),
+):
+    """日期区间择日：返回区间内评分最高的 limit 个日子"""
+    _check_almanac_range(start, end)
+    try:
+        matched_count, days = await run_compute(scan_almanac, start, end, purpose, limit, min_score)
+        return success_response(
+            {
+                "purpose": purpose,
+                "start": start.isoformat(),
+                "end": end.isoformat(),
+                "scanned_days": (end - start).days + 1,
+                "matched_count": matched_count,
+                "days": days,
+            },
+            request=request,
+        )
+    except HTTPException:
+        raise
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=f"查找错误: {str(exc)}")
+
+
+@router.get("/api/zeri/search")
+async def search_auspicious_days_api(
+    request: Request,
+    start: date = Query(...),
+    end: date = Query(...),
+    purposes: str = Query("通用", max_length=200, description="逗号分隔，需同时满足，如 签约,出行"),
+    exclude: Optional[str] = Query(None, max_length=4000, description="逗号分隔的排除日期，如 2026-05-01,2026-05-02"),
+    limit: int = Query(10, ge=1, le=100),
+    min_score: int = Query(50, ge=0, le=100),
+):
+    """多用途区间择日：基于用途倒排索引的位图求交，支持排除指定日期"""
+    _check_almanac_range(start, end)
+    purpose_list = _parse_purposes(purposes) or ["通用"]
+    excluded = _parse_exclude(exclude)
+
+    try:
+        matched_count, days = await run_compute(
+            search_auspicious_days, start, end, purpose_list, excluded, limit, min_score
+        )
+        return success_response(
+            {
+                "purposes": purpose_list,
+                "start": start.isoformat(),
+                "end": end.isoformat(),
+                "excluded": sorted({item.isoformat() for item in excluded}),
+                "scanned_days": (end - start).days + 1,
+                "matched_count": matched_count,
+                "days": days,
+            },
+            request=request,
+        )
+    except HTTPException:
+        raise
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=f"查找错误: {str(exc)}")
+
+
+@router.get("/api/zeri/hours")
+async def search_auspicious_hours_api(
+    request: Request,
+    start: date = Query(...),
+    end: date = Query(...),
+    matter_type: str = Query("通用", min_length=1, max_length=20),
+    purposes: Optional[str] = Query(None, max_length=200, description="日级择日用途，逗号分隔；默认按事项类型推出"),
+    exclude: Optional[str] = Query(None, max_length=4000, description="逗号分隔的排除日期"),
+    limit: int = Query(10, ge=1, le=100),
+    min_day_score: int = Query(50, ge=0, le=100),
+):
+    """区间择时：综合日评分与各时辰奇门盘，返回前 limit 个 (日期, 时辰, 方位)"""
+    _check_almanac_range(start, end)
+    if matter_type not in MATTER_TYPES:
+        raise _bad_request(f"matter_type 需为 {'、'.join(MATTER_TYPES)} 之一")
+    purpose_list = _parse_purposes(purposes) or None
+    excluded = _parse_exclude(exclude)
+
+    try:
+        candidate_count, slots = await run_compute(
+            search_auspicious_hours, start, end, matter_type, purpose_list, excluded, limit, min_day_score
+        )
+        return success_response(
+            {
+                "matter_type": matter_type,
+                "start": start.isoformat(),
+                "end": end.isoformat(),
+                "scanned_days": (end - start).days + 1,
+                "candidate_count": candidate_count,
+                "slots": slots,
+            },
+            request=request,
+        )
+    except HTTPException:
+        raise
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail=f"查找错误: {str(exc)}")
@@ -1,10 +1,16 @@
+import hashlib
+from pathlib import Path
 from typing import Any, Dict, Optional
 
 from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel, Field, field_validator
 
-from core.auth import resolve_authenticated_user
+from core.auth import password_executor, resolve_authenticated_user
+from core.almanac_table import almanac_table_status
+from core.chart_cache import chart_cache
 from core.consult_history import append_consult_history
+from core.consult_trace import get_consult_trace, save_consult_trace_inputs
 from core.decision.weight_tuning import (
     DEFAULT_WEIGHT_PRESETS,
     read_weight_tuning_events,
@@ -12,13 +18,28 @@ from core.decision.weight_tuning import (
     resolve_effective_weight_presets,
 )
 from core.decision_log import append_feedback_log, read_recent_decision_logs
+from core.llm_helper import llm_helper
+from core.runtime.executor import ComputeExecutor, compute_executor
+from core.runtime.metrics import (
+    CONSULT_MODULE_SECONDS,
+    CONSULT_STAGE_SECONDS,
+    PrometheusWriter,
+    SpanRecorder,
+    observe_consult_timings,
+)
+from core.runtime.store import runtime_lock_stats
+from core.session_index import session_index
+from core.user_index import user_index
 from core.system_engine import UnifiedConsultRequest, consultation_engine
 
-from .common import success_response
+from .common import resolve_projection, run_compute, success_response
 
 
 router = APIRouter()
 
+# view=compact 时省略的子树：原始模块结果、统一世界模型与追溯图，保留结论、摘要与仲裁
+CONSULT_COMPACT_EXCLUDE = ("modules", "decision_kernel.world_model", "trace", "effective_weights")
+
 
 class DecisionFeedbackRequest(BaseModel):
     log_id: str = Field(..., min_length=1, max_length=100)
@@ -64,13 +85,32 @@ async def root(request: Request):
 
 
 @router.post("/api/system/consult")
-async def system_consult(payload: UnifiedConsultRequest, request: Request):
-    """统一玄学问事接口。"""
+async def system_consult(
+    payload: UnifiedConsultRequest,
+    request: Request,
+    timings: bool = Query(False, description="返回各阶段耗时"),
+    trace: bool = Query(False, description="内联返回完整追溯图"),
+):
+    """统一玄学问事接口；追溯图默认按需经 /api/system/consult/{history_id}/trace 获取。"""
     try:
         user = resolve_authenticated_user(request, required=True)
-        consultation = consultation_engine.consult(payload)
-        consultation["account_history"] = append_consult_history(str(user.get("user_id")), consultation)
-        return success_response(consultation, request=request)
+        user_id = str(user.get("user_id"))
+        projection = resolve_projection(request, CONSULT_COMPACT_EXCLUDE)
+        consultation = await run_compute(consultation_engine.consult, payload, trace and projection.includes("trace.steps"))
+        spans = SpanRecorder()
+        with spans.span("account_history"):
+            consultation["account_history"] = append_consult_history(user_id, consultation)
+        if consultation["trace"].get("deferred"):
+            history_id = consultation["account_history"]["history_id"]
+            with spans.span("trace_inputs"):
+                save_consult_trace_inputs(user_id, history_id, consultation)
+            consultation["trace"]["url"] = f"/api/system/consult/{history_id}/trace"
+        stage_timings = consultation.pop("timings", {})
+        stage_timings.setdefault("stages", {}).update(spans.to_dict()["stages"])
+        observe_consult_timings(stage_timings)
+        if timings:
+            consultation["timings"] = stage_timings
+        return success_response(consultation, request=request, projection=projection)
     except HTTPException:
         raise
     except ValueError as exc:
@@ -79,6 +119,16 @@ async def system_consult(payload: UnifiedConsultRequest, request: Request):
         raise HTTPException(status_code=500, detail=f"系统问事失败: {str(exc)}")
 
 
+@router.get("/api/system/consult/{history_id}/trace")
+async def system_consult_trace(history_id: str, request: Request):
+    """按需构建某次问事的追溯图（步骤 + Mermaid），首次构建后进程内缓存。"""
+    user = resolve_authenticated_user(request, required=True)
+    trace = await run_compute(get_consult_trace, str(user.get("user_id")), history_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail={"code": "not_found", "message": "未找到该问事的追溯记录", "retryable": False})
+    return success_response({"history_id": history_id, "trace": trace}, request=request)
+
+
 @router.post("/api/system/feedback")
 async def system_feedback(payload: DecisionFeedbackRequest, request: Request):
     """记录一次统一问事结果反馈，供后续复盘调参。"""
@@ -99,6 +149,75 @@ async def system_logs(request: Request, limit: int = Query(20, ge=1, le=200)):
         raise HTTPException(status_code=500, detail=f"日志读取失败: {str(exc)}")
 
 
+@router.get("/api/system/runtime")
+async def system_runtime(request: Request):
+    """读取计算执行器的排队深度、等待时间与拒绝计数，以及文件锁等待、会话 / 账号索引、排盘缓存与黄历表状态。"""
+    return success_response(
+        {
+            "compute_executor": compute_executor.stats(),
+            "password_executor": password_executor.stats(),
+            "file_locks": _public_lock_stats(),
+            "sessions": session_index.stats(),
+            "users": user_index.stats(),
+            # process 执行器下排盘缓存在各工作进程内，这里的计数不代表实际命中
+            "chart_cache": {**chart_cache.stats(), "worker_local": compute_executor.kind == "process"},
+            "almanac_table": almanac_table_status(),
+        },
+        request=request,
+    )
+
+
+def _public_lock_stats() -> Dict[str, Any]:
+    """按锁文件名而非绝对路径返回锁统计；不同目录下同名的锁文件附上路径摘要区分。"""
+    stats = runtime_lock_stats()
+    names = [Path(path).name for path in stats]
+    public: Dict[str, Any] = {}
+    for name, (path, entry) in zip(names, stats.items()):
+        if names.count(name) > 1:
+            name = f"{name}@{hashlib.sha1(path.encode('utf-8')).hexdigest()[:8]}"
+        public[name] = entry
+    return public
+
+
+def _write_executor_metrics(writer: PrometheusWriter, name: str, executor: ComputeExecutor) -> None:
+    stats = executor.stats()
+    labels = {"executor": name}
+    writer.histogram("xuanxue_executor_wait_seconds", "Time tasks spent queued before running.", stats["wait_seconds"], labels)
+    writer.histogram("xuanxue_executor_run_seconds", "Task run time on the executor.", stats["run_seconds"], labels)
+    writer.sample("xuanxue_executor_pending", "gauge", "Tasks queued or running.", stats["pending"], labels)
+    for counter in ("completed", "failed", "rejected"):
+        writer.sample(f"xuanxue_executor_{counter}_total", "counter", f"Tasks {counter} by the executor.", stats[counter], labels)
+
+
+def render_metrics() -> str:
+    writer = PrometheusWriter()
+    writer.family(CONSULT_STAGE_SECONDS)
+    writer.family(CONSULT_MODULE_SECONDS)
+    _write_executor_metrics(writer, "compute", compute_executor)
+    _write_executor_metrics(writer, "password", password_executor)
+    for lock, entry in _public_lock_stats().items():
+        for mode, snapshot in entry["wait_seconds"].items():
+            writer.histogram("xuanxue_file_lock_wait_seconds", "Time spent waiting for runtime file locks.", snapshot, {"lock": lock, "mode": mode})
+        writer.sample("xuanxue_file_lock_contended_total", "counter", "Lock acquisitions that had to wait.", entry["contended"], {"lock": lock})
+        writer.sample("xuanxue_file_lock_timeouts_total", "counter", "Lock acquisitions that timed out.", entry["timeouts"], {"lock": lock})
+    charts = chart_cache.stats()
+    writer.sample("xuanxue_chart_cache_entries", "gauge", "Charts held in the in-process chart cache.", charts["entries"])
+    for kind, counters in charts["kinds"].items():
+        for outcome in ("hits", "misses", "expired"):
+            writer.sample("xuanxue_chart_cache_lookups_total", "counter", "Chart cache lookups by outcome.", counters[outcome], {"kind": kind, "outcome": outcome})
+        writer.sample("xuanxue_chart_cache_evictions_total", "counter", "Charts evicted from the cache.", counters["evictions"], {"kind": kind})
+    cache = llm_helper.cache.stats()
+    for counter in ("memory_hits", "disk_hits", "misses"):
+        writer.sample("xuanxue_llm_cache_lookups_total", "counter", "LLM cache lookups by outcome.", cache[counter], {"outcome": counter})
+    return writer.render()
+
+
+@router.get("/api/system/metrics")
+async def system_metrics():
+    """Prometheus 文本格式的进程内指标：问事阶段耗时、执行器、文件锁与 LLM 缓存。"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
 @router.get("/api/system/weights")
 async def system_weights(request: Request):
     """读取当前默认权重、有效权重与最近调权事件。"""
@@ -3,9 +3,9 @@ from datetime import datetime
 from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel, Field, field_validator
 
-from core.ziwei import ZiWeiChart, analyze_ziwei_chart
+from core.charts import build_ziwei_result
 
-from .common import success_response
+from .common import run_compute, success_response
 
 
 router = APIRouter()
@@ -32,7 +32,8 @@ async def calculate_ziwei(payload: ZiWeiRequest, request: Request):
     """紫微斗数排盘 API。"""
     try:
         datetime(payload.year, payload.month, payload.day, payload.hour, payload.minute)
-        chart = ZiWeiChart(
+        result = await run_compute(
+            build_ziwei_result,
             payload.year,
             payload.month,
             payload.day,
@@ -40,9 +41,9 @@ async def calculate_ziwei(payload: ZiWeiRequest, request: Request):
             payload.minute,
             payload.gender,
         )
-        result = chart.to_dict()
-        result["analysis"] = analyze_ziwei_chart(result)
         return success_response(result, request=request)
+    except HTTPException:
+        raise
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=f"日期格式错误: {str(exc)}")
     except Exception as exc:
@@ -0,0 +1,73 @@
+"""
+区间择日基准测试
+Cost of a multi-month auspicious-day query: per-day DateSelection.analyze_day vs the cycle-table scan_almanac.
+
+用法（在 backend/ 目录下）：
+    python benchmarks/bench_almanac_range.py
+    python benchmarks/bench_almanac_range.py --months 18 --purpose 结婚 --limit 10
+"""
+
+import argparse
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from core.zeri import PURPOSE_KEYWORDS, WEEKDAY_NAMES, DateSelection, scan_almanac  # noqa: E402
+
+
+def _per_day_scan(start: date, end: date, purpose: str, limit: int):
+    """旧路径的区间版本：逐日构建 DateSelection + analyze_day，关键词逐日拼串匹配后全量排序。"""
+    keywords = PURPOSE_KEYWORDS.get(purpose, [])
+    results = []
+    day = start
+    while day <= end:
+        analysis = DateSelection(day.year, day.month, day.day).analyze_day()
+        if purpose != '通用' and keywords:
+            suitable = any(kw in ' '.join(analysis['suitable']) for kw in keywords)
+            avoid = any(kw in ' '.join(analysis['avoid']) for kw in keywords)
+            if avoid or (not suitable and analysis['score'] < 60):
+                day += timedelta(days=1)
+                continue
+        if analysis['score'] >= 50:
+            analysis['weekday'] = WEEKDAY_NAMES[day.weekday()]
+            results.append(analysis)
+        day += timedelta(days=1)
+    results.sort(key=lambda item: item['score'], reverse=True)
+    return results[:limit]
+
+
+def _best_of(repeat: int, fn, *args) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="区间择日耗时")
+    parser.add_argument("--months", type=int, default=18)
+    parser.add_argument("--purpose", default="结婚")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    start = date.today()
+    end = start + timedelta(days=round(args.months * 30.44) - 1)
+    legacy = _per_day_scan(start, end, args.purpose, args.limit)
+    _, fast = scan_almanac(start, end, args.purpose, args.limit)
+    assert legacy == fast, "scan_almanac 与逐日路径结果不一致"
+
+    per_day = _best_of(args.repeat, _per_day_scan, start, end, args.purpose, args.limit)
+    table = _best_of(args.repeat, scan_almanac, start, end, args.purpose, args.limit)
+    print(f"range: {start} ~ {end} ({(end - start).days + 1} days), purpose={args.purpose}, limit={args.limit}")
+    print(f"per-day analyze_day: {per_day * 1000:8.2f} ms")
+    print(f"scan_almanac:        {table * 1000:8.2f} ms  ({per_day / table:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+登录吞吐基准测试
+Concurrent /api/auth/login throughput and event-loop stall, hashing on the password pool vs inline.
+
+用法（在 backend/ 目录下）：
+    python benchmarks/bench_auth_login.py --users 20 --logins 200 --concurrency 32
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+TEMP_DIR = tempfile.TemporaryDirectory()
+os.environ.update({
+    "USER_STORE_PATH": TEMP_DIR.name + "/users.json",
+    "SESSION_STORE_PATH": TEMP_DIR.name + "/sessions.json",
+    # 基准只测哈希与线程池，关闭登录限流
+    "LOGIN_RATE_LIMIT_IP_BURST": "0",
+    "LOGIN_RATE_LIMIT_EMAIL_BURST": "0",
+})
+
+import httpx  # noqa: E402
+
+import api.auth  # noqa: E402
+import main  # noqa: E402
+
+
+async def _inline(executor, fn, *args, **kwargs):
+    return fn(*args, **kwargs)
+
+
+async def _watch_loop(stop: asyncio.Event, interval: float = 0.005) -> float:
+    """每 5ms 醒一次，记录事件循环最长卡顿。"""
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst
+
+
+async def _run(client: httpx.AsyncClient, users: int, logins: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    statuses = []
+
+    async def login(index: int) -> None:
+        async with semaphore:
+            resp = await client.post(
+                "/api/auth/login",
+                json={"email": f"bench{index % users}@example.com", "password": "password123"},
+            )
+            statuses.append(resp.status_code)
+
+    stop = asyncio.Event()
+    watcher = asyncio.create_task(_watch_loop(stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(login(index) for index in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    worst_stall = await watcher
+    if set(statuses) - {200, 429}:
+        raise SystemExit(f"unexpected statuses: {sorted(set(statuses))}")
+    return elapsed, worst_stall, statuses.count(200), statuses.count(429)
+
+
+async def _main(args) -> None:
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        for index in range(args.users):
+            resp = await client.post(
+                "/api/auth/register",
+                json={"email": f"bench{index}@example.com", "password": "password123"},
+            )
+            resp.raise_for_status()
+
+        pool = api.auth.password_executor
+        print(f"logins: {args.logins}  concurrency: {args.concurrency}  pool: {pool.workers} workers + {pool.max_queue} queued")
+        for label in ("inline", "password pool"):
+            api.auth.run_on_executor = _inline if label == "inline" else main_run_on_executor
+            elapsed, worst_stall, ok, rejected = await _run(client, args.users, args.logins, args.concurrency)
+            print(
+                f"{label:<14} {ok / elapsed:8.1f} logins/s   "
+                f"max event-loop stall {worst_stall * 1000:8.1f} ms   429: {rejected}"
+            )
+
+
+main_run_on_executor = api.auth.run_on_executor
+
+
+def main_entry() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+    asyncio.run(_main(args))
+    main.password_executor.shutdown()
+
+
+if __name__ == "__main__":
+    main_entry()
@@ -0,0 +1,54 @@
+"""
+批量四柱基准测试
+compute_pillars_batch vs N single BaZiChart constructions.
+
+用法（在 backend/ 目录下）：
+    python benchmarks/bench_bazi_batch.py --births 20000
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from core.bazi_core import BaZiChart, compute_pillars_batch  # noqa: E402
+
+
+def _sample_births(count: int, seed: int):
+    rng = random.Random(seed)
+    return [
+        (rng.randint(1901, 2099), rng.randint(1, 12), rng.randint(1, 28), rng.randint(0, 23), rng.randint(0, 59))
+        for _ in range(count)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--births", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    births = _sample_births(args.births, args.seed)
+
+    started = time.perf_counter()
+    single = [BaZiChart(*birth).get_pillars() for birth in births]
+    single_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batch = compute_pillars_batch(births)
+    batch_elapsed = time.perf_counter() - started
+
+    if single != batch:
+        raise SystemExit("batch pillars differ from BaZiChart")
+
+    print(f"births: {len(births)}")
+    print(f"N x BaZiChart:          {single_elapsed * 1000:8.1f} ms  ({single_elapsed / len(births) * 1e6:6.2f} us/birth)")
+    print(f"compute_pillars_batch:  {batch_elapsed * 1000:8.1f} ms  ({batch_elapsed / len(births) * 1e6:6.2f} us/birth)")
+    print(f"speedup: {single_elapsed / batch_elapsed:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+奇门排布表基准测试
+Charts every hour of a year: per-call palace arrangement vs the precomputed QIMEN_LAYOUTS table.
+
+用法（在 backend/ 目录下）：
+    python benchmarks/bench_qimen_layouts.py
+    python benchmarks/bench_qimen_layouts.py --year 2027 --matter 求财
+"""
+
+import argparse
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from core import qimen  # noqa: E402
+from core.qimen import QiMenChart  # noqa: E402
+
+
+def _arrange_per_call(self):
+    """旧路径：每次构造都重新排九宫。"""
+    chart = {}
+    for palace_name, palace_num, dipan_gan, tianpan_gan, gate, star, spirit in QiMenChart.arrange_layout(
+        *QiMenChart.layout_key(self.month, self.day, self.hour)
+    ):
+        chart[palace_name] = {
+            "宫位": palace_name,
+            "宫数": palace_num,
+            "地盘": dipan_gan,
+            "天盘": tianpan_gan,
+            "八门": gate,
+            "九星": star,
+            "八神": spirit,
+            "门吉凶": dict(QiMenChart.GATE_FORTUNE[gate]),
+            "星吉凶": dict(QiMenChart.STAR_FORTUNE[star]),
+        }
+    return chart
+
+
+@contextmanager
+def per_call_mode():
+    with patch.object(QiMenChart, "_arrange_chart", _arrange_per_call), \
+            patch.object(qimen, "palace_fortune", qimen._score_palace):
+        yield
+
+
+def _chart_year(year: int, matter_type: str) -> float:
+    moment = datetime(year, 1, 1)
+    end = datetime(year + 1, 1, 1)
+    started = time.perf_counter()
+    while moment < end:
+        chart = QiMenChart(moment.year, moment.month, moment.day, moment.hour)
+        chart.predict_matter(matter_type)
+        chart.find_best_direction()
+        moment += timedelta(hours=1)
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="逐小时排一年奇门盘的耗时")
+    parser.add_argument("--year", type=int, default=2026)
+    parser.add_argument("--matter", default="通用")
+    args = parser.parse_args()
+
+    hours = (datetime(args.year + 1, 1, 1) - datetime(args.year, 1, 1)).days * 24
+    _chart_year(args.year, args.matter)
+    with per_call_mode():
+        per_call = _chart_year(args.year, args.matter)
+    table = _chart_year(args.year, args.matter)
+
+    print(f"charts: {hours} (every hour of {args.year}), layouts: {len(qimen.QIMEN_LAYOUTS)}")
+    print(f"per-call arrangement: {per_call / hours * 1e6:8.1f} us/chart  total {per_call * 1000:8.1f} ms")
+    print(f"layout table:         {table / hours * 1e6:8.1f} us/chart  total {table * 1000:8.1f} ms  ({per_call / table:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
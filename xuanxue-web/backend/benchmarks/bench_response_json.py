@@ -0,0 +1,98 @@
+"""
+响应序列化基准测试
+Encoding cost of real consult / chart payloads: FastAPI default path vs dumps_json (orjson and stdlib fallback).
+
+用法（在 backend/ 目录下）：
+    python benchmarks/bench_response_json.py
+    python benchmarks/bench_response_json.py --repeat 200 --view compact
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+from api import common  # noqa: E402
+from api.bazi import BAZI_COMPACT_EXCLUDE  # noqa: E402
+from api.system import CONSULT_COMPACT_EXCLUDE  # noqa: E402
+from core.charts import build_bazi_result  # noqa: E402
+from core.consult.models import UnifiedConsultRequest  # noqa: E402
+from core.system_engine import consultation_engine  # noqa: E402
+
+
+def _default_path(payload) -> bytes:
+    # FastAPI 默认：jsonable_encoder 预处理 + JSONResponse 的标准库编码
+    return json.dumps(jsonable_encoder(payload), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def _stdlib_fallback(payload) -> bytes:
+    with patch.object(common, "orjson", None):
+        return common.dumps_json(payload)
+
+
+def _best_of(repeat: int, fn, payload) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(payload)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _payloads(view: str):
+    bazi = build_bazi_result(1990, 1, 1, 12, 0, "男")
+    consult = consultation_engine.consult(
+        UnifiedConsultRequest(
+            question="今年适合换工作吗？",
+            year=1990,
+            month=1,
+            day=1,
+            hour=12,
+            gender="男",
+            matter_type="事业",
+            purpose="求职",
+        )
+    )
+    if view == "compact":
+        bazi = common.ResponseProjection(exclude=common._parse_paths(",".join(BAZI_COMPACT_EXCLUDE))).apply(bazi)
+        consult = common.ResponseProjection(exclude=common._parse_paths(",".join(CONSULT_COMPACT_EXCLUDE))).apply(consult)
+    return {
+        "bazi": common.success_payload(bazi),
+        "consult": common.success_payload(consult),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="统一响应 JSON 编码耗时")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--view", choices=("full", "compact"), default="full")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # 问事会写决策日志，基准不碰 runtime/ 下的真实数据
+        os.environ["DECISION_LOG_PATH"] = temp_dir + "/decision_logs.jsonl"
+        payloads = _payloads(args.view)
+
+    print(f"orjson: {'available' if common.orjson is not None else 'missing'}")
+    print(f"{'payload':<10}{'bytes':>10}{'default ms':>13}{'stdlib ms':>12}{'orjson ms':>12}{'speedup':>10}")
+    for name, payload in payloads.items():
+        size = len(_default_path(payload))
+        default = _best_of(args.repeat, _default_path, payload)
+        fallback = _best_of(args.repeat, _stdlib_fallback, payload)
+        fast = _best_of(args.repeat, common.dumps_json, payload)
+        print(
+            f"{name:<10}{size:>10}{default * 1000:>13.3f}{fallback * 1000:>12.3f}"
+            f"{fast * 1000:>12.3f}{default / fast:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
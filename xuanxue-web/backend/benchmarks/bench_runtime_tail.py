@@ -0,0 +1,76 @@
+"""
+运行时日志尾读基准测试
+read_recent_jsonl (reverse block reader) on growing decision logs, vs a full scan.
+
+用法（在 backend/ 目录下）：
+    python benchmarks/bench_runtime_tail.py --size-mb 1024
+    python benchmarks/bench_runtime_tail.py --size-mb 256 --full-scan
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from core.runtime.store import read_jsonl, read_recent_jsonl  # noqa: E402
+
+
+def _sample_line(index: int) -> bytes:
+    payload = {
+        "log_id": f"{index:012d}",
+        "logged_at": "2024-01-01T00:00:00+00:00",
+        "snapshot": {"question": "我现在适合换工作吗？", "modules": ["bazi", "qimen", "liuyao"], "score": index % 100},
+    }
+    return (json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def _grow(path: Path, target_bytes: int, written: int, next_index: int):
+    # 按 1MB 批量写入，1GB 文件几秒内生成
+    with path.open("ab") as file:
+        while written < target_bytes:
+            chunk = bytearray()
+            while len(chunk) < 1024 * 1024:
+                chunk += _sample_line(next_index)
+                next_index += 1
+            file.write(chunk)
+            written += len(chunk)
+    return written, next_index
+
+
+def _best_of(repeat: int, fn) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=int, default=1024, help="最终日志大小（MB），途中按 1/16/64/256/... 取样")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--full-scan", action="store_true", help="同时测量整文件解析（大文件很慢）")
+    args = parser.parse_args()
+
+    checkpoints = sorted({size for size in (1, 16, 64, 256, 1024, args.size_mb) if size <= args.size_mb})
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = Path(temp_dir) / "decision_logs.jsonl"
+        written, next_index = 0, 0
+        print(f"{'size':>8}  {'tail read':>12}  {'full scan':>12}")
+        for size_mb in checkpoints:
+            written, next_index = _grow(path, size_mb * 1024 * 1024, written, next_index)
+            tail = _best_of(args.repeat, lambda: read_recent_jsonl(path, limit=args.limit))
+            if read_recent_jsonl(path, limit=1)[0]["log_id"] != f"{next_index - 1:012d}":
+                raise SystemExit("tail reader returned the wrong record")
+            full = f"{_best_of(1, lambda: read_jsonl(path)[-args.limit:]) * 1000:9.1f} ms" if args.full_scan else "-"
+            print(f"{written / 1024 / 1024:6.0f}MB  {tail * 1000:9.3f} ms  {full:>12}")
+
+
+if __name__ == "__main__":
+    main()
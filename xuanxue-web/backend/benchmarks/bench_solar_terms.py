@@ -0,0 +1,124 @@
+"""
+节气表基准测试
+Per-chart cost of BaZiChart before/after the precomputed solar-term table.
+
+用法（在 backend/ 目录下）：
+    python benchmarks/bench_solar_terms.py --charts 2000
+"""
+
+import argparse
+import random
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from core import bazi_core, qimen  # noqa: E402
+from core.calendar import SolarTermInterval, _compute_solar_term_date  # noqa: E402
+
+
+def _formula_term_date(year: int, term_index: int) -> datetime:
+    if year < 1900 or year > 2100:
+        raise ValueError("节气日期仅支持 1900-2100")
+    return _compute_solar_term_date(year, term_index)
+
+
+def _formula_interval(moment: datetime) -> SolarTermInterval:
+    """旧实现的等价路径：逐个用寿星公式推算相邻三年的节气再线性比较。"""
+    candidates = [
+        (y, idx, _formula_term_date(y, idx))
+        for y in (moment.year - 1, moment.year, moment.year + 1)
+        for idx in range(24)
+    ]
+    current = candidates[0]
+    end = None
+    for item in candidates:
+        if item[2] <= moment:
+            current = item
+        else:
+            end = item[2]
+            break
+    return SolarTermInterval(current[0], current[1], current[2], end)
+
+
+def _formula_prev_next_jie(moment: datetime):
+    candidates = sorted(
+        _formula_term_date(y, idx)
+        for y in (moment.year - 1, moment.year, moment.year + 1)
+        for idx in range(0, 24, 2)
+    )
+    prev_jie = max(item for item in candidates if item <= moment)
+    next_jie = min(item for item in candidates if item > moment)
+    return prev_jie, next_jie
+
+
+@contextmanager
+def formula_mode():
+    with patch.object(bazi_core, "get_solar_term_date", _formula_term_date), \
+            patch.object(bazi_core, "get_lichun_date", lambda year: _formula_term_date(year, 2)), \
+            patch.object(bazi_core, "find_solar_term_interval", _formula_interval), \
+            patch.object(bazi_core, "get_prev_next_jie", _formula_prev_next_jie), \
+            patch.object(qimen, "get_solar_term_date", _formula_term_date):
+        yield
+
+
+def _sample_births(count: int, seed: int):
+    rng = random.Random(seed)
+    births = []
+    for _ in range(count):
+        births.append((
+            rng.randint(1901, 2099),
+            rng.randint(1, 12),
+            rng.randint(1, 28),
+            rng.randint(0, 23),
+            rng.randint(0, 59),
+            rng.choice(("男", "女")),
+        ))
+    return births
+
+
+def _time_charts(births) -> float:
+    started = time.perf_counter()
+    for birth in births:
+        bazi_core.BaZiChart(*birth).to_dict()
+    return time.perf_counter() - started
+
+
+def _time_qimen(births) -> float:
+    started = time.perf_counter()
+    for year, month, day, hour, minute, _ in births:
+        qimen.QiMenChart(year, month, day, hour, minute)
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--charts", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    births = _sample_births(args.charts, args.seed)
+    _time_charts(births[:50])
+
+    with formula_mode():
+        formula_bazi = _time_charts(births)
+        formula_qimen = _time_qimen(births)
+    table_bazi = _time_charts(births)
+    table_qimen = _time_qimen(births)
+
+    def per_chart(total: float) -> float:
+        return total / len(births) * 1e6
+
+    print(f"charts: {len(births)}")
+    print(f"BaZiChart.to_dict  formula: {per_chart(formula_bazi):8.1f} us/chart")
+    print(f"BaZiChart.to_dict  table:   {per_chart(table_bazi):8.1f} us/chart  ({formula_bazi / table_bazi:.2f}x)")
+    print(f"QiMenChart         formula: {per_chart(formula_qimen):8.1f} us/chart")
+    print(f"QiMenChart         table:   {per_chart(table_qimen):8.1f} us/chart  ({formula_qimen / table_qimen:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+区间择时基准测试
+Cost of an hour-level search: naive per-slot QiMenChart loop vs search_auspicious_hours (layout-cached).
+
+用法（在 backend/ 目录下）：
+    python benchmarks/bench_zeshi_search.py
+    python benchmarks/bench_zeshi_search.py --months 18 --matter 婚姻 --limit 10
+"""
+
+import argparse
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from core.qimen import QiMenChart  # noqa: E402
+from core.zeri import scan_almanac  # noqa: E402
+from core.zeshi import (  # noqa: E402
+    DAY_WEIGHT,
+    HOUR_WEIGHT,
+    MATTER_PURPOSES,
+    SHICHEN_HOURS,
+    clear_hour_cache,
+    search_auspicious_hours,
+)
+
+
+def _naive_search(start: date, end: date, matter_type: str, limit: int):
+    """逐日逐时辰排奇门盘，全量排序后取前 k。"""
+    _, days = scan_almanac(start, end, MATTER_PURPOSES.get(matter_type, '通用'))
+    day_scores = {item['date']: item['score'] for item in days}
+    slots = []
+    day = start
+    while day <= end:
+        label = f'{day.year}年{day.month}月{day.day}日'
+        if label in day_scores:
+            for hour in SHICHEN_HOURS:
+                chart = QiMenChart(day.year, day.month, day.day, hour)
+                prediction = chart.predict_matter(matter_type)
+                if '最佳宫位' not in prediction:
+                    continue
+                fortune = chart.analyze_palace(prediction['最佳宫位'])['吉凶分数']
+                score = round(day_scores[label] * DAY_WEIGHT + round((fortune + 4) * 12.5, 1) * HOUR_WEIGHT, 1)
+                slots.append((score, label, hour, chart.find_best_direction()['最佳方位']))
+        day += timedelta(days=1)
+    slots.sort(key=lambda item: item[0], reverse=True)
+    return slots[:limit]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="区间择时耗时")
+    parser.add_argument("--months", type=int, default=18)
+    parser.add_argument("--matter", default="婚姻")
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    start = date.today()
+    end = start + timedelta(days=round(args.months * 30.44) - 1)
+
+    started = time.perf_counter()
+    naive = _naive_search(start, end, args.matter, args.limit)
+    naive_seconds = time.perf_counter() - started
+
+    clear_hour_cache()
+    started = time.perf_counter()
+    candidates, slots = search_auspicious_hours(start, end, args.matter, limit=args.limit)
+    cold_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    search_auspicious_hours(start, end, args.matter, limit=args.limit)
+    warm_seconds = time.perf_counter() - started
+
+    fast = [(slot['score'], slot['date'], slot['hour'], slot['direction']['宫位']) for slot in slots]
+    assert fast == naive, "search_auspicious_hours 与逐时辰排盘结果不一致"
+
+    print(f"range: {start} ~ {end} ({(end - start).days + 1} days), matter={args.matter}, candidates={candidates}")
+    print(f"naive per-slot charts:   {naive_seconds * 1000:8.1f} ms")
+    print(f"search (cold cache):     {cold_seconds * 1000:8.1f} ms  ({naive_seconds / cold_seconds:.1f}x)")
+    print(f"search (warm cache):     {warm_seconds * 1000:8.1f} ms  ({naive_seconds / warm_seconds:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
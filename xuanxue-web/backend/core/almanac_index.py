@@ -0,0 +1,172 @@
+"""
+择日用途倒排索引
+Inverted index from activity keyword to the jianxing that permit / forbid it, plus bitset range search.
+
+本库的宜忌只挂在十二建星上（十二神、星宿只影响评分），所以索引键是活动词，值是 12 位建星掩码。
+区间查询先把每天按建星、评分分桶成整数位图，多用途查询即位图的与 / 或，再按评分从高到低取前 k 天。
+"""
+
+from datetime import date, timedelta
+from itertools import islice
+from typing import Dict, Iterable, List, NamedTuple, Sequence, Tuple
+
+from .zeri import (
+    CYCLE_JIANXING,
+    CYCLE_SCORES,
+    DAY_CYCLE_BASE,
+    JIANXING,
+    JIANXING_JIXIONG,
+    MAX_RANGE_DAYS,
+    PURPOSE_FALLBACK_SCORE,
+    PURPOSE_KEYWORDS,
+    almanac_day,
+    iter_month_spans,
+    match_jianxing_keywords,
+)
+
+
+class ActivityMasks(NamedTuple):
+    permit: int     # 宜该活动的建星位
+    forbid: int     # 忌该活动的建星位
+
+
+def _keyword_masks(keywords: Sequence[str]) -> ActivityMasks:
+    # 命中规则以 zeri.match_jianxing_keywords 为准，这里只把布尔表压成位掩码
+    suitable, avoid = match_jianxing_keywords(keywords)
+    permit = sum(1 << index for index, hit in enumerate(suitable) if hit)
+    forbid = sum(1 << index for index, hit in enumerate(avoid) if hit)
+    return ActivityMasks(permit, forbid)
+
+
+def _build_activity_index() -> Dict[str, ActivityMasks]:
+    index: Dict[str, ActivityMasks] = {}
+    # 同义词归到所属用途；一个词属于多个用途时取先出现的
+    for purpose, keywords in PURPOSE_KEYWORDS.items():
+        for keyword in keywords:
+            index.setdefault(keyword, _keyword_masks(keywords))
+    # 宜忌表里的原词直接按自身匹配，优先于同义词归并
+    for info in JIANXING_JIXIONG.values():
+        for term in info['suitable'] + info['avoid']:
+            index[term] = _keyword_masks([term])
+    # 用途名本身按整组关键词匹配
+    for purpose, keywords in PURPOSE_KEYWORDS.items():
+        index[purpose] = _keyword_masks(keywords)
+    return index
+
+
+ACTIVITY_INDEX: Dict[str, ActivityMasks] = _build_activity_index()
+
+
+def known_activities() -> List[str]:
+    return sorted(ACTIVITY_INDEX)
+
+
+class RangeBitsets:
+    """[start, end] 内逐日的建星位图与评分位图；第 i 位对应 start + i 天。"""
+
+    def __init__(self, start: date, end: date):
+        if end < start:
+            raise ValueError("end must not be earlier than start")
+        self.start = start
+        self.day_count = (end - start).days + 1
+        if self.day_count > MAX_RANGE_DAYS:
+            raise ValueError(f"date range must not exceed {MAX_RANGE_DAYS} days")
+        self.all_days = (1 << self.day_count) - 1
+        self.jianxing_bits = [0] * len(JIANXING)
+        self.score_bits: Dict[int, int] = {}
+
+        index = 0
+        for first, day_count, month_zhi in iter_month_spans(start, end):
+            jianxing_row = CYCLE_JIANXING[month_zhi]
+            score_row = CYCLE_SCORES[month_zhi]
+            cycle = (DAY_CYCLE_BASE + first) % 60
+            for _ in range(day_count):
+                bit = 1 << index
+                self.jianxing_bits[jianxing_row[cycle]] |= bit
+                score = score_row[cycle]
+                self.score_bits[score] = self.score_bits.get(score, 0) | bit
+                index += 1
+                cycle = (cycle + 1) % 60
+
+    def jianxing_days(self, mask: int) -> int:
+        bits = 0
+        for index, day_bits in enumerate(self.jianxing_bits):
+            if mask >> index & 1:
+                bits |= day_bits
+        return bits
+
+    def score_at_least(self, threshold: int) -> int:
+        bits = 0
+        for score, day_bits in self.score_bits.items():
+            if score >= threshold:
+                bits |= day_bits
+        return bits
+
+    def date_bits(self, days: Iterable[date]) -> int:
+        bits = 0
+        for day in days:
+            index = (day - self.start).days
+            if 0 <= index < self.day_count:
+                bits |= 1 << index
+        return bits
+
+    def eligible_for(self, masks: ActivityMasks) -> int:
+        """单个用途的可选日：不犯忌，且宜该用途或评分不低于 PURPOSE_FALLBACK_SCORE（与 scan_almanac 同一规则）。"""
+        permitted = self.jianxing_days(masks.permit) | self.score_at_least(PURPOSE_FALLBACK_SCORE)
+        return permitted & ~self.jianxing_days(masks.forbid) & self.all_days
+
+
+def iter_bits(bits: int) -> Iterable[int]:
+    while bits:
+        lowest = bits & -bits
+        yield lowest.bit_length() - 1
+        bits ^= lowest
+
+
+def select_days(
+    start: date,
+    end: date,
+    purposes: Sequence[str] = ('通用',),
+    exclude: Iterable[date] = (),
+    min_score: int = 50,
+) -> Tuple[RangeBitsets, int]:
+    """各用途可选日位图求交并去掉 exclude，返回 (区间位图, 入选日位图)；未知用途抛 ValueError。"""
+    unknown = [purpose for purpose in purposes if purpose != '通用' and purpose not in ACTIVITY_INDEX]
+    if unknown:
+        raise ValueError(f"unknown purposes: {', '.join(unknown)}")
+
+    bitsets = RangeBitsets(start, end)
+    selected = bitsets.score_at_least(min_score) & ~bitsets.date_bits(exclude)
+    for purpose in purposes:
+        if purpose != '通用':
+            selected &= bitsets.eligible_for(ACTIVITY_INDEX[purpose])
+    return bitsets, selected
+
+
+def iter_selected_days(bitsets: RangeBitsets, selected: int) -> Iterable[Tuple[int, int]]:
+    """按评分从高到低、同分按日期先后产出 (日序下标, 评分)。"""
+    for score in sorted(bitsets.score_bits, reverse=True):
+        for index in iter_bits(selected & bitsets.score_bits[score]):
+            yield index, score
+
+
+def search_auspicious_days(
+    start: date,
+    end: date,
+    purposes: Sequence[str] = ('通用',),
+    exclude: Iterable[date] = (),
+    limit: int = 10,
+    min_score: int = 50,
+) -> Tuple[int, List[Dict]]:
+    """
+    多用途区间择日
+
+    各用途的可选日位图取交集，去掉 exclude 中的日期，再按评分桶从高到低、桶内按日期先后取前 limit 天。
+    单一用途时结果与 scan_almanac 相同。返回 (入选总数, 记录列表)；未知用途抛 ValueError。
+    """
+    bitsets, selected = select_days(start, end, purposes, exclude, min_score)
+    results = [
+        almanac_day(start + timedelta(days=index))
+        for index, _ in islice(iter_selected_days(bitsets, selected), limit)
+    ]
+    return bin(selected).count('1'), results
@@ -0,0 +1,233 @@
+"""
+黄历预计算表
+Columnar per-day almanac for 1900-2100 persisted as a memory-mapped binary file.
+
+每天的日干支序号、月干、建星、十二神、星宿与评分各占 1 字节，按列连续存放（约 73k 天 × 6 列）。
+`DateSelection` 优先按日序号直接读表，表文件不存在或版本不符时回退到逐项计算；
+回退期间每隔 ALMANAC_TABLE_RECHECK_SECONDS 重新尝试打开，部署后再 build 的表无需重启即可生效。
+
+用法（在 backend 目录下）：
+    python -m core.almanac_table build [--path runtime/almanac_table.bin]
+    python -m core.almanac_table validate [--path runtime/almanac_table.bin] [--step 1]
+
+环境变量：
+- ALMANAC_TABLE_PATH: 表文件路径，默认 runtime/almanac_table.bin
+- ALMANAC_TABLE_RECHECK_SECONDS: 表缺失或不可用时重新尝试打开的间隔秒数，默认 30
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Optional
+
+from .runtime.store import resolve_runtime_path
+
+
+MAGIC = b"XXALMNAC"
+# 文件格式或择日规则（建星、十二神、评分）变化时递增，旧表自动失效并回退到实时计算
+TABLE_VERSION = 1
+FIRST_DAY = date(1900, 1, 1)
+LAST_DAY = date(2100, 12, 31)
+DEFAULT_FILENAME = "almanac_table.bin"
+DEFAULT_RECHECK_SECONDS = 30.0
+
+# magic, 版本, 列数, 首日日序号, 天数
+HEADER = struct.Struct("<8sHHiI")
+
+
+class AlmanacRow(NamedTuple):
+    day_cycle: int      # 日干支六十甲子序号
+    month_gan: int      # 月干序号（月支由公历月份决定）
+    jianxing: int       # 十二建星序号
+    shier_shen: int     # 十二神序号
+    xingxiu: int        # 二十八星宿序号
+    score: int          # 择日评分
+
+
+COLUMNS = AlmanacRow._fields
+
+
+class AlmanacTable:
+    """只读的内存映射黄历表；列是 mmap 上的 memoryview 切片，取一行不复制整表。"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as handle:
+            self._mmap = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if len(self._mmap) < HEADER.size:
+                raise ValueError(f"almanac table {self.path} is truncated")
+            magic, version, column_count, first_ordinal, day_count = HEADER.unpack_from(self._mmap, 0)
+            if magic != MAGIC:
+                raise ValueError(f"{self.path} is not an almanac table")
+            if version != TABLE_VERSION or column_count != len(COLUMNS):
+                raise ValueError(f"almanac table {self.path} has version {version}, expected {TABLE_VERSION}")
+            if len(self._mmap) != HEADER.size + column_count * day_count:
+                raise ValueError(f"almanac table {self.path} is truncated")
+        except ValueError:
+            self._mmap.close()
+            raise
+
+        self.first_ordinal = first_ordinal
+        self.day_count = day_count
+        view = memoryview(self._mmap)
+        self._columns = tuple(
+            view[HEADER.size + index * day_count:HEADER.size + (index + 1) * day_count]
+            for index in range(column_count)
+        )
+
+    def row(self, day: date) -> Optional[AlmanacRow]:
+        index = day.toordinal() - self.first_ordinal
+        if index < 0 or index >= self.day_count:
+            return None
+        return AlmanacRow(*(column[index] for column in self._columns))
+
+    def close(self) -> None:
+        for column in self._columns:
+            column.release()
+        self._columns = ()
+        self._mmap.close()
+
+
+_TABLE: Optional[AlmanacTable] = None
+_TABLE_ERROR: Optional[str] = None
+# 上次尝试打开的时间（monotonic）；None 表示尚未尝试
+_CHECKED_AT: Optional[float] = None
+_LOAD_LOCK = threading.Lock()
+
+
+def table_path() -> Path:
+    return resolve_runtime_path("ALMANAC_TABLE_PATH", DEFAULT_FILENAME)
+
+
+def recheck_seconds() -> float:
+    raw = os.getenv("ALMANAC_TABLE_RECHECK_SECONDS")
+    try:
+        return max(0.0, float(raw)) if raw and raw.strip() else DEFAULT_RECHECK_SECONDS
+    except ValueError:
+        return DEFAULT_RECHECK_SECONDS
+
+
+def _due(checked_at: Optional[float]) -> bool:
+    return checked_at is None or time.monotonic() - checked_at >= recheck_seconds()
+
+
+def get_almanac_table() -> Optional[AlmanacTable]:
+    """
+    进程内共享的黄历表；首次调用时打开，文件缺失或损坏返回 None（原因见 almanac_table_status）。
+
+    打开成功后一直复用；未打开时按 recheck_seconds() 节流重试，期间调用方回退实时计算。
+    """
+    global _TABLE, _TABLE_ERROR, _CHECKED_AT
+    if _TABLE is not None or not _due(_CHECKED_AT):
+        return _TABLE
+    with _LOAD_LOCK:
+        if _TABLE is None and _due(_CHECKED_AT):
+            path = table_path()
+            try:
+                _TABLE = AlmanacTable(path)
+                _TABLE_ERROR = None
+            except FileNotFoundError:
+                _TABLE_ERROR = "missing"
+            except (OSError, ValueError) as exc:
+                _TABLE_ERROR = str(exc)
+            _CHECKED_AT = time.monotonic()
+    return _TABLE
+
+
+def reset_almanac_table() -> None:
+    """关闭并丢弃已打开的表，下次 get_almanac_table 重新按 ALMANAC_TABLE_PATH 加载。"""
+    global _TABLE, _TABLE_ERROR, _CHECKED_AT
+    with _LOAD_LOCK:
+        if _TABLE is not None:
+            _TABLE.close()
+        _TABLE = None
+        _TABLE_ERROR = None
+        _CHECKED_AT = None
+
+
+def almanac_table_status() -> Dict[str, Any]:
+    table = get_almanac_table()
+    return {
+        "loaded": table is not None,
+        "path": str(table.path if table is not None else table_path()),
+        "days": table.day_count if table is not None else 0,
+        "version": TABLE_VERSION,
+        "error": _TABLE_ERROR,
+    }
+
+
+def build_almanac_table(path: Optional[Path] = None) -> Dict[str, Any]:
+    """按 1900-2100 逐日生成表文件；先写临时文件再原子替换，已映射旧表的进程不受影响。"""
+    from .zeri import compute_almanac_row  # zeri 在导入时引用本模块，构建时再取避免循环导入
+
+    path = Path(path) if path is not None else table_path()
+    day_count = (LAST_DAY - FIRST_DAY).days + 1
+    columns = [bytearray(day_count) for _ in COLUMNS]
+    for index in range(day_count):
+        for column, value in zip(columns, compute_almanac_row(FIRST_DAY + timedelta(days=index))):
+            column[index] = value
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_name = tempfile.mkstemp(prefix=path.name + ".", suffix=".tmp", dir=str(path.parent))
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(HEADER.pack(MAGIC, TABLE_VERSION, len(COLUMNS), FIRST_DAY.toordinal(), day_count))
+            for column in columns:
+                handle.write(column)
+        os.replace(temp_name, path)
+    except BaseException:
+        if os.path.exists(temp_name):
+            os.unlink(temp_name)
+        raise
+    return {"path": str(path), "days": day_count, "bytes": path.stat().st_size, "version": TABLE_VERSION}
+
+
+def validate_almanac_table(path: Optional[Path] = None, step: int = 1) -> Dict[str, Any]:
+    """逐日（按 step 抽样）比对表驱动与实时计算的 analyze_day / get_calc_trace 输出。"""
+    from .zeri import DateSelection
+
+    path = Path(path) if path is not None else table_path()
+    table = AlmanacTable(path)
+    checked = 0
+    mismatches = []
+    try:
+        day = FIRST_DAY
+        while day <= LAST_DAY:
+            cached = DateSelection(day.year, day.month, day.day, table=table)
+            live = DateSelection(day.year, day.month, day.day, live=True)
+            if cached.analyze_day() != live.analyze_day() or cached.get_calc_trace() != live.get_calc_trace():
+                mismatches.append(day.isoformat())
+            checked += 1
+            day += timedelta(days=step)
+    finally:
+        table.close()
+    return {"path": str(path), "checked": checked, "mismatches": len(mismatches), "first_mismatches": mismatches[:10]}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="生成或校验 1900-2100 黄历预计算表")
+    parser.add_argument("command", choices=("build", "validate"))
+    parser.add_argument("--path", type=Path, default=None, help="表文件路径，默认 ALMANAC_TABLE_PATH 或 runtime/almanac_table.bin")
+    parser.add_argument("--step", type=int, default=1, help="validate 时每隔多少天抽查一次")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        report = build_almanac_table(args.path)
+    else:
+        report = validate_almanac_table(args.path, max(1, args.step))
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if report.get("mismatches"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,7 @@ Lightweight local auth backed by JSON files.
 
 import hashlib
 import hmac
+import os
 import re
 import secrets
 from datetime import datetime, timedelta, timezone
@@ -13,20 +14,46 @@ from uuid import uuid4
 
 from fastapi import HTTPException, Request
 
-from .runtime.store import read_json_file, resolve_runtime_path, update_json_file, write_json_file
+from .rate_limit import TokenBucketLimiter
+from .runtime.executor import ComputeExecutor
+from .runtime.store import get_runtime_store
+from .session_index import SESSIONS_DOCUMENT, session_index
+from .signed_token import decode_signed_token, is_signed_token, issue_signed_token, token_denylist
+from .user_index import USERS_DOCUMENT, normalize_email, user_index
 
 
 EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+# 历史记录没有 password_iterations 字段，按此值校验
 PASSWORD_ITERATIONS = 120000
 SESSION_TTL_DAYS = 30
 
 
-def _users_path():
-    return resolve_runtime_path("USER_STORE_PATH", "users.json")
+def _env_number(name: str, default: float) -> float:
+    raw = os.getenv(name)
+    if raw is None or not raw.strip():
+        return default
+    try:
+        return float(raw)
+    except ValueError:
+        return default
 
 
-def _sessions_path():
-    return resolve_runtime_path("SESSION_STORE_PATH", "sessions.json")
+# PBKDF2 单独一个线程池（hashlib 计算期间释放 GIL），与排盘计算互不挤占
+password_executor = ComputeExecutor(
+    kind="thread",
+    workers=max(1, int(_env_number("PASSWORD_HASH_WORKERS", 2))),
+    max_queue=max(0, int(_env_number("PASSWORD_HASH_MAX_QUEUE", 16))),
+)
+
+# 登录 / 注册令牌桶：按 IP 与按邮箱两道，容量 0 表示关闭
+login_ip_limiter = TokenBucketLimiter(
+    capacity=_env_number("LOGIN_RATE_LIMIT_IP_BURST", 20),
+    refill_per_second=_env_number("LOGIN_RATE_LIMIT_IP_PER_MINUTE", 20) / 60,
+)
+login_email_limiter = TokenBucketLimiter(
+    capacity=_env_number("LOGIN_RATE_LIMIT_EMAIL_BURST", 5),
+    refill_per_second=_env_number("LOGIN_RATE_LIMIT_EMAIL_PER_MINUTE", 5) / 60,
+)
 
 
 def _now_iso() -> str:
@@ -34,27 +61,27 @@ def _now_iso() -> str:
 
 
 def _normalize_email(email: str) -> str:
-    return (email or "").strip().lower()
+    return normalize_email(email)
 
 
 def _read_users() -> List[Dict[str, Any]]:
-    payload = read_json_file(_users_path(), {"users": []})
+    payload = get_runtime_store().read_document(USERS_DOCUMENT, {"users": []})
     users = payload.get("users") if isinstance(payload, dict) else []
     return users if isinstance(users, list) else []
 
 
 def _write_users(users: List[Dict[str, Any]]) -> None:
-    write_json_file(_users_path(), {"users": users})
+    get_runtime_store().write_document(USERS_DOCUMENT, {"users": users})
 
 
 def _read_sessions() -> List[Dict[str, Any]]:
-    payload = read_json_file(_sessions_path(), {"sessions": []})
+    payload = get_runtime_store().read_document(SESSIONS_DOCUMENT, {"sessions": []})
     sessions = payload.get("sessions") if isinstance(payload, dict) else []
     return sessions if isinstance(sessions, list) else []
 
 
 def _write_sessions(sessions: List[Dict[str, Any]]) -> None:
-    write_json_file(_sessions_path(), {"sessions": sessions})
+    get_runtime_store().write_document(SESSIONS_DOCUMENT, {"sessions": sessions})
 
 
 def _extract_users(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
@@ -83,43 +110,102 @@ def _cleanup_expired_sessions(sessions: List[Dict[str, Any]]) -> List[Dict[str,
     return cleaned
 
 
-def _hash_password(password: str, salt_hex: Optional[str] = None) -> Tuple[str, str]:
+def auth_token_mode() -> str:
+    """AUTH_TOKEN_MODE：session（默认，服务端会话表）或 signed（无状态签名令牌）。"""
+    mode = (os.getenv("AUTH_TOKEN_MODE") or "session").strip().lower()
+    return mode if mode in ("session", "signed") else "session"
+
+
+def _password_iterations() -> int:
+    """新哈希使用的迭代次数，可用 PASSWORD_HASH_ITERATIONS 调整；旧记录在下次登录时自动升级。"""
+    return max(1, int(_env_number("PASSWORD_HASH_ITERATIONS", PASSWORD_ITERATIONS)))
+
+
+def _hash_password(password: str, salt_hex: Optional[str] = None, iterations: Optional[int] = None) -> Tuple[str, str]:
     salt = bytes.fromhex(salt_hex) if salt_hex else secrets.token_bytes(16)
     derived = hashlib.pbkdf2_hmac(
         "sha256",
         password.encode("utf-8"),
         salt,
-        PASSWORD_ITERATIONS,
+        iterations or _password_iterations(),
     )
     return salt.hex(), derived.hex()
 
 
+def _stored_iterations(user: Dict[str, Any]) -> int:
+    try:
+        return int(user.get("password_iterations") or PASSWORD_ITERATIONS)
+    except (TypeError, ValueError):
+        return PASSWORD_ITERATIONS
+
+
+def _set_password(user: Dict[str, Any], password: str) -> None:
+    iterations = _password_iterations()
+    password_salt, password_hash = _hash_password(password, iterations=iterations)
+    user["password_salt"] = password_salt
+    user["password_hash"] = password_hash
+    user["password_iterations"] = iterations
+
+
 def _verify_password(password: str, user: Dict[str, Any]) -> bool:
     salt_hex = str(user.get("password_salt") or "")
     password_hash = str(user.get("password_hash") or "")
     if not salt_hex or not password_hash:
         return False
-    _, candidate_hash = _hash_password(password, salt_hex=salt_hex)
+    _, candidate_hash = _hash_password(password, salt_hex=salt_hex, iterations=_stored_iterations(user))
     return hmac.compare_digest(candidate_hash, password_hash)
 
 
+def _upgrade_password_hash(user: Dict[str, Any], password: str) -> None:
+    """登录成功且迭代次数与当前配置不一致时，用新参数重新哈希。"""
+    if _stored_iterations(user) == _password_iterations():
+        return
+    user_id = user.get("user_id")
+    previous_hash = user.get("password_hash")
+    upgraded = {}
+    _set_password(upgraded, password)
+
+    def updater(payload: Dict[str, Any]) -> Dict[str, Any]:
+        users = _extract_users(payload)
+        for item in users:
+            # 期间密码被改过就不覆盖
+            if item.get("user_id") == user_id and item.get("password_hash") == previous_hash:
+                item.update(upgraded)
+                break
+        return {"users": users}
+
+    get_runtime_store().update_document(USERS_DOCUMENT, {"users": []}, updater)
+    user_index.invalidate()
+
+
+def check_login_rate_limit(client_ip: Optional[str], email: Optional[str] = None) -> None:
+    """令牌桶限流，挡在密码哈希之前；超限返回 429 rate_limited + Retry-After。"""
+    retry_after = login_ip_limiter.acquire(client_ip or "unknown")
+    if retry_after is None and email:
+        retry_after = login_email_limiter.acquire(_normalize_email(email))
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=429,
+            detail={
+                "code": "rate_limited",
+                "message": "尝试过于频繁，请稍后再试",
+                "retryable": True,
+                "details": {"retry_after": retry_after},
+            },
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
 def _hash_token(token: str) -> str:
     return hashlib.sha256(token.encode("utf-8")).hexdigest()
 
 
-def _find_user_by_email(email: str) -> Optional[Dict[str, Any]]:
-    normalized = _normalize_email(email)
-    for user in _read_users():
-        if _normalize_email(str(user.get("email") or "")) == normalized:
-            return user
-    return None
+def _find_user_by_email(email: str, fresh: bool = False) -> Optional[Dict[str, Any]]:
+    return user_index.by_email(email, fresh=fresh)
 
 
 def _find_user_by_id(user_id: str) -> Optional[Dict[str, Any]]:
-    for user in _read_users():
-        if user.get("user_id") == user_id:
-            return user
-    return None
+    return user_index.by_id(user_id)
 
 
 def _sanitize_birth(profile: Dict[str, Any]) -> Optional[Dict[str, Any]]:
@@ -225,8 +311,16 @@ def _normalize_consult_preset(data: Dict[str, Any]) -> Dict[str, Any]:
 
 
 def create_session(user_id: str) -> Dict[str, Any]:
+    expires_dt = datetime.now(timezone.utc) + timedelta(days=SESSION_TTL_DAYS)
+    expires_at = expires_dt.isoformat(timespec="seconds")
+    if auth_token_mode() == "signed":
+        # 签名令牌自带 user_id 与过期时间，不写会话文件
+        return {
+            "token": issue_signed_token(user_id, expires_dt.timestamp()),
+            "expires_at": expires_at,
+        }
+
     token = secrets.token_urlsafe(32)
-    expires_at = (datetime.now(timezone.utc) + timedelta(days=SESSION_TTL_DAYS)).isoformat(timespec="seconds")
 
     def updater(payload: Dict[str, Any]) -> Dict[str, Any]:
         sessions = _cleanup_expired_sessions(_extract_sessions(payload))
@@ -241,7 +335,8 @@ def create_session(user_id: str) -> Dict[str, Any]:
         )
         return {"sessions": sessions}
 
-    update_json_file(_sessions_path(), {"sessions": []}, updater)
+    get_runtime_store().update_document(SESSIONS_DOCUMENT, {"sessions": []}, updater)
+    session_index.invalidate()
     return {
         "token": token,
         "expires_at": expires_at,
@@ -251,15 +346,18 @@ def create_session(user_id: str) -> Dict[str, Any]:
 def register_user(email: str, password: str, display_name: Optional[str] = None) -> Dict[str, Any]:
     normalized_email = _validate_email(email)
     _validate_password(password)
+    if _find_user_by_email(normalized_email) is not None:
+        # 索引命中即可提前拒绝，省掉一次 PBKDF2 与加锁重写；最终以锁内检查为准
+        raise HTTPException(
+            status_code=409,
+            detail={"code": "conflict", "message": "该邮箱已注册", "retryable": False},
+        )
     now = _now_iso()
-    password_salt, password_hash = _hash_password(password)
     safe_display_name = (display_name or "").strip() or normalized_email.split("@")[0]
     user = {
         "user_id": str(uuid4()),
         "email": normalized_email,
         "display_name": safe_display_name,
-        "password_salt": password_salt,
-        "password_hash": password_hash,
         "profile": {
             "gender": None,
             "birth": None,
@@ -268,6 +366,7 @@ def register_user(email: str, password: str, display_name: Optional[str] = None)
         "created_at": now,
         "updated_at": now,
     }
+    _set_password(user, password)
 
     def updater(payload: Dict[str, Any]) -> Dict[str, Any]:
         users = _extract_users(payload)
@@ -279,7 +378,8 @@ def register_user(email: str, password: str, display_name: Optional[str] = None)
         users.append(user)
         return {"users": users}
 
-    update_json_file(_users_path(), {"users": []}, updater)
+    get_runtime_store().update_document(USERS_DOCUMENT, {"users": []}, updater)
+    user_index.invalidate()
 
     session = create_session(user["user_id"])
     return {
@@ -291,12 +391,14 @@ def register_user(email: str, password: str, display_name: Optional[str] = None)
 
 def login_user(email: str, password: str) -> Dict[str, Any]:
     normalized_email = _validate_email(email)
-    user = _find_user_by_email(normalized_email)
+    # 登录本身要跑 PBKDF2，多一次版本检查无所谓；保证其他 worker 刚改的密码立即生效
+    user = _find_user_by_email(normalized_email, fresh=True)
     if not user or not _verify_password(password, user):
         raise HTTPException(
             status_code=401,
             detail={"code": "unauthorized", "message": "账号或密码不正确", "retryable": False},
         )
+    _upgrade_password_hash(user, password)
 
     session = create_session(str(user.get("user_id")))
     return {
@@ -310,23 +412,30 @@ def get_user_by_token(token: str) -> Optional[Dict[str, Any]]:
     if not token:
         return None
 
-    def updater(payload: Dict[str, Any]) -> Dict[str, Any]:
-        return {"sessions": _cleanup_expired_sessions(_extract_sessions(payload))}
+    if is_signed_token(token):
+        # 与 AUTH_TOKEN_MODE 无关：切换模式后，已签发的令牌在过期前仍然有效
+        claims = decode_signed_token(token)
+        if claims is None or token_denylist.is_revoked(str(claims["jti"])):
+            return None
+        return _find_user_by_id(str(claims["uid"]))
 
-    session_payload = update_json_file(_sessions_path(), {"sessions": []}, updater)
-    sessions = _extract_sessions(session_payload)
-    token_hash = _hash_token(token)
-    for session in sessions:
-        if hmac.compare_digest(str(session.get("token_hash") or ""), token_hash):
-            user = _find_user_by_id(str(session.get("user_id") or ""))
-            if user:
-                return user
-    return None
+    # 会话走进程内索引（按 token 哈希直接查），过期清理由后台 sweep 负责落盘
+    session = session_index.lookup(_hash_token(token))
+    if session is None:
+        return None
+    return _find_user_by_id(str(session.get("user_id") or ""))
 
 
 def logout_session(token: str) -> bool:
     if not token:
         return False
+    if is_signed_token(token):
+        claims = decode_signed_token(token)
+        if claims is None:
+            return False
+        token_denylist.revoke(str(claims["jti"]), float(claims["exp"]))
+        return True
+
     token_hash = _hash_token(token)
     changed = False
 
@@ -337,10 +446,23 @@ def logout_session(token: str) -> bool:
         changed = len(remaining) != len(sessions)
         return {"sessions": remaining}
 
-    update_json_file(_sessions_path(), {"sessions": []}, updater)
+    get_runtime_store().update_document(SESSIONS_DOCUMENT, {"sessions": []}, updater)
+    session_index.invalidate(token_hash)
     return changed
 
 
+def sweep_expired_sessions() -> int:
+    return session_index.sweep(_cleanup_expired_sessions)
+
+
+def start_session_sweeper() -> None:
+    session_index.start_sweeper(_cleanup_expired_sessions)
+
+
+def stop_session_sweeper() -> None:
+    session_index.stop_sweeper()
+
+
 def update_user_account(user_id: str, updates: Dict[str, Any]) -> Dict[str, Any]:
     matched_user: Optional[Dict[str, Any]] = None
 
@@ -371,9 +493,7 @@ def update_user_account(user_id: str, updates: Dict[str, Any]) -> Dict[str, Any]
                         detail={"code": "unauthorized", "message": "当前密码不正确", "retryable": False},
                     )
                 _validate_password(str(new_password))
-                password_salt, password_hash = _hash_password(str(new_password))
-                user["password_salt"] = password_salt
-                user["password_hash"] = password_hash
+                _set_password(user, str(new_password))
 
             profile_updates = _build_profile_updates(updates)
             profile = user.get("profile") if isinstance(user.get("profile"), dict) else {}
@@ -394,7 +514,8 @@ def update_user_account(user_id: str, updates: Dict[str, Any]) -> Dict[str, Any]
             )
         return {"users": users}
 
-    update_json_file(_users_path(), {"users": []}, updater)
+    get_runtime_store().update_document(USERS_DOCUMENT, {"users": []}, updater)
+    user_index.invalidate()
     return public_user(matched_user)
 
 
@@ -453,7 +574,8 @@ def save_user_consult_preset(user_id: str, preset_data: Dict[str, Any]) -> List[
             )
         return {"users": users}
 
-    update_json_file(_users_path(), {"users": []}, updater)
+    get_runtime_store().update_document(USERS_DOCUMENT, {"users": []}, updater)
+    user_index.invalidate()
     return public_user(matched_user)["profile"]["consult_presets"]
 
 
@@ -484,7 +606,8 @@ def delete_user_consult_preset(user_id: str, preset_id: str) -> List[Dict[str, A
             )
         return {"users": users}
 
-    update_json_file(_users_path(), {"users": []}, updater)
+    get_runtime_store().update_document(USERS_DOCUMENT, {"users": []}, updater)
+    user_index.invalidate()
     return public_user(matched_user)["profile"]["consult_presets"]
 
 
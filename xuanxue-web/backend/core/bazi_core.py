@@ -3,16 +3,17 @@
 BaZi (Eight Characters) Core Engine
 """
 
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import math
-from typing import Dict, List, Tuple
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
 from .ganzhi import (
     TIANGAN, DIZHI, get_year_ganzhi, get_month_ganzhi,
     get_day_ganzhi, get_hour_ganzhi, get_wuxing, get_yinyang,
     get_nayin, DIZHI_CANGGAN, WUXING_TIANGAN
 )
 from .calendar import get_lichun_date, solar_to_lunar
-from .calendar import get_solar_term_date
+from .calendar import find_solar_term_interval, get_prev_next_jie, get_solar_term_date
+from .calendar import SOLAR_TERM_FIRST_YEAR, solar_term_index_for_ordinal
 
 
 class BaZiChart:
@@ -70,38 +71,10 @@ class BaZiChart:
         根据节气边界计算八字月序：
         寅月=1, 卯月=2, ... 子月=11, 丑月=12
         """
-        year = birth_date.year
-        lichun_cur = get_solar_term_date(year, 2)
-
-        # 立春后使用当年节令序列，立春前使用上一年节令序列
-        if birth_date >= lichun_cur:
-            base_year = year
-            next_year = year + 1
-        else:
-            base_year = year - 1
-            next_year = year
-
-        boundaries = [
-            (get_solar_term_date(base_year, 2), 1),   # 立春 -> 寅月
-            (get_solar_term_date(base_year, 4), 2),   # 惊蛰 -> 卯月
-            (get_solar_term_date(base_year, 6), 3),   # 清明 -> 辰月
-            (get_solar_term_date(base_year, 8), 4),   # 立夏 -> 巳月
-            (get_solar_term_date(base_year, 10), 5),  # 芒种 -> 午月
-            (get_solar_term_date(base_year, 12), 6),  # 小暑 -> 未月
-            (get_solar_term_date(base_year, 14), 7),  # 立秋 -> 申月
-            (get_solar_term_date(base_year, 16), 8),  # 白露 -> 酉月
-            (get_solar_term_date(base_year, 18), 9),  # 寒露 -> 戌月
-            (get_solar_term_date(base_year, 20), 10), # 立冬 -> 亥月
-            (get_solar_term_date(base_year, 22), 11), # 大雪 -> 子月
-            (get_solar_term_date(next_year, 0), 12),  # 小寒 -> 丑月
-        ]
-
-        month_index = 12  # 默认丑月（兜底）
-        for boundary, idx in boundaries:
-            if birth_date >= boundary:
-                month_index = idx
-            else:
-                break
+        # 立春=寅月(1)、惊蛰=卯月(2)……大雪=子月(11)、小寒=丑月(12)；中气不换月
+        interval = find_solar_term_interval(birth_date)
+        jie_index = interval.term_index - interval.term_index % 2
+        month_index = (jie_index - 2) % 24 // 2 + 1
 
         return month_index
     
@@ -290,23 +263,7 @@ class BaZiChart:
     def _get_prev_next_jieqi(self, dt: datetime) -> Tuple[datetime, datetime]:
         """获取某时刻前后最近的“节”（12节，不含中气）"""
         # 12节索引：小寒、立春、惊蛰、清明、立夏、芒种、小暑、立秋、白露、寒露、立冬、大雪
-        jie_indexes = [0, 2, 4, 6, 8, 10, 12, 14, 16, 18, 20, 22]
-
-        candidates = []
-        for y in (dt.year - 1, dt.year, dt.year + 1):
-            for idx in jie_indexes:
-                candidates.append(get_solar_term_date(y, idx))
-        candidates.sort()
-
-        prev_jie = candidates[0]
-        next_jie = candidates[-1]
-        for term_dt in candidates:
-            if term_dt <= dt:
-                prev_jie = term_dt
-            if term_dt > dt:
-                next_jie = term_dt
-                break
-
+        prev_jie, next_jie = get_prev_next_jie(dt)
         return prev_jie, next_jie
     
     def get_nayin_all(self) -> Dict[str, str]:
@@ -530,11 +487,11 @@ class BaZiChart:
             }
         }
     
-    def to_dict(self) -> Dict:
-        """转换为字典格式"""
+    def to_dict(self, include_calc_trace: bool = True) -> Dict:
+        """转换为字典格式；include_calc_trace=False 时跳过计算过程（响应裁剪用）"""
         lunar = solar_to_lunar(self.birth_year, self.birth_month, self.birth_day)
         
-        return {
+        result = {
             'birth_info': {
                 'solar': {
                     'year': self.birth_year,
@@ -563,8 +520,80 @@ class BaZiChart:
             'shishen': self.get_shishen(),
             'nayin': self.get_nayin_all(),
             'dayun': self.get_dayun(),
-            'calc_trace': self.get_calc_trace()
         }
+        if include_calc_trace:
+            result['calc_trace'] = self.get_calc_trace()
+        return result
+
+
+# 批量排盘用的干支序号表（与 ganzhi.get_month_ganzhi / get_hour_ganzhi 的口诀一致）
+_GANZHI_60 = [TIANGAN[index % 10] + DIZHI[index % 12] for index in range(60)]
+_MONTH_GAN_BASE = (2, 4, 6, 8, 0)  # 甲己丙作首，乙庚戊为头……按年干 % 5
+_HOUR_GAN_BASE = (0, 2, 4, 6, 8)   # 甲己还加甲，乙庚丙作初……按日干 % 5
+_DAY_BASE_ORDINAL = date(1900, 1, 1).toordinal()
+
+
+def compute_pillars_batch(births: Iterable[Sequence[int]]) -> List[Dict[str, Any]]:
+    """
+    批量计算四柱（不构造 BaZiChart）
+
+    Args:
+        births: (年, 月, 日, 时[, 分]) 序列；分钟不影响四柱
+
+    Returns:
+        与输入等长的列表，每项为 {'year','month','day','hour'}；
+        日期非法或超出节气表范围的记录返回 {'error': 原因}
+    """
+    records = list(births)
+
+    # 第一遍：把日期折算成日序号并在节气表中二分定位，非法日期保留异常信息
+    ordinals: List[Any] = []
+    for record in records:
+        try:
+            ordinal = date(record[0], record[1], record[2]).toordinal()
+        except (TypeError, ValueError, IndexError) as exc:
+            ordinals.append(exc)
+            continue
+        ordinals.append(ordinal)
+
+    term_indexes = [
+        solar_term_index_for_ordinal(ordinal) if isinstance(ordinal, int) else -1
+        for ordinal in ordinals
+    ]
+
+    results: List[Dict[str, Any]] = []
+    for record, ordinal, flat_index in zip(records, ordinals, term_indexes):
+        if not isinstance(ordinal, int):
+            results.append({'error': str(ordinal) or '日期格式错误'})
+            continue
+        hour = record[3]
+        if flat_index < 0:
+            results.append({'error': '节气日期仅支持 1900-2100'})
+            continue
+        if not 0 <= hour <= 23:
+            results.append({'error': 'hour must be between 0 and 23'})
+            continue
+
+        term_year, term_index = divmod(flat_index, 24)
+        term_year += SOLAR_TERM_FIRST_YEAR
+        # 立春（索引2）之前仍属上一干支年；中气不换月
+        year_for_ganzhi = term_year if term_index >= 2 else term_year - 1
+        month_index = (term_index - term_index % 2 - 2) % 24 // 2 + 1
+
+        year_gan_index = (year_for_ganzhi - 1984) % 10
+        month_gan_index = (_MONTH_GAN_BASE[year_gan_index % 5] + month_index - 1) % 10
+        day_index = (40 + ordinal - _DAY_BASE_ORDINAL) % 60
+        hour_zhi_index = (hour + 1) // 2 % 12
+        hour_gan_index = (_HOUR_GAN_BASE[day_index % 10 % 5] + hour_zhi_index) % 10
+
+        results.append({
+            'year': _GANZHI_60[(year_for_ganzhi - 1984) % 60],
+            'month': TIANGAN[month_gan_index] + DIZHI[(month_index + 1) % 12],
+            'day': _GANZHI_60[day_index],
+            'hour': TIANGAN[hour_gan_index] + DIZHI[hour_zhi_index],
+        })
+
+    return results
 
 
 if __name__ == "__main__":
@@ -3,8 +3,10 @@
 Lunar-Solar Calendar Conversion
 """
 
-from datetime import datetime, timedelta
-from typing import Tuple
+from array import array
+from bisect import bisect_right
+from datetime import date, datetime
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
 
 # 农历数据：1900-2100年
 # 每个数字的后12位表示12个月（1=大月30天，0=小月29天）
@@ -136,64 +138,89 @@ def lunar_month_days(year: int, month: int) -> int:
         return 29
 
 
+# 基准日期：1900年1月31日，农历1900年正月初一
+LUNAR_BASE_DATE = datetime(1900, 1, 31)
+LUNAR_LAST_SOLAR_DATE = datetime(2100, 12, 31)
+_LUNAR_BASE_ORDINAL = LUNAR_BASE_DATE.toordinal()
+_LUNAR_LAST_ORDINAL = LUNAR_LAST_SOLAR_DATE.toordinal()
+
+
+def _build_lunar_month_index() -> Tuple[array, array, array, array]:
+    """
+    由 LUNAR_INFO 预计算农历月序索引（闰月按实际顺序插在本月之后）：
+    - month_offsets: 每个农历月首日距基准日的天数，末尾附一个哨兵（2100年末之后）
+    - month_years / month_numbers: 对应的农历年与月份，闰月记为负数
+    - year_slots: 每个农历年第一个月在 month_offsets 中的下标（末尾同样附哨兵）
+    """
+    month_offsets = array('i')
+    month_years = array('h')
+    month_numbers = array('b')
+    year_slots = array('i')
+    offset = 0
+    for year in range(1900, 2101):
+        year_slots.append(len(month_offsets))
+        leap = leap_month(year)
+        for month in range(1, 13):
+            month_offsets.append(offset)
+            month_years.append(year)
+            month_numbers.append(month)
+            offset += lunar_month_days(year, month)
+            if month == leap:
+                month_offsets.append(offset)
+                month_years.append(year)
+                month_numbers.append(-month)
+                offset += leap_days(year)
+    year_slots.append(len(month_offsets))
+    month_offsets.append(offset)
+    return month_offsets, month_years, month_numbers, year_slots
+
+
+_LUNAR_MONTH_OFFSETS, _LUNAR_MONTH_YEARS, _LUNAR_MONTH_NUMBERS, _LUNAR_YEAR_SLOTS = _build_lunar_month_index()
+
+
+def _lunar_from_offset(offset: int) -> Tuple[int, int, int, bool]:
+    slot = bisect_right(_LUNAR_MONTH_OFFSETS, offset) - 1
+    month = _LUNAR_MONTH_NUMBERS[slot]
+    return (
+        _LUNAR_MONTH_YEARS[slot],
+        abs(month),
+        offset - _LUNAR_MONTH_OFFSETS[slot] + 1,
+        month < 0,
+    )
+
+
 def solar_to_lunar(year: int, month: int, day: int) -> Tuple[int, int, int, bool]:
     """
-    阳历转农历
+    阳历转农历（预计算月序索引 + 二分查找）
     返回: (农历年, 农历月, 农历日, 是否闰月)
     """
-    # 基准日期：1900年1月31日，农历1900年正月初一
-    base_date = datetime(1900, 1, 31)
-    target_date = datetime(year, month, day)
-    if target_date < base_date or target_date > datetime(2100, 12, 31):
+    ordinal = datetime(year, month, day).toordinal()
+    if ordinal < _LUNAR_BASE_ORDINAL or ordinal > _LUNAR_LAST_ORDINAL:
         raise ValueError("仅支持 1900-01-31 到 2100-12-31 的日期")
-    
-    offset = (target_date - base_date).days
-    
-    # 计算农历年份
-    lunar_year = 1900
-    temp = 0
-    while lunar_year < 2101 and offset > 0:
-        temp = lunar_year_days(lunar_year)
-        offset -= temp
-        lunar_year += 1
-    
-    if offset < 0:
-        offset += temp
-        lunar_year -= 1
-    
-    # 计算农历月份
-    leap = leap_month(lunar_year)
-    is_leap = False
-    lunar_month = 1
-    
-    while lunar_month < 13 and offset > 0:
-        # 闰月
-        if leap > 0 and lunar_month == (leap + 1) and not is_leap:
-            lunar_month -= 1
-            is_leap = True
-            temp = leap_days(lunar_year)
-        else:
-            temp = lunar_month_days(lunar_year, lunar_month)
-        
-        # 解除闰月
-        if is_leap and lunar_month == (leap + 1):
-            is_leap = False
-        
-        offset -= temp
-        lunar_month += 1
-    
-    if offset < 0:
-        offset += temp
-        lunar_month -= 1
-    
-    lunar_day = offset + 1
-    
-    return (lunar_year, lunar_month, lunar_day, is_leap)
+
+    return _lunar_from_offset(ordinal - _LUNAR_BASE_ORDINAL)
+
+
+SolarDateLike = Union[date, Sequence[int]]
+
+
+def solar_to_lunar_batch(dates: Iterable[SolarDateLike]) -> List[Tuple[int, int, int, bool]]:
+    """
+    批量阳历转农历，供报表类任务一次性转换整列日期
+    dates: date/datetime 对象或 (年, 月, 日) 三元组
+    """
+    results: List[Tuple[int, int, int, bool]] = []
+    for index, item in enumerate(dates):
+        ordinal = item.toordinal() if isinstance(item, date) else date(*item[:3]).toordinal()
+        if ordinal < _LUNAR_BASE_ORDINAL or ordinal > _LUNAR_LAST_ORDINAL:
+            raise ValueError(f"第{index + 1}个日期超出范围：仅支持 1900-01-31 到 2100-12-31 的日期")
+        results.append(_lunar_from_offset(ordinal - _LUNAR_BASE_ORDINAL))
+    return results
 
 
 def lunar_to_solar(year: int, month: int, day: int, is_leap: bool = False) -> Tuple[int, int, int]:
     """
-    农历转阳历
+    农历转阳历（预计算月序索引，纯算术）
     返回: (阳历年, 阳历月, 阳历日)
     """
     if year < 1900 or year > 2100:
@@ -209,44 +236,20 @@ def lunar_to_solar(year: int, month: int, day: int, is_leap: bool = False) -> Tu
     if day < 1 or day > max_day:
         raise ValueError(f"农历日期超出范围：{year}年{month}月最多{max_day}天")
 
-    # 基准日期：1900年1月31日，农历1900年正月初一
-    base_date = datetime(1900, 1, 31)
-    
-    offset = 0
-    
-    # 累加年份天数
-    for y in range(1900, year):
-        offset += lunar_year_days(y)
-    
-    # 累加月份天数
-    leap = leap_month(year)
-    for m in range(1, month):
-        offset += lunar_month_days(year, m)
-        # 如果是闰月之后的月份，加上闰月天数
-        if leap > 0 and m == leap:
-            offset += leap_days(year)
-    
-    # 如果当前是闰月
-    if is_leap and leap == month:
-        offset += lunar_month_days(year, month)
-    
-    # 加上日期
-    offset += day - 1
-    
-    result_date = base_date + timedelta(days=offset)
+    # 闰月及其之后的月份在月序中顺延一位
+    slot = _LUNAR_YEAR_SLOTS[year - 1900] + month - 1
+    if is_leap or (leap > 0 and month > leap):
+        slot += 1
+
+    result_date = date.fromordinal(_LUNAR_BASE_ORDINAL + _LUNAR_MONTH_OFFSETS[slot] + day - 1)
     return (result_date.year, result_date.month, result_date.day)
 
 
-def get_solar_term_date(year: int, term_index: int) -> datetime:
+def _compute_solar_term_date(year: int, term_index: int) -> datetime:
     """
-    获取节气日期（寿星公式近似法）
+    按寿星公式推算节气日期（节气表的唯一数据来源）
     term_index: 0-23 (小寒到冬至)
     """
-    if year < 1900 or year > 2100:
-        raise ValueError("节气日期仅支持 1900-2100")
-    if term_index < 0 or term_index >= len(SOLAR_TERMS):
-        raise ValueError("term_index must be between 0 and 23")
-
     century = 20 if year <= 1999 else 21
     coefficient = SOLAR_TERM_CENTURY_COEFFICIENTS[century][term_index]
     year_offset = year % 100
@@ -258,6 +261,93 @@ def get_solar_term_date(year: int, term_index: int) -> datetime:
     return datetime(year, month, day)
 
 
+SOLAR_TERM_FIRST_YEAR = 1900
+SOLAR_TERM_LAST_YEAR = 2100
+
+
+def _build_solar_term_table() -> array:
+    """
+    预计算 1900-2100 年全部 24 节气，按时间顺序平铺存放日序号（date.toordinal）。
+    下标 = (year - 1900) * 24 + term_index，节气均落在当日 00:00。
+    """
+    table = array('i')
+    for year in range(SOLAR_TERM_FIRST_YEAR, SOLAR_TERM_LAST_YEAR + 1):
+        for term_index in range(len(SOLAR_TERMS)):
+            table.append(_compute_solar_term_date(year, term_index).toordinal())
+    return table
+
+
+_SOLAR_TERM_ORDINALS = _build_solar_term_table()
+
+
+class SolarTermInterval(NamedTuple):
+    """某时刻所在的节气区间：[start, end)，start 为该节气交节时刻。"""
+    year: int
+    term_index: int
+    start: datetime
+    end: Optional[datetime]
+
+    @property
+    def name(self) -> str:
+        return SOLAR_TERMS[self.term_index]
+
+
+def _solar_term_at(flat_index: int) -> datetime:
+    return datetime.fromordinal(_SOLAR_TERM_ORDINALS[flat_index])
+
+
+def get_solar_term_date(year: int, term_index: int) -> datetime:
+    """
+    获取节气日期（查预计算节气表，O(1)）
+    term_index: 0-23 (小寒到冬至)
+    """
+    if year < SOLAR_TERM_FIRST_YEAR or year > SOLAR_TERM_LAST_YEAR:
+        raise ValueError("节气日期仅支持 1900-2100")
+    if term_index < 0 or term_index >= len(SOLAR_TERMS):
+        raise ValueError("term_index must be between 0 and 23")
+
+    return _solar_term_at((year - SOLAR_TERM_FIRST_YEAR) * len(SOLAR_TERMS) + term_index)
+
+
+def find_solar_term_interval(moment: datetime) -> SolarTermInterval:
+    """
+    二分查找某时刻所在的节气区间（最近一个已交节的节气及下一个节气）
+    超出节气表末尾时 end 为 None
+    """
+    flat_index = solar_term_index_for_ordinal(moment.toordinal())
+    if flat_index < 0:
+        raise ValueError("节气日期仅支持 1900-2100")
+
+    year, term_index = divmod(flat_index, len(SOLAR_TERMS))
+    next_index = flat_index + 1
+    end = _solar_term_at(next_index) if next_index < len(_SOLAR_TERM_ORDINALS) else None
+    return SolarTermInterval(
+        year=year + SOLAR_TERM_FIRST_YEAR,
+        term_index=term_index,
+        start=_solar_term_at(flat_index),
+        end=end,
+    )
+
+
+def solar_term_index_for_ordinal(ordinal: int) -> int:
+    """
+    返回某日（date.toordinal）所在节气在平铺节气表中的下标，
+    即 (year - 1900) * 24 + term_index；早于 1900 年小寒时返回 -1
+    """
+    return bisect_right(_SOLAR_TERM_ORDINALS, ordinal) - 1
+
+
+def get_prev_next_jie(moment: datetime) -> Tuple[datetime, datetime]:
+    """获取某时刻前后最近的“节”（偶数索引的 12 节，不含中气）"""
+    interval = find_solar_term_interval(moment)
+    flat_index = (interval.year - SOLAR_TERM_FIRST_YEAR) * len(SOLAR_TERMS) + interval.term_index
+    prev_index = flat_index - interval.term_index % 2
+    next_index = prev_index + 2
+    if next_index >= len(_SOLAR_TERM_ORDINALS):
+        raise ValueError("节气日期仅支持 1900-2100")
+    return _solar_term_at(prev_index), _solar_term_at(next_index)
+
+
 def get_lichun_date(year: int) -> datetime:
     """获取立春日期（八字年份的分界点）"""
     return get_solar_term_date(year, 2)  # 立春是第3个节气（索引2）
@@ -0,0 +1,112 @@
+"""
+排盘结果缓存
+Bounded in-process LRU (+ TTL) for computed chart dicts keyed by birth datetime, gender and engine version.
+
+同一份出生信息常在几分钟内先后请求八字、紫微、AI 增强与统一问事，排盘（尤其紫微 iztro）
+只算一次。缓存里的 dict 不对外暴露，读写都做深拷贝，调用方可以随意修改拿到的结果。
+
+缓存只存在于构建它的进程里。COMPUTE_EXECUTOR_KIND=process 时排盘在工作进程中执行，
+每个工作进程各有一份缓存，主进程的 chart_cache 始终为空，/api/system/runtime 与
+/api/system/metrics 报告的命中数为 0（runtime 接口用 worker_local 标出这种情况）。
+
+环境变量：
+- CHART_CACHE_MAX_ENTRIES: 条数上限，默认 512；0 关闭缓存
+- CHART_CACHE_TTL_SECONDS: 过期时间（秒），默认 3600
+"""
+
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+# 排盘算法或输出结构变化时递增，旧缓存自然失效
+CHART_ENGINE_VERSION = 1
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_TTL_SECONDS = 3600.0
+
+
+def _env_number(name: str, default: float) -> float:
+    raw = os.getenv(name)
+    if raw is None or not raw.strip():
+        return default
+    try:
+        return max(0.0, float(raw))
+    except ValueError:
+        return default
+
+
+class ChartCache:
+    def __init__(self, max_entries: Optional[int] = None, ttl_seconds: Optional[float] = None):
+        self.max_entries = int(_env_number("CHART_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)) if max_entries is None else max_entries
+        self.ttl_seconds = _env_number("CHART_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS) if ttl_seconds is None else ttl_seconds
+        self._entries: "OrderedDict[Tuple[Hashable, ...], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _count(self, kind: str, name: str) -> None:
+        counters = self._counters.setdefault(kind, {"hits": 0, "misses": 0, "evictions": 0, "expired": 0})
+        counters[name] += 1
+
+    def get_or_build(self, kind: str, key: Tuple[Hashable, ...], builder: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """命中返回副本；未命中在锁外构建再写入（并发未命中可能重复构建，结果相同）。"""
+        if not self.enabled:
+            return builder()
+        full_key = (kind, CHART_ENGINE_VERSION) + tuple(key)
+        now = time.monotonic()
+        cached: Optional[Dict[str, Any]] = None
+        with self._lock:
+            entry = self._entries.get(full_key)
+            if entry is not None and self.ttl_seconds and now - entry[0] > self.ttl_seconds:
+                del self._entries[full_key]
+                self._count(kind, "expired")
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(full_key)
+                self._count(kind, "hits")
+                cached = entry[1]
+            else:
+                self._count(kind, "misses")
+        if cached is not None:
+            return copy.deepcopy(cached)
+
+        result = builder()
+        stored = copy.deepcopy(result)
+        with self._lock:
+            self._entries[full_key] = (now, stored)
+            self._entries.move_to_end(full_key)
+            while len(self._entries) > self.max_entries:
+                evicted_key, _ = self._entries.popitem(last=False)
+                self._count(evicted_key[0], "evictions")
+        return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._counters.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            kinds = {kind: dict(counters) for kind, counters in self._counters.items()}
+            entries = len(self._entries)
+        for counters in kinds.values():
+            lookups = counters["hits"] + counters["misses"]
+            counters["hit_rate"] = round(counters["hits"] / lookups, 4) if lookups else 0.0
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "engine_version": CHART_ENGINE_VERSION,
+            "kinds": kinds,
+        }
+
+
+chart_cache = ChartCache()
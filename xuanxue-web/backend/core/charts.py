@@ -0,0 +1,48 @@
+"""
+排盘结果组装
+Module-level (picklable) builders so chart work can run inside the compute executor.
+"""
+
+from typing import Any, Dict
+
+from .bazi_advanced import get_advanced_analysis
+from .bazi_core import BaZiChart
+from .chart_cache import chart_cache
+from .consult.summarizers import generate_simple_analysis
+from .ziwei import ZiWeiChart, analyze_ziwei_chart
+
+
+def _build_bazi_result(year: int, month: int, day: int, hour: int, minute: int, gender: str, include_calc_trace: bool, include_advanced: bool) -> Dict[str, Any]:
+    chart = BaZiChart(year, month, day, hour, minute, gender)
+    result = chart.to_dict(include_calc_trace=include_calc_trace)
+    result["analysis"] = generate_simple_analysis(chart)
+    if include_advanced:
+        result["advanced_analysis"] = get_advanced_analysis(chart)
+    return result
+
+
+def build_bazi_result(
+    year: int,
+    month: int,
+    day: int,
+    hour: int,
+    minute: int,
+    gender: str,
+    include_calc_trace: bool = True,
+    include_advanced: bool = True,
+) -> Dict[str, Any]:
+    """八字排盘 + 基础分析 + 进阶分析；响应裁剪掉的部分直接不算，结果经排盘缓存复用。"""
+    args = (year, month, day, hour, minute, gender, include_calc_trace, include_advanced)
+    return chart_cache.get_or_build("bazi", args, lambda: _build_bazi_result(*args))
+
+
+def _build_ziwei_result(year: int, month: int, day: int, hour: int, minute: int, gender: str) -> Dict[str, Any]:
+    result = ZiWeiChart(year, month, day, hour, minute, gender).to_dict()
+    result["analysis"] = analyze_ziwei_chart(result)
+    return result
+
+
+def build_ziwei_result(year: int, month: int, day: int, hour: int, minute: int, gender: str) -> Dict[str, Any]:
+    """紫微斗数排盘 + 分析（iztro 排盘较重，经排盘缓存复用）。"""
+    args = (year, month, day, hour, minute, gender)
+    return chart_cache.get_or_build("ziwei", args, lambda: _build_ziwei_result(*args))
@@ -2,8 +2,7 @@ import json
 from datetime import datetime
 from typing import Any, Dict
 
-from ..bazi_advanced import get_advanced_analysis
-from ..bazi_core import BaZiChart
+from .. import charts
 from ..decision_log import append_decision_log
 from ..decision.kernel import build_unified_world_model
 from ..decision.kernel import build_visual_rule_scores
@@ -12,13 +11,13 @@ from ..decision.weight_tuning import resolve_effective_weight_presets
 from ..liuyao import divine
 from ..llm_helper import llm_helper
 from ..meihua import divine_meihua
+from ..runtime.metrics import SpanRecorder
 from ..qimen import divine_qimen
-from ..ziwei import ZiWeiChart, analyze_ziwei_chart
 from ..zeri import find_auspicious_days, get_today_fortune
+from .fanout import ModuleTask, run_module_graph
 from .models import UnifiedConsultRequest
 from .router import infer_consult_modules, normalize_matter_type, normalize_purpose
 from .summarizers import (
-    generate_simple_analysis,
     summarize_bazi_result,
     summarize_fengshui_result,
     summarize_liuyao_result,
@@ -28,7 +27,7 @@ from .summarizers import (
     summarize_ziwei_result,
     summarize_zeri_result,
 )
-from .trace import build_trace_graph
+from .trace import build_consultation_trace
 
 
 def has_complete_birth_payload(payload: UnifiedConsultRequest) -> bool:
@@ -75,10 +74,203 @@ def fallback_consultation_summary(question: str, module_summaries: Dict[str, Any
     return "\n".join(lines)
 
 
+def build_visual_result(visual_context: Dict[str, Any]) -> Dict[str, Any]:
+    """把前端传入的图片观察结果整理成统一问事的 visual 模块结果（纯数据整理，不做计算）。"""
+    if visual_context.get("mode") == "bundle":
+        items = []
+        for item in visual_context.get("items", []) or []:
+            item_rule_scores = item.get("rule_scores", {}) or build_visual_rule_scores({
+                "mode": item.get("mode"),
+                "structure": item.get("structure", {}),
+            })
+            items.append({
+                "mode": item.get("mode"),
+                "mode_label": {
+                    "space": "空间 / 风水观察",
+                    "palm": "手相参考",
+                    "face": "面相参考",
+                }.get(item.get("mode"), "视觉观察"),
+                "question": item.get("question", ""),
+                "location": item.get("location", ""),
+                "scene_type": item.get("scene_type", ""),
+                "image_name": item.get("image_name", ""),
+                "analysis": item.get("analysis", ""),
+                "structure": item.get("structure", {}),
+                "rule_scores": item_rule_scores,
+            })
+        visual_result = {
+            "mode": "bundle",
+            "mode_label": "多维视觉观察",
+            "question": visual_context.get("question", ""),
+            "location": visual_context.get("location", ""),
+            "scene_type": visual_context.get("scene_type", ""),
+            "image_name": visual_context.get("image_name", ""),
+            "analysis": visual_context.get("analysis", ""),
+            "disclaimer": visual_context.get("disclaimer", ""),
+            "items": items,
+            "calc_trace": {
+                "structure": {
+                    "formula": "对三类图片分别做结构化提取，抽取可见空间/掌纹/面部特征，再汇总入统一问事。",
+                    "input": {
+                        "count": len(items),
+                        "modes": [item.get("mode", "") for item in items],
+                    },
+                    "result": {item.get("mode", ""): item.get("structure", {}) for item in items},
+                },
+                "rule_scores": {
+                    "formula": "将每类图片的结构提取结果映射成对应规则分表，再供统一决策核吸收。",
+                    "input": {item.get("mode", ""): item.get("structure", {}) for item in items},
+                    "result": {item.get("mode", ""): item.get("rule_scores", {}) for item in items},
+                },
+                "image": {
+                    "formula": "图片观察结果由多模态模型基于可见特征生成，作为统一问事的补充输入。",
+                    "input": {
+                        "modes": [item.get("mode", "") for item in items],
+                        "image_names": [item.get("image_name", "") for item in items],
+                    },
+                    "result": {
+                        "summary": visual_context.get("analysis", "")[:240],
+                    },
+                }
+            },
+        }
+    else:
+        visual_result = {
+            "mode": visual_context.get("mode"),
+            "mode_label": {
+                "space": "空间 / 风水观察",
+                "palm": "手相参考",
+                "face": "面相参考",
+            }.get(visual_context.get("mode"), "视觉观察"),
+            "question": visual_context.get("question", ""),
+            "location": visual_context.get("location", ""),
+            "scene_type": visual_context.get("scene_type", ""),
+            "image_name": visual_context.get("image_name", ""),
+            "analysis": visual_context.get("analysis", ""),
+            "disclaimer": visual_context.get("disclaimer", ""),
+            "structure": visual_context.get("structure", {}),
+            "rule_scores": visual_context.get("rule_scores", {}) or build_visual_rule_scores({
+                "mode": visual_context.get("mode"),
+                "structure": visual_context.get("structure", {}),
+            }),
+            "calc_trace": {
+                "structure": {
+                    "formula": "先对图片做结构化提取，抽取可见空间/掌纹/面部特征，再供统一问事吸收。",
+                    "input": {
+                        "mode": visual_context.get("mode", ""),
+                        "image_name": visual_context.get("image_name", ""),
+                    },
+                    "result": visual_context.get("structure", {}),
+                },
+                "rule_scores": {
+                    "formula": "将结构提取结果映射为空间支持度、风险暴露或参考可信度等规则分表。",
+                    "input": visual_context.get("structure", {}),
+                    "result": visual_context.get("rule_scores", {}) or build_visual_rule_scores({
+                        "mode": visual_context.get("mode"),
+                        "structure": visual_context.get("structure", {}),
+                    }),
+                },
+                "image": {
+                    "formula": "图片观察结果由多模态模型基于可见特征生成，作为统一问事的补充输入。",
+                    "input": {
+                        "mode": visual_context.get("mode", ""),
+                        "image_name": visual_context.get("image_name", ""),
+                        "location": visual_context.get("location", ""),
+                        "scene_type": visual_context.get("scene_type", ""),
+                    },
+                    "result": {
+                        "summary": visual_context.get("analysis", "")[:200],
+                    },
+                }
+            },
+        }
+    return visual_result
+
+
+# module_results / module_summaries 的输出顺序，与并发完成先后无关
+MODULE_ORDER = ("bazi", "ziwei", "fengshui", "visual", "liuyao", "meihua", "qimen", "zeri")
+
+
+# 以下模块任务均为模块级函数，只做计算、返回结果，可在线程池或进程池中执行
+def run_bazi_module(year: int, month: int, day: int, hour: int, minute: int, gender: str) -> Dict[str, Any]:
+    # 与 /api/bazi、/api/ziwei 共用排盘缓存
+    return charts.build_bazi_result(year, month, day, hour, minute, gender)
+
+
+def run_ziwei_module(year: int, month: int, day: int, hour: int, minute: int, gender: str) -> Dict[str, Any]:
+    return charts.build_ziwei_result(year, month, day, hour, minute, gender)
+
+
+def run_fengshui_module(question: str, location: str) -> Dict[str, Any]:
+    return FengShuiReading(
+        question=question,
+        location=location,
+        orientation="",
+        scene_type="office" if any(term in question for term in ["办公室", "工位", "办公"]) else "home" if any(term in question for term in ["住宅", "搬家", "入宅", "家里"]) else "generic",
+        layout_note=question,
+    ).to_dict()
+
+
+def run_liuyao_module(question: str) -> Dict[str, Any]:
+    return divine(question)
+
+
+def run_meihua_module(question: str) -> Dict[str, Any]:
+    return divine_meihua(question=question, method="time")
+
+
+def run_qimen_module(matter_type: str) -> Dict[str, Any]:
+    now = datetime.now()
+    return divine_qimen(now.year, now.month, now.day, now.hour, now.minute, matter_type)
+
+
+def run_zeri_module(purpose: str) -> Dict[str, Any]:
+    today = datetime.now()
+    today_fortune = get_today_fortune(today.year, today.month, today.day)
+    purpose_days = find_auspicious_days(today.year, today.month, purpose, 14) if purpose != "通用" else []
+    return {
+        "today_fortune": today_fortune,
+        "auspicious_days": purpose_days[:5],
+    }
+
+
+def summarize_module(name: str, result: Dict[str, Any], matter_type: str, purpose: str) -> Dict[str, Any]:
+    """模块结果 → 摘要；摘要很轻，放在编排线程里统一计时。"""
+    if name == "bazi":
+        return summarize_bazi_result(result)
+    if name == "ziwei":
+        return summarize_ziwei_result(result)
+    if name == "fengshui":
+        return summarize_fengshui_result(result)
+    if name == "visual":
+        return summarize_visual_result(result)
+    if name == "liuyao":
+        return summarize_liuyao_result(result)
+    if name == "meihua":
+        return summarize_meihua_result(result)
+    if name == "qimen":
+        return summarize_qimen_result(result, matter_type)
+    if name == "zeri":
+        zeri_summary = summarize_zeri_result(result["today_fortune"], purpose)
+        if result["auspicious_days"]:
+            zeri_summary["candidate_days"] = [
+                {
+                    "date": item.get("date", ""),
+                    "weekday": item.get("weekday", ""),
+                    "level": item.get("level", ""),
+                    "score": item.get("score", 0),
+                }
+                for item in result["auspicious_days"]
+            ]
+        return zeri_summary
+    raise ValueError(f"unknown consult module: {name}")
+
+
 class ConsultationEngine:
     """统一问事编排器。"""
 
-    def consult(self, payload: UnifiedConsultRequest) -> Dict[str, Any]:
+    def consult(self, payload: UnifiedConsultRequest, include_trace: bool = True) -> Dict[str, Any]:
+        spans = SpanRecorder()
         question = payload.question.strip()
         has_birth = has_complete_birth_payload(payload)
         matter_type = normalize_matter_type(question, payload.matter_type)
@@ -101,11 +293,9 @@ class ConsultationEngine:
             "visual_context": payload.visual_context.model_dump() if payload.visual_context else None,
         }
 
-        module_results: Dict[str, Any] = {}
-        module_summaries: Dict[str, Any] = {}
-
-        if "bazi" in modules and has_birth:
-            chart = BaZiChart(
+        tasks: Dict[str, ModuleTask] = {}
+        if has_birth:
+            birth = (
                 payload.year,
                 payload.month,
                 payload.day,
@@ -113,229 +303,68 @@ class ConsultationEngine:
                 payload.minute or 0,
                 payload.gender or "男",
             )
-            bazi_result = chart.to_dict()
-            bazi_result["analysis"] = generate_simple_analysis(chart)
-            bazi_result["advanced_analysis"] = get_advanced_analysis(chart)
-            module_results["bazi"] = bazi_result
-            module_summaries["bazi"] = summarize_bazi_result(bazi_result)
-
-        if "ziwei" in modules and has_birth:
-            ziwei_chart = ZiWeiChart(
-                payload.year,
-                payload.month,
-                payload.day,
-                payload.hour,
-                payload.minute or 0,
-                payload.gender or "男",
-            )
-            ziwei_result = ziwei_chart.to_dict()
-            ziwei_result["analysis"] = analyze_ziwei_chart(ziwei_result)
-            module_results["ziwei"] = ziwei_result
-            module_summaries["ziwei"] = summarize_ziwei_result(ziwei_result)
-
+            if "bazi" in modules:
+                tasks["bazi"] = ModuleTask("bazi", run_bazi_module, birth)
+            if "ziwei" in modules:
+                tasks["ziwei"] = ModuleTask("ziwei", run_ziwei_module, birth)
         if "fengshui" in modules:
-            fengshui_result = FengShuiReading(
-                question=question,
-                location=payload.location or "",
-                orientation="",
-                scene_type="office" if any(term in question for term in ["办公室", "工位", "办公"]) else "home" if any(term in question for term in ["住宅", "搬家", "入宅", "家里"]) else "generic",
-                layout_note=question,
-            ).to_dict()
-            module_results["fengshui"] = fengshui_result
-            module_summaries["fengshui"] = summarize_fengshui_result(fengshui_result)
-
-        if payload.visual_context:
-            visual_context = payload.visual_context.model_dump()
-            if visual_context.get("mode") == "bundle":
-                items = []
-                for item in visual_context.get("items", []) or []:
-                    item_rule_scores = item.get("rule_scores", {}) or build_visual_rule_scores({
-                        "mode": item.get("mode"),
-                        "structure": item.get("structure", {}),
-                    })
-                    items.append({
-                        "mode": item.get("mode"),
-                        "mode_label": {
-                            "space": "空间 / 风水观察",
-                            "palm": "手相参考",
-                            "face": "面相参考",
-                        }.get(item.get("mode"), "视觉观察"),
-                        "question": item.get("question", ""),
-                        "location": item.get("location", ""),
-                        "scene_type": item.get("scene_type", ""),
-                        "image_name": item.get("image_name", ""),
-                        "analysis": item.get("analysis", ""),
-                        "structure": item.get("structure", {}),
-                        "rule_scores": item_rule_scores,
-                    })
-                visual_result = {
-                    "mode": "bundle",
-                    "mode_label": "多维视觉观察",
-                    "question": visual_context.get("question", ""),
-                    "location": visual_context.get("location", ""),
-                    "scene_type": visual_context.get("scene_type", ""),
-                    "image_name": visual_context.get("image_name", ""),
-                    "analysis": visual_context.get("analysis", ""),
-                    "disclaimer": visual_context.get("disclaimer", ""),
-                    "items": items,
-                    "calc_trace": {
-                        "structure": {
-                            "formula": "对三类图片分别做结构化提取，抽取可见空间/掌纹/面部特征，再汇总入统一问事。",
-                            "input": {
-                                "count": len(items),
-                                "modes": [item.get("mode", "") for item in items],
-                            },
-                            "result": {item.get("mode", ""): item.get("structure", {}) for item in items},
-                        },
-                        "rule_scores": {
-                            "formula": "将每类图片的结构提取结果映射成对应规则分表，再供统一决策核吸收。",
-                            "input": {item.get("mode", ""): item.get("structure", {}) for item in items},
-                            "result": {item.get("mode", ""): item.get("rule_scores", {}) for item in items},
-                        },
-                        "image": {
-                            "formula": "图片观察结果由多模态模型基于可见特征生成，作为统一问事的补充输入。",
-                            "input": {
-                                "modes": [item.get("mode", "") for item in items],
-                                "image_names": [item.get("image_name", "") for item in items],
-                            },
-                            "result": {
-                                "summary": visual_context.get("analysis", "")[:240],
-                            },
-                        }
-                    },
-                }
-            else:
-                visual_result = {
-                    "mode": visual_context.get("mode"),
-                    "mode_label": {
-                        "space": "空间 / 风水观察",
-                        "palm": "手相参考",
-                        "face": "面相参考",
-                    }.get(visual_context.get("mode"), "视觉观察"),
-                    "question": visual_context.get("question", ""),
-                    "location": visual_context.get("location", ""),
-                    "scene_type": visual_context.get("scene_type", ""),
-                    "image_name": visual_context.get("image_name", ""),
-                    "analysis": visual_context.get("analysis", ""),
-                    "disclaimer": visual_context.get("disclaimer", ""),
-                    "structure": visual_context.get("structure", {}),
-                    "rule_scores": visual_context.get("rule_scores", {}) or build_visual_rule_scores({
-                        "mode": visual_context.get("mode"),
-                        "structure": visual_context.get("structure", {}),
-                    }),
-                    "calc_trace": {
-                        "structure": {
-                            "formula": "先对图片做结构化提取，抽取可见空间/掌纹/面部特征，再供统一问事吸收。",
-                            "input": {
-                                "mode": visual_context.get("mode", ""),
-                                "image_name": visual_context.get("image_name", ""),
-                            },
-                            "result": visual_context.get("structure", {}),
-                        },
-                        "rule_scores": {
-                            "formula": "将结构提取结果映射为空间支持度、风险暴露或参考可信度等规则分表。",
-                            "input": visual_context.get("structure", {}),
-                            "result": visual_context.get("rule_scores", {}) or build_visual_rule_scores({
-                                "mode": visual_context.get("mode"),
-                                "structure": visual_context.get("structure", {}),
-                            }),
-                        },
-                        "image": {
-                            "formula": "图片观察结果由多模态模型基于可见特征生成，作为统一问事的补充输入。",
-                            "input": {
-                                "mode": visual_context.get("mode", ""),
-                                "image_name": visual_context.get("image_name", ""),
-                                "location": visual_context.get("location", ""),
-                                "scene_type": visual_context.get("scene_type", ""),
-                            },
-                            "result": {
-                                "summary": visual_context.get("analysis", "")[:200],
-                            },
-                        }
-                    },
-                }
-            module_results["visual"] = visual_result
-            module_summaries["visual"] = summarize_visual_result(visual_result)
-            if "visual" not in modules:
-                modules.append("visual")
-
+            tasks["fengshui"] = ModuleTask("fengshui", run_fengshui_module, (question, payload.location or ""))
         if "liuyao" in modules:
-            liuyao_result = divine(question)
-            module_results["liuyao"] = liuyao_result
-            module_summaries["liuyao"] = summarize_liuyao_result(liuyao_result)
-
+            tasks["liuyao"] = ModuleTask("liuyao", run_liuyao_module, (question,))
         if "meihua" in modules:
-            meihua_result = divine_meihua(question=question, method="time")
-            module_results["meihua"] = meihua_result
-            module_summaries["meihua"] = summarize_meihua_result(meihua_result)
-
+            tasks["meihua"] = ModuleTask("meihua", run_meihua_module, (question,))
         if "qimen" in modules:
-            now = datetime.now()
-            qimen_result = divine_qimen(
-                now.year,
-                now.month,
-                now.day,
-                now.hour,
-                now.minute,
-                matter_type,
-            )
-            module_results["qimen"] = qimen_result
-            module_summaries["qimen"] = summarize_qimen_result(qimen_result, matter_type)
-
+            tasks["qimen"] = ModuleTask("qimen", run_qimen_module, (matter_type,))
         if "zeri" in modules:
-            today = datetime.now()
-            today_fortune = get_today_fortune(today.year, today.month, today.day)
-            purpose_days = find_auspicious_days(today.year, today.month, purpose, 14) if purpose != "通用" else []
-            zeri_result = {
-                "today_fortune": today_fortune,
-                "auspicious_days": purpose_days[:5],
-            }
-            module_results["zeri"] = zeri_result
-            module_summaries["zeri"] = summarize_zeri_result(today_fortune, purpose)
-            if purpose_days:
-                module_summaries["zeri"]["candidate_days"] = [
-                    {
-                        "date": item.get("date", ""),
-                        "weekday": item.get("weekday", ""),
-                        "level": item.get("level", ""),
-                        "score": item.get("score", 0),
-                    }
-                    for item in purpose_days[:5]
-                ]
+            tasks["zeri"] = ModuleTask("zeri", run_zeri_module, (purpose,))
+
+        visual_result = build_visual_result(payload.visual_context.model_dump()) if payload.visual_context else None
+        if visual_result is not None and "visual" not in modules:
+            modules.append("visual")
+
+        # 各模块互不依赖，并发执行；超时或出错的模块降级为缺席，不拖垮整次问事
+        with spans.span("modules"):
+            computed, module_timings = run_module_graph(tasks)
+        if visual_result is not None:
+            computed["visual"] = visual_result
+
+        module_results: Dict[str, Any] = {}
+        module_summaries: Dict[str, Any] = {}
+        with spans.span("summarizers"):
+            for name in MODULE_ORDER:
+                if name in computed:
+                    module_results[name] = computed[name]
+                    module_summaries[name] = summarize_module(name, computed[name], matter_type, purpose)
 
         ai_enabled = llm_helper.is_available()
         synthesis_context = build_consult_context(question, profile, module_summaries)
-        synthesis = llm_helper.chat(question, synthesis_context) if ai_enabled else None
+        with spans.span("llm"):
+            synthesis = llm_helper.chat(question, synthesis_context) if ai_enabled else None
         answer = synthesis or fallback_consultation_summary(question, module_summaries)
-        effective_weights = resolve_effective_weight_presets()
-        decision_kernel = build_unified_world_model(question, profile, module_summaries, weight_overrides=effective_weights)
-        trace = build_trace_graph(
-            question=question,
-            modules=modules,
-            profile=profile,
-            module_results=module_results,
-            module_summaries=module_summaries,
-            answer=answer,
-            ai_enabled=ai_enabled,
-            ai_synthesized=synthesis is not None,
-        )
-        decision_log = append_decision_log(
-            {
-                "question": question,
-                "profile": profile,
-                "intent": {
-                    "modules": modules,
-                    "matter_type": matter_type,
-                    "purpose": purpose,
-                },
-                "module_summaries": module_summaries,
-                "decision_kernel": decision_kernel,
-                "effective_weights": effective_weights,
-                "answer": answer,
-            }
-        )
-
-        return {
+        with spans.span("weights"):
+            effective_weights = resolve_effective_weight_presets()
+        with spans.span("world_model"):
+            decision_kernel = build_unified_world_model(
+                question, profile, module_summaries, weight_overrides=effective_weights, spans=spans
+            )
+        with spans.span("decision_log"):
+            decision_log = append_decision_log(
+                {
+                    "question": question,
+                    "profile": profile,
+                    "intent": {
+                        "modules": modules,
+                        "matter_type": matter_type,
+                        "purpose": purpose,
+                    },
+                    "module_summaries": module_summaries,
+                    "decision_kernel": decision_kernel,
+                    "effective_weights": effective_weights,
+                    "answer": answer,
+                }
+            )
+
+        result = {
             "question": question,
             "profile": profile,
             "intent": {
@@ -349,13 +378,19 @@ class ConsultationEngine:
             "effective_weights": effective_weights,
             "decision_log": decision_log,
             "answer": answer,
-            "trace": trace.to_dict(),
             "ai": {
                 "enabled": ai_enabled,
                 "synthesized": synthesis is not None,
                 "fallback": synthesis is None,
             },
         }
-
+        # 追溯图体积大、多数请求不看；include_trace=False 时留待 /api/system/consult/{id}/trace 按需构建
+        if include_trace:
+            with spans.span("trace"):
+                result["trace"] = {**build_consultation_trace(result).to_dict(), "module_timings": module_timings}
+        else:
+            result["trace"] = {"deferred": True, "module_timings": module_timings}
+        result["timings"] = {**spans.to_dict(), "modules": module_timings}
+        return result
 
 consultation_engine = ConsultationEngine()
@@ -0,0 +1,159 @@
+"""
+问事模块并发调度
+Dependency-aware fan-out of consult modules onto a thread / process pool with per-module timeouts.
+
+环境变量：
+- CONSULT_MODULE_EXECUTOR_KIND: thread（默认）或 process；process 模式下任务函数与参数必须可 pickle
+- CONSULT_MODULE_WORKERS: 池大小，默认 4
+- CONSULT_MODULE_TIMEOUT_SECONDS: 单模块超时（秒），默认 10；从模块开始运行时计起。
+  超时的模块只是被放弃、不会被中断，会继续占用一个池 worker 直到返回；
+  模块经常超时时应相应调大 CONSULT_MODULE_WORKERS
+- CONSULT_MODULE_TIMEOUT_<MODULE>: 单个模块的超时覆盖，如 CONSULT_MODULE_TIMEOUT_ZIWEI=20
+"""
+
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+
+DEFAULT_MODULE_TIMEOUT_SECONDS = 10.0
+DEFAULT_MODULE_WORKERS = 4
+# 排队中的模块多久检查一次是否已开始运行（超时从开始运行时计起）
+START_POLL_SECONDS = 0.01
+
+
+class ModuleTask(NamedTuple):
+    name: str
+    fn: Callable[..., Any]
+    args: Tuple[Any, ...] = ()
+    depends_on: Tuple[str, ...] = ()
+
+
+def _env_float(name: str, default: float) -> float:
+    raw = os.getenv(name)
+    if raw is None or not raw.strip():
+        return default
+    try:
+        value = float(raw)
+    except ValueError:
+        return default
+    return value if value > 0 else default
+
+
+def module_timeout(name: str) -> float:
+    default = _env_float("CONSULT_MODULE_TIMEOUT_SECONDS", DEFAULT_MODULE_TIMEOUT_SECONDS)
+    return _env_float(f"CONSULT_MODULE_TIMEOUT_{name.upper()}", default)
+
+
+_EXECUTOR: Optional[Executor] = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def get_module_executor() -> Executor:
+    """按需创建模块池；统一问事本身可能已在计算执行器的进程里，因此池按进程惰性创建。"""
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None:
+            workers = int(_env_float("CONSULT_MODULE_WORKERS", DEFAULT_MODULE_WORKERS))
+            kind = (os.getenv("CONSULT_MODULE_EXECUTOR_KIND") or "thread").strip().lower()
+            if kind == "process":
+                # 六爻 / 梅花起卦依赖 random，子进程各自重新播种
+                _EXECUTOR = ProcessPoolExecutor(max_workers=workers, initializer=random.seed)
+            else:
+                _EXECUTOR = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="consult-module")
+        return _EXECUTOR
+
+
+def shutdown_module_executor(wait: bool = True) -> None:
+    global _EXECUTOR
+    with _EXECUTOR_LOCK:
+        executor, _EXECUTOR = _EXECUTOR, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
+
+
+def _run_timed(fn: Callable[..., Any], args: Tuple[Any, ...]) -> Tuple[float, Any]:
+    started = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - started, result
+
+
+def run_module_graph(
+    tasks: Dict[str, ModuleTask],
+    executor: Optional[Executor] = None,
+) -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]:
+    """依赖满足即提交，互不依赖的模块并发执行。
+
+    返回 (results, timings)：results 只含成功的模块；timings 记录每个模块的状态
+    （ok / timeout / error / skipped）与自提交起的墙钟耗时。超时的模块不再等待，其下游标记为 skipped。
+
+    超时从模块开始运行时计起，排在其他模块后面的时间不算在内；排队超过同样时长仍未开始的模块直接取消。
+    已开始运行的模块超时后只是被放弃而非中断：它继续占用一个池 worker 直到自己返回，结果丢弃。
+    """
+    executor = executor or get_module_executor()
+    results: Dict[str, Any] = {}
+    timings: Dict[str, Dict[str, Any]] = {}
+    # future -> (模块名, 提交时刻, 开始运行时刻；尚在排队为 None)
+    running: Dict[Future, Tuple[str, float, Optional[float]]] = {}
+    pending = dict(tasks)
+
+    def settle(name: str, status: str, submitted: float, **extra: Any) -> None:
+        timings[name] = {"status": status, "seconds": round(time.perf_counter() - submitted, 4), **extra}
+
+    def submit_ready() -> None:
+        for name in list(pending):
+            task = pending[name]
+            failed_deps = [dep for dep in task.depends_on if dep in timings and timings[dep]["status"] != "ok"]
+            missing_deps = [dep for dep in task.depends_on if dep not in tasks]
+            if failed_deps or missing_deps:
+                del pending[name]
+                timings[name] = {"status": "skipped", "seconds": 0.0, "blocked_by": failed_deps + missing_deps}
+                continue
+            if all(dep in results for dep in task.depends_on):
+                del pending[name]
+                future = executor.submit(_run_timed, task.fn, task.args)
+                running[future] = (name, time.perf_counter(), None)
+
+    def next_deadline() -> float:
+        deadlines = []
+        for name, submitted, started in running.values():
+            if started is None:
+                # 排队中的模块要轮询是否已开始运行，同时受排队上限约束
+                deadlines.append(min(time.perf_counter() + START_POLL_SECONDS, submitted + module_timeout(name)))
+            else:
+                deadlines.append(started + module_timeout(name))
+        return min(deadlines)
+
+    submit_ready()
+    while running:
+        done, _ = wait(list(running), timeout=max(0.0, next_deadline() - time.perf_counter()), return_when=FIRST_COMPLETED)
+        for future in done:
+            name, submitted, _ = running.pop(future)
+            try:
+                run_seconds, value = future.result()
+            except Exception as exc:
+                settle(name, "error", submitted, error=f"{exc.__class__.__name__}: {exc}")
+                continue
+            results[name] = value
+            settle(name, "ok", submitted, run_seconds=round(run_seconds, 4))
+
+        now = time.perf_counter()
+        for future, (name, submitted, started) in list(running.items()):
+            timeout = module_timeout(name)
+            if started is None and future.running():
+                running[future] = (name, submitted, now)
+            elif started is None and submitted + timeout <= now and future.cancel():
+                running.pop(future)
+                settle(name, "timeout", submitted, timeout=timeout, queued=True)
+            elif started is not None and started + timeout <= now:
+                # 线程无法强行中断，放弃等待即可；结果返回后直接丢弃
+                running.pop(future)
+                settle(name, "timeout", submitted, timeout=timeout)
+        submit_ready()
+
+    for name in pending:
+        timings[name] = {"status": "skipped", "seconds": 0.0, "blocked_by": list(tasks[name].depends_on)}
+    return results, timings
@@ -278,6 +278,8 @@ def build_trace_graph(
     answer: str,
     ai_enabled: bool,
     ai_synthesized: bool,
+    decision_kernel: Optional[Dict[str, Any]] = None,
+    effective_weights: Optional[Dict[str, Any]] = None,
 ) -> TraceGraph:
     steps: List[TraceStep] = []
     brief_answer = _build_brief_answer(answer)
@@ -987,8 +989,11 @@ def build_trace_graph(
         "question": question,
         "module_summaries": module_summaries,
     }
-    effective_weights = resolve_effective_weight_presets()
-    decision_kernel = build_unified_world_model(question, profile, module_summaries, weight_overrides=effective_weights)
+    # 问事时已算好的决策内核直接复用，只有旧调用方未传入时才重算
+    if effective_weights is None:
+        effective_weights = resolve_effective_weight_presets()
+    if decision_kernel is None:
+        decision_kernel = build_unified_world_model(question, profile, module_summaries, weight_overrides=effective_weights)
     last_step = add_step(
         "environment",
         "环境修正",
@@ -1090,3 +1095,21 @@ def build_trace_graph(
         steps=steps,
         mermaid=_build_architecture_mermaid(steps, modules, ai_enabled),
     )
+
+
+def build_consultation_trace(consultation: Dict[str, Any]) -> TraceGraph:
+    """从问事结果（或持久化的追溯输入）重建追溯图，供按需追溯接口使用。"""
+    intent = consultation.get("intent") or {}
+    ai = consultation.get("ai") or {}
+    return build_trace_graph(
+        question=consultation.get("question") or "",
+        modules=list(intent.get("modules") or []),
+        profile=consultation.get("profile") or {},
+        module_results=consultation.get("modules") or {},
+        module_summaries=consultation.get("module_summaries") or {},
+        answer=consultation.get("answer") or "",
+        ai_enabled=bool(ai.get("enabled")),
+        ai_synthesized=bool(ai.get("synthesized")),
+        decision_kernel=consultation.get("decision_kernel"),
+        effective_weights=consultation.get("effective_weights"),
+    )
@@ -1,17 +1,16 @@
 """
 账号问事历史
-Per-user consultation history stored in JSONL.
+Per-user consultation history kept in the runtime store (JSONL or SQLite).
 """
 
 from datetime import datetime, timezone
 from typing import Any, Dict, List, Optional
 from uuid import uuid4
 
-from .runtime.store import append_jsonl, read_jsonl, resolve_runtime_path
+from .runtime.store import get_runtime_store
 
 
-def _history_path():
-    return resolve_runtime_path("CONSULT_HISTORY_PATH", "consult_history.jsonl")
+COLLECTION = "consult_history"
 
 
 def _now_iso() -> str:
@@ -53,7 +52,7 @@ def append_consult_history(user_id: str, consultation: Dict[str, Any]) -> Dict[s
         "module_summaries": consultation.get("module_summaries") or {},
         "ai": consultation.get("ai") or {},
     }
-    append_jsonl(_history_path(), payload)
+    get_runtime_store().append(COLLECTION, payload)
     return {
         "saved": True,
         "history_id": history_id,
@@ -74,26 +73,21 @@ def _history_list_item(entry: Dict[str, Any]) -> Dict[str, Any]:
 
 
 def list_consult_history(user_id: str, limit: int = 20) -> List[Dict[str, Any]]:
-    entries = [
-        item for item in read_jsonl(_history_path())
-        if item.get("user_id") == user_id
-    ]
-    items = [_history_list_item(item) for item in reversed(entries)]
-    return items[:limit]
+    entries = get_runtime_store().query(COLLECTION, {"user_id": user_id}, limit=limit)
+    return [_history_list_item(item) for item in entries]
 
 
 def get_consult_history_detail(user_id: str, history_id: str) -> Optional[Dict[str, Any]]:
-    for item in reversed(read_jsonl(_history_path())):
-        if item.get("user_id") == user_id and item.get("history_id") == history_id:
-            return {
-                "history_id": item.get("history_id"),
-                "created_at": item.get("created_at"),
-                "question": item.get("question") or "",
-                "brief_answer": item.get("brief_answer") or "",
-                "answer": item.get("answer") or "",
-                "intent": item.get("intent") or {},
-                "profile": item.get("profile") or {},
-                "module_summaries": item.get("module_summaries") or {},
-                "ai": item.get("ai") or {},
-            }
+    for item in get_runtime_store().query(COLLECTION, {"user_id": user_id, "history_id": history_id}, limit=1):
+        return {
+            "history_id": item.get("history_id"),
+            "created_at": item.get("created_at"),
+            "question": item.get("question") or "",
+            "brief_answer": item.get("brief_answer") or "",
+            "answer": item.get("answer") or "",
+            "intent": item.get("intent") or {},
+            "profile": item.get("profile") or {},
+            "module_summaries": item.get("module_summaries") or {},
+            "ai": item.get("ai") or {},
+        }
     return None
@@ -0,0 +1,81 @@
+"""
+问事追溯按需构建
+Persists the minimal inputs of a consultation and builds its trace graph on first request.
+
+环境变量：
+- CONSULT_TRACE_CACHE_SIZE: 进程内已构建追溯图的缓存条数，默认 128
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from .consult.trace import build_consultation_trace
+from .runtime.store import get_runtime_store
+
+
+COLLECTION = "consult_traces"
+DEFAULT_CACHE_SIZE = 128
+
+# 重建追溯图所需的问事字段；trace / decision_log / timings 等派生内容不落盘
+TRACE_INPUT_FIELDS = (
+    "question",
+    "profile",
+    "intent",
+    "modules",
+    "module_summaries",
+    "decision_kernel",
+    "effective_weights",
+    "answer",
+    "ai",
+)
+
+_CACHE: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+
+
+def _cache_size() -> int:
+    raw = os.getenv("CONSULT_TRACE_CACHE_SIZE")
+    try:
+        return max(0, int(raw)) if raw and raw.strip() else DEFAULT_CACHE_SIZE
+    except ValueError:
+        return DEFAULT_CACHE_SIZE
+
+
+def save_consult_trace_inputs(user_id: str, history_id: str, consultation: Dict[str, Any]) -> None:
+    payload = {
+        "history_id": history_id,
+        "user_id": user_id,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "inputs": {field: consultation.get(field) for field in TRACE_INPUT_FIELDS},
+    }
+    get_runtime_store().append(COLLECTION, payload)
+
+
+def get_consult_trace(user_id: str, history_id: str) -> Optional[Dict[str, Any]]:
+    """返回该用户某次问事的追溯图；首次构建后缓存，未找到返回 None。"""
+    key = f"{user_id}:{history_id}"
+    with _CACHE_LOCK:
+        cached = _CACHE.get(key)
+        if cached is not None:
+            _CACHE.move_to_end(key)
+            return cached
+
+    for item in get_runtime_store().query(COLLECTION, {"user_id": user_id, "history_id": history_id}, limit=1):
+        trace = build_consultation_trace(item.get("inputs") or {}).to_dict()
+        limit = _cache_size()
+        if limit:
+            with _CACHE_LOCK:
+                _CACHE[key] = trace
+                _CACHE.move_to_end(key)
+                while len(_CACHE) > limit:
+                    _CACHE.popitem(last=False)
+        return trace
+    return None
+
+
+def clear_consult_trace_cache() -> None:
+    with _CACHE_LOCK:
+        _CACHE.clear()
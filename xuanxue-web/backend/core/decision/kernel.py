@@ -3,8 +3,10 @@
 Transforms multi-module summaries into a unified decision world model.
 """
 
-from typing import Any, Dict, List
+from contextlib import nullcontext
+from typing import Any, Dict, List, Optional
 
+from ..runtime.metrics import SpanRecorder
 from .arbitration import arbitrate_signals
 from .environment_modifiers import apply_environment_modifiers, build_environment_modifiers
 from .signal_schema import ModuleSignal, UnifiedEnergyVector
@@ -401,6 +403,7 @@ def build_unified_world_model(
     profile: Dict[str, Any],
     module_summaries: Dict[str, Any],
     weight_overrides: Dict[str, Dict[str, float]] | None = None,
+    spans: Optional[SpanRecorder] = None,
 ) -> Dict[str, Any]:
     decision_type = infer_decision_type(question, profile)
     signals: List[ModuleSignal] = []
@@ -441,7 +444,9 @@ def build_unified_world_model(
         signals=adjusted_signals,
         aggregate=aggregate,
     )
-    arbitration = arbitrate_signals(adjusted_signals, decision_type, weight_overrides=weight_overrides)
+    # 仲裁单独计时，其耗时从外层 world_model 阶段中扣除
+    with spans.span("arbitration") if spans is not None else nullcontext():
+        arbitration = arbitrate_signals(adjusted_signals, decision_type, weight_overrides=weight_overrides)
     return {
         "decision_type": decision_type,
         "environment": environment,
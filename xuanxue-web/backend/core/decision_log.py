@@ -7,44 +7,43 @@ from datetime import datetime, timezone
 from typing import Any, Dict, List
 from uuid import uuid4
 
-from .runtime.store import append_jsonl, read_recent_jsonl, resolve_runtime_path
+from .runtime.store import get_runtime_store
 
 
-def _default_log_path():
-    return resolve_runtime_path("DECISION_LOG_PATH", "decision_logs.jsonl")
+COLLECTION = "decision_logs"
 
 
 def append_decision_log(snapshot: Dict[str, Any]) -> Dict[str, Any]:
-    path = _default_log_path()
+    store = get_runtime_store()
     log_id = str(uuid4())
     payload = {
         "log_id": log_id,
         "logged_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
         "snapshot": snapshot,
     }
-    append_jsonl(path, payload)
+    store.append(COLLECTION, payload)
     return {
         "logged": True,
         "log_id": log_id,
-        "path": str(path),
+        "path": store.location(COLLECTION),
     }
 
 
 def append_feedback_log(feedback: Dict[str, Any]) -> Dict[str, Any]:
-    path = _default_log_path()
+    store = get_runtime_store()
     feedback_id = str(uuid4())
     payload = {
         "feedback_id": feedback_id,
         "logged_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
         "feedback": feedback,
     }
-    append_jsonl(path, payload)
+    store.append(COLLECTION, payload)
     return {
         "logged": True,
         "feedback_id": feedback_id,
-        "path": str(path),
+        "path": store.location(COLLECTION),
     }
 
 
 def read_recent_decision_logs(limit: int = 20) -> List[Dict[str, Any]]:
-    return read_recent_jsonl(_default_log_path(), limit=limit)
+    return get_runtime_store().recent(COLLECTION, limit=limit)
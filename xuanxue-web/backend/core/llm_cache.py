@@ -0,0 +1,220 @@
+"""
+大模型响应缓存
+Content-addressed LLM response cache: in-memory LRU in front of a sharded on-disk store.
+
+键 = sha256(model + messages + temperature)，同一张盘、同一天的择日、同一时辰的奇门
+再次请求时直接复用，省延迟也省 token。
+
+环境变量：
+- LLM_CACHE_ENABLED: 设为 0 / false 关闭缓存，默认开启
+- LLM_CACHE_DIR: 磁盘缓存目录，默认 backend/runtime/llm_cache
+- LLM_CACHE_MAX_ENTRIES: 内存 LRU 条数上限，默认 512
+- LLM_CACHE_TTL_<KIND>: 各方法 TTL（秒），0 表示不缓存，如 LLM_CACHE_TTL_BAZI=86400
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from .runtime.store import resolve_runtime_path
+
+
+# 对话和图片默认不缓存：前者是开放式问答，后者涉及用户上传的手相 / 面相照片
+DEFAULT_TTL_SECONDS: Dict[str, int] = {
+    "bazi": 30 * 24 * 3600,
+    "liuyao": 24 * 3600,
+    "qimen": 2 * 3600,
+    "zeri": 24 * 3600,
+    "chat": 0,
+    "visual_insight": 0,
+    "visual_structure": 0,
+}
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    raw = os.getenv(name)
+    if raw is None or not raw.strip():
+        return default
+    return raw.strip().lower() not in ("0", "false", "no", "off")
+
+
+def resolve_ttl_seconds(kind: str) -> int:
+    raw = os.getenv(f"LLM_CACHE_TTL_{kind.upper()}")
+    if raw is not None and raw.strip():
+        try:
+            return max(0, int(raw))
+        except ValueError:
+            pass
+    return DEFAULT_TTL_SECONDS.get(kind, 0)
+
+
+def build_cache_key(request: Dict[str, Any]) -> str:
+    """按模型、消息与温度计算内容地址。"""
+    material = json.dumps(
+        {
+            "model": request.get("model"),
+            "messages": request.get("messages"),
+            "temperature": request.get("temperature"),
+        },
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """两级缓存：进程内 LRU + 按键前缀分片的磁盘 JSON。"""
+
+    def __init__(
+        self,
+        directory: Optional[Path] = None,
+        max_entries: Optional[int] = None,
+        enabled: Optional[bool] = None,
+    ):
+        self.directory = Path(directory) if directory is not None else resolve_runtime_path("LLM_CACHE_DIR", "llm_cache")
+        self.max_entries = max_entries if max_entries is not None else max(1, int(os.getenv("LLM_CACHE_MAX_ENTRIES") or "512"))
+        self.enabled = enabled if enabled is not None else _env_flag("LLM_CACHE_ENABLED", True)
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expired": 0,
+        }
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def _entry_path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _remember_in_memory(self, key: str, expires_at: float, value: str) -> None:
+        with self._lock:
+            self._memory[key] = (expires_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def _memory_get(self, key: str, now: float) -> Optional[str]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._memory[key]
+                self._counters["expired"] += 1
+                return None
+            self._memory.move_to_end(key)
+            self._counters["memory_hits"] += 1
+            return value
+
+    def _disk_get(self, key: str, now: float) -> Optional[str]:
+        path = self._entry_path(key)
+        try:
+            with path.open("r", encoding="utf-8") as file:
+                entry = json.load(file)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+        expires_at = float(entry.get("expires_at") or 0)
+        value = entry.get("value")
+        if expires_at <= now or not isinstance(value, str):
+            self._count("expired")
+            try:
+                path.unlink()
+            except OSError:
+                pass
+            return None
+
+        self._remember_in_memory(key, expires_at, value)
+        self._count("disk_hits")
+        return value
+
+    def _disk_set(self, key: str, kind: str, expires_at: float, value: str) -> None:
+        path = self._entry_path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # 内容寻址：并发写同一个键结果相同，临时文件名带进程/线程号避免互相覆盖
+            temp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with temp_path.open("w", encoding="utf-8") as file:
+                json.dump(
+                    {"kind": kind, "created_at": time.time(), "expires_at": expires_at, "value": value},
+                    file,
+                    ensure_ascii=False,
+                )
+            temp_path.replace(path)
+        except OSError as exc:
+            print(f"LLM缓存写入失败: {str(exc)}")
+
+    def get(self, kind: str, request: Dict[str, Any]) -> Optional[str]:
+        if not self.enabled or resolve_ttl_seconds(kind) <= 0:
+            return None
+        key = build_cache_key(request)
+        now = time.time()
+        value = self._memory_get(key, now)
+        if value is None:
+            value = self._disk_get(key, now)
+        if value is None:
+            self._count("misses")
+        return value
+
+    def set(self, kind: str, request: Dict[str, Any], value: Optional[str]) -> None:
+        ttl = resolve_ttl_seconds(kind)
+        if not self.enabled or ttl <= 0 or not value:
+            return
+        key = build_cache_key(request)
+        expires_at = time.time() + ttl
+        self._remember_in_memory(key, expires_at, value)
+        self._disk_set(key, kind, expires_at, value)
+        self._count("stores")
+
+    async def aget(self, kind: str, request: Dict[str, Any]) -> Optional[str]:
+        """异步路径：磁盘读放到线程里，避免阻塞事件循环。"""
+        if not self.enabled or resolve_ttl_seconds(kind) <= 0:
+            return None
+        key = build_cache_key(request)
+        now = time.time()
+        value = self._memory_get(key, now)
+        if value is None:
+            value = await asyncio.to_thread(self._disk_get, key, now)
+        if value is None:
+            self._count("misses")
+        return value
+
+    async def aset(self, kind: str, request: Dict[str, Any], value: Optional[str]) -> None:
+        if not self.enabled or resolve_ttl_seconds(kind) <= 0 or not value:
+            return
+        await asyncio.to_thread(self.set, kind, request, value)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            memory_entries = len(self._memory)
+        hits = counters["memory_hits"] + counters["disk_hits"]
+        lookups = hits + counters["misses"]
+        return {
+            "enabled": self.enabled,
+            "hits": hits,
+            **counters,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": memory_entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": {kind: resolve_ttl_seconds(kind) for kind in DEFAULT_TTL_SECONDS},
+        }
+
+    def clear_memory(self) -> None:
+        with self._lock:
+            self._memory.clear()
@@ -6,18 +6,37 @@ LLM Helper Module - AI-Enhanced Analysis
 import os
 import json
 import base64
-from typing import Any, Dict, Optional
+import asyncio
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from .llm_cache import LLMCache
 
 # 尝试导入 OpenAI，如果没有安装则设为 None
 try:
-    from openai import OpenAI
+    import httpx
+    from openai import AsyncOpenAI, OpenAI
     OPENAI_AVAILABLE = True
 except ImportError:
+    httpx = None
+    AsyncOpenAI = None
     OpenAI = None
     OPENAI_AVAILABLE = False
     print("提示：openai 包未安装，AI增强功能将不可用")
 
 
+CHAT_SYSTEM_PROMPT = """你是一位精通中国传统玄学的专家，包括八字命理、六爻占卜、择日学、风水学等。
+你的回答应该：
+1. 专业准确，基于传统理论
+2. 通俗易懂，避免过于晦涩
+3. 客观理性，不夸大其词
+4. 积极正面，给人希望和方向
+5. 实用可行，提供具体建议
+
+请用简洁明了的语言回答用户的问题。"""
+
+CHAT_CONTINUATION_PROMPT = "你上一条回答在中途结束了。请从刚才中断的位置继续，不要重复前文，也不要另起开场。"
+
+
 class LLMHelper:
     """大模型助手类"""
     
@@ -27,6 +46,14 @@ class LLMHelper:
         self.base_url = os.getenv('LLM_BASE_URL') or 'https://ark.cn-beijing.volces.com/api/v3'
         self.api_key = os.getenv('LLM_API_KEY') or os.getenv('ARK_API_KEY')
         
+        # 连接池配置：同步 / 异步客户端共用同一组上限
+        self.max_connections = int(os.getenv('LLM_MAX_CONNECTIONS') or '100')
+        self.max_keepalive_connections = int(os.getenv('LLM_MAX_KEEPALIVE_CONNECTIONS') or '20')
+        self.keepalive_expiry = float(os.getenv('LLM_KEEPALIVE_EXPIRY') or '30')
+        # 事件循环 → AsyncOpenAI；连接池绑定在创建它的循环上，不能跨循环复用
+        self._async_clients: Dict[asyncio.AbstractEventLoop, Any] = {}
+        self.cache = LLMCache()
+
         if not OPENAI_AVAILABLE:
             print("警告：openai 包未安装，AI增强功能将不可用")
             self.client = None
@@ -36,7 +63,8 @@ class LLMHelper:
         else:
             self.client = OpenAI(
                 base_url=self.base_url,
-                api_key=self.api_key
+                api_key=self.api_key,
+                http_client=httpx.Client(limits=self._connection_limits()),
             )
 
         self.model = os.getenv('LLM_TEXT_MODEL') or os.getenv('ARK_TEXT_MODEL') or "deepseek-v3-2-251201"
@@ -46,23 +74,110 @@ class LLMHelper:
     def is_available(self) -> bool:
         """检查LLM是否可用"""
         return self.client is not None
-    
-    def enhance_bazi_analysis(self, bazi_data: Dict) -> Optional[str]:
+
+    def _connection_limits(self):
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    @property
+    def async_client(self):
         """
-        增强八字分析
-        
-        Args:
-            bazi_data: 八字数据
-        
-        Returns:
-            AI增强的分析文本
+        当前事件循环上的 AsyncOpenAI 客户端（带连接池，按事件循环惰性创建）。
+
+        由创建它的循环负责关闭：服务在 lifespan 结束时调用 aclose()；
+        脚本或测试里另起的循环在退出前自行 await aclose()。
         """
         if not self.is_available():
             return None
-        
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            # 已关闭的循环上的客户端无法再关闭，只把引用丢掉，避免字典随循环数增长
+            self._async_clients = {
+                other: item for other, item in self._async_clients.items() if not other.is_closed()
+            }
+            client = self._async_clients[loop] = AsyncOpenAI(
+                base_url=self.base_url,
+                api_key=self.api_key,
+                http_client=httpx.AsyncClient(limits=self._connection_limits()),
+            )
+        return client
+
+    async def aclose(self) -> None:
+        """关闭当前事件循环上的异步客户端连接池。"""
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.close()
+
+    def _create(self, request: Dict[str, Any]):
+        return self.client.chat.completions.create(**request)
+
+    async def _acreate(self, request: Dict[str, Any]):
+        return await self.async_client.chat.completions.create(**request)
+
+    def _complete_text(self, kind: str, request: Dict[str, Any]) -> Optional[str]:
+        """单轮请求，先查缓存；kind 决定缓存 TTL。"""
+        cached = self.cache.get(kind, request)
+        if cached is not None:
+            return cached
+        content = self._create(request).choices[0].message.content
+        self.cache.set(kind, request, content)
+        return content
+
+    async def _acomplete_text(self, kind: str, request: Dict[str, Any]) -> Optional[str]:
+        cached = await self.cache.aget(kind, request)
+        if cached is not None:
+            return cached
+        response = await self._acreate(request)
+        content = response.choices[0].message.content
+        await self.cache.aset(kind, request, content)
+        return content
+
+    async def _astream(self, request: Dict[str, Any]) -> AsyncIterator[Tuple[str, Optional[str]]]:
+        """流式请求，逐块产出 (增量文本, finish_reason)。"""
+        stream = await self.async_client.chat.completions.create(**request, stream=True)
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            delta = getattr(choice.delta, "content", None) or ""
+            finish_reason = getattr(choice, "finish_reason", None)
+            if delta or finish_reason:
+                yield delta, finish_reason
+
+    async def _astream_text(
+        self,
+        kind: str,
+        build_request: Callable[[], Dict[str, Any]],
+        failure_label: str,
+    ) -> AsyncIterator[str]:
+        if not self.is_available():
+            return
+
         try:
-            # 构建提示词
-            prompt = f"""你是一位资深的命理学专家，请根据以下八字信息，提供专业、详细且易懂的命理分析。
+            request = build_request()
+            cached = await self.cache.aget(kind, request)
+            if cached is not None:
+                yield cached
+                return
+
+            pieces: List[str] = []
+            async for delta, _ in self._astream(request):
+                if delta:
+                    pieces.append(delta)
+                    yield delta
+            await self.cache.aset(kind, request, "".join(pieces))
+        except Exception as e:
+            print(f"{failure_label}: {str(e)}")
+            raise
+    
+    def _bazi_request(self, bazi_data: Dict) -> Dict[str, Any]:
+        """构建八字增强请求"""
+        # 构建提示词
+        prompt = f"""你是一位资深的命理学专家，请根据以下八字信息，提供专业、详细且易懂的命理分析。
 
 八字信息：
 - 年柱：{bazi_data['bazi']['year']}
@@ -92,38 +207,50 @@ class LLMHelper:
 - 保持积极正面的态度
 - 字数控制在500字左右
 """
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7,
-                max_tokens=1000
-            )
-            
-            return response.choices[0].message.content
-            
-        except Exception as e:
-            print(f"LLM增强分析失败: {str(e)}")
-            return None
-    
-    def enhance_liuyao_interpretation(self, liuyao_data: Dict) -> Optional[str]:
+
+        return {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0.7,
+            "max_tokens": 1000,
+        }
+
+    def enhance_bazi_analysis(self, bazi_data: Dict) -> Optional[str]:
         """
-        增强六爻解读
+        增强八字分析
         
         Args:
-            liuyao_data: 六爻数据
+            bazi_data: 八字数据
         
         Returns:
-            AI增强的解读文本
+            AI增强的分析文本
         """
         if not self.is_available():
             return None
         
         try:
-            gua_info = liuyao_data['gua_info']
-            question = liuyao_data.get('question', '未指定问题')
-            
-            prompt = f"""你是一位精通周易六爻的占卜大师，请根据以下卦象信息，为问卜者提供详细的解读。
+            return self._complete_text("bazi", self._bazi_request(bazi_data))
+        except Exception as e:
+            print(f"LLM增强分析失败: {str(e)}")
+            return None
+
+    async def aenhance_bazi_analysis(self, bazi_data: Dict) -> Optional[str]:
+        """enhance_bazi_analysis 的异步版本，不阻塞事件循环。"""
+        if not self.is_available():
+            return None
+
+        try:
+            return await self._acomplete_text("bazi", self._bazi_request(bazi_data))
+        except Exception as e:
+            print(f"LLM增强分析失败: {str(e)}")
+            return None
+    
+    def _liuyao_request(self, liuyao_data: Dict) -> Dict[str, Any]:
+        """构建六爻解读请求"""
+        gua_info = liuyao_data['gua_info']
+        question = liuyao_data.get('question', '未指定问题')
+
+        prompt = f"""你是一位精通周易六爻的占卜大师，请根据以下卦象信息，为问卜者提供详细的解读。
 
 问卜问题：{question}
 
@@ -148,27 +275,20 @@ class LLMHelper:
 - 既要客观分析，也要给出积极建议
 - 字数控制在400字左右
 """
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7,
-                max_tokens=800
-            )
-            
-            return response.choices[0].message.content
-            
-        except Exception as e:
-            print(f"LLM增强解读失败: {str(e)}")
-            return None
-    
-    def enhance_qimen_interpretation(self, qimen_data: Dict, matter_type: str = "通用") -> Optional[str]:
+
+        return {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0.7,
+            "max_tokens": 800,
+        }
+
+    def enhance_liuyao_interpretation(self, liuyao_data: Dict) -> Optional[str]:
         """
-        增强奇门遁甲解读
+        增强六爻解读
         
         Args:
-            qimen_data: 奇门遁甲数据
-            matter_type: 事项类型
+            liuyao_data: 六爻数据
         
         Returns:
             AI增强的解读文本
@@ -177,12 +297,30 @@ class LLMHelper:
             return None
         
         try:
-            time_info = qimen_data['时间信息']
-            dun_info = qimen_data['遁甲信息']
-            best_dir = qimen_data['最佳方位']
-            prediction = qimen_data['事项预测']
-            
-            prompt = f"""你是一位精通奇门遁甲的预测大师，请根据以下奇门遁甲盘信息，为问卜者提供详细的解读。
+            return self._complete_text("liuyao", self._liuyao_request(liuyao_data))
+        except Exception as e:
+            print(f"LLM增强解读失败: {str(e)}")
+            return None
+
+    async def aenhance_liuyao_interpretation(self, liuyao_data: Dict) -> Optional[str]:
+        """enhance_liuyao_interpretation 的异步版本，不阻塞事件循环。"""
+        if not self.is_available():
+            return None
+
+        try:
+            return await self._acomplete_text("liuyao", self._liuyao_request(liuyao_data))
+        except Exception as e:
+            print(f"LLM增强解读失败: {str(e)}")
+            return None
+    
+    def _qimen_request(self, qimen_data: Dict, matter_type: str = "通用") -> Dict[str, Any]:
+        """构建奇门解读请求"""
+        time_info = qimen_data['时间信息']
+        dun_info = qimen_data['遁甲信息']
+        best_dir = qimen_data['最佳方位']
+        prediction = qimen_data['事项预测']
+
+        prompt = f"""你是一位精通奇门遁甲的预测大师，请根据以下奇门遁甲盘信息，为问卜者提供详细的解读。
 
 时间信息：
 - 时间：{time_info['阳历']}
@@ -215,36 +353,48 @@ class LLMHelper:
 - 保持客观理性的态度
 - 字数控制在500字左右
 """
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7,
-                max_tokens=1000
-            )
-            
-            return response.choices[0].message.content
-            
-        except Exception as e:
-            print(f"LLM增强解读失败: {str(e)}")
-            return None
-    
-    def enhance_zeri_advice(self, zeri_data: Dict, purpose: str = "通用") -> Optional[str]:
+
+        return {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0.7,
+            "max_tokens": 1000,
+        }
+
+    def enhance_qimen_interpretation(self, qimen_data: Dict, matter_type: str = "通用") -> Optional[str]:
         """
-        增强择日建议
+        增强奇门遁甲解读
         
         Args:
-            zeri_data: 择日数据
-            purpose: 用途
+            qimen_data: 奇门遁甲数据
+            matter_type: 事项类型
         
         Returns:
-            AI增强的建议文本
+            AI增强的解读文本
         """
         if not self.is_available():
             return None
         
         try:
-            prompt = f"""你是一位精通择日学的专家，请根据以下日期信息，为用户提供详细的择日建议。
+            return self._complete_text("qimen", self._qimen_request(qimen_data, matter_type))
+        except Exception as e:
+            print(f"LLM增强解读失败: {str(e)}")
+            return None
+
+    async def aenhance_qimen_interpretation(self, qimen_data: Dict, matter_type: str = "通用") -> Optional[str]:
+        """enhance_qimen_interpretation 的异步版本，不阻塞事件循环。"""
+        if not self.is_available():
+            return None
+
+        try:
+            return await self._acomplete_text("qimen", self._qimen_request(qimen_data, matter_type))
+        except Exception as e:
+            print(f"LLM增强解读失败: {str(e)}")
+            return None
+    
+    def _zeri_request(self, zeri_data: Dict, purpose: str = "通用") -> Dict[str, Any]:
+        """构建择日建议请求"""
+        prompt = f"""你是一位精通择日学的专家，请根据以下日期信息，为用户提供详细的择日建议。
 
 日期信息：
 - 日期：{zeri_data['date']} {zeri_data.get('weekday', '')}
@@ -271,20 +421,117 @@ class LLMHelper:
 - 保持客观理性
 - 字数控制在300字左右
 """
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7,
-                max_tokens=600
-            )
-            
-            return response.choices[0].message.content
-            
+
+        return {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": 0.7,
+            "max_tokens": 600,
+        }
+
+    def enhance_zeri_advice(self, zeri_data: Dict, purpose: str = "通用") -> Optional[str]:
+        """
+        增强择日建议
+        
+        Args:
+            zeri_data: 择日数据
+            purpose: 用途
+        
+        Returns:
+            AI增强的建议文本
+        """
+        if not self.is_available():
+            return None
+        
+        try:
+            return self._complete_text("zeri", self._zeri_request(zeri_data, purpose))
+        except Exception as e:
+            print(f"LLM增强建议失败: {str(e)}")
+            return None
+
+    async def aenhance_zeri_advice(self, zeri_data: Dict, purpose: str = "通用") -> Optional[str]:
+        """enhance_zeri_advice 的异步版本，不阻塞事件循环。"""
+        if not self.is_available():
+            return None
+
+        try:
+            return await self._acomplete_text("zeri", self._zeri_request(zeri_data, purpose))
         except Exception as e:
             print(f"LLM增强建议失败: {str(e)}")
             return None
     
+    def _chat_request(self, question: str, context: Optional[str] = None) -> Dict[str, Any]:
+        """构建对话请求"""
+        messages = [{"role": "system", "content": CHAT_SYSTEM_PROMPT}]
+
+        if context:
+            messages.append({"role": "assistant", "content": f"相关信息：{context}"})
+
+        messages.append({"role": "user", "content": question})
+        return {
+            "model": self.model,
+            "messages": messages,
+            "temperature": 0.7,
+            "max_tokens": 1400,
+            "timeout": self.chat_timeout,
+        }
+
+    def _chat_continuation_request(self, messages: List[Dict[str, Any]], first_content: str) -> Dict[str, Any]:
+        """首段因长度截断时，构建续写请求"""
+        continuation_messages = list(messages)
+        continuation_messages.append({"role": "assistant", "content": first_content})
+        continuation_messages.append({"role": "user", "content": CHAT_CONTINUATION_PROMPT})
+        return {
+            "model": self.model,
+            "messages": continuation_messages,
+            "temperature": 0.7,
+            "max_tokens": 900,
+            "timeout": self.chat_timeout,
+        }
+
+    @staticmethod
+    def _join_continuation(first_content: str, continuation) -> str:
+        if not continuation.choices:
+            return first_content
+
+        continuation_content = (continuation.choices[0].message.content or "").strip()
+        if not continuation_content:
+            return first_content
+
+        return first_content + "\n" + continuation_content
+
+    def _chat_answer(self, request: Dict[str, Any]) -> Optional[str]:
+        response = self._create(request)
+
+        if not response.choices:
+            return None
+
+        first_choice = response.choices[0]
+        first_content = (first_choice.message.content or "").strip()
+        finish_reason = getattr(first_choice, "finish_reason", None)
+
+        if finish_reason != "length" or not first_content:
+            return first_content or None
+
+        continuation = self._create(self._chat_continuation_request(request["messages"], first_content))
+        return self._join_continuation(first_content, continuation)
+
+    async def _achat_answer(self, request: Dict[str, Any]) -> Optional[str]:
+        response = await self._acreate(request)
+
+        if not response.choices:
+            return None
+
+        first_choice = response.choices[0]
+        first_content = (first_choice.message.content or "").strip()
+        finish_reason = getattr(first_choice, "finish_reason", None)
+
+        if finish_reason != "length" or not first_content:
+            return first_content or None
+
+        continuation = await self._acreate(self._chat_continuation_request(request["messages"], first_content))
+        return self._join_continuation(first_content, continuation)
+
     def chat(self, question: str, context: Optional[str] = None) -> Optional[str]:
         """
         通用对话功能
@@ -300,86 +547,107 @@ class LLMHelper:
             return None
         
         try:
-            system_prompt = """你是一位精通中国传统玄学的专家，包括八字命理、六爻占卜、择日学、风水学等。
-你的回答应该：
-1. 专业准确，基于传统理论
-2. 通俗易懂，避免过于晦涩
-3. 客观理性，不夸大其词
-4. 积极正面，给人希望和方向
-5. 实用可行，提供具体建议
-
-请用简洁明了的语言回答用户的问题。"""
-            
-            messages = [{"role": "system", "content": system_prompt}]
+            request = self._chat_request(question, context)
+            cached = self.cache.get("chat", request)
+            if cached is not None:
+                return cached
+
+            answer = self._chat_answer(request)
+            self.cache.set("chat", request, answer)
+            return answer
             
-            if context:
-                messages.append({"role": "assistant", "content": f"相关信息：{context}"})
-            
-            messages.append({"role": "user", "content": question})
-            
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                temperature=0.7,
-                max_tokens=1400,
-                timeout=self.chat_timeout,
-            )
+        except Exception as e:
+            print(f"LLM对话失败: {str(e)}")
+            return None
 
-            if not response.choices:
-                return None
-
-            first_choice = response.choices[0]
-            first_content = (first_choice.message.content or "").strip()
-            finish_reason = getattr(first_choice, "finish_reason", None)
-
-            if finish_reason != "length" or not first_content:
-                return first_content or None
-
-            continuation_messages = list(messages)
-            continuation_messages.append({"role": "assistant", "content": first_content})
-            continuation_messages.append({
-                "role": "user",
-                "content": "你上一条回答在中途结束了。请从刚才中断的位置继续，不要重复前文，也不要另起开场。"
-            })
-
-            continuation = self.client.chat.completions.create(
-                model=self.model,
-                messages=continuation_messages,
-                temperature=0.7,
-                max_tokens=900,
-                timeout=self.chat_timeout,
-            )
+    async def achat(self, question: str, context: Optional[str] = None) -> Optional[str]:
+        """chat 的异步版本，不阻塞事件循环。"""
+        if not self.is_available():
+            return None
 
-            if not continuation.choices:
-                return first_content
+        try:
+            request = self._chat_request(question, context)
+            cached = await self.cache.aget("chat", request)
+            if cached is not None:
+                return cached
 
-            continuation_content = (continuation.choices[0].message.content or "").strip()
-            if not continuation_content:
-                return first_content
+            answer = await self._achat_answer(request)
+            await self.cache.aset("chat", request, answer)
+            return answer
 
-            return first_content + "\n" + continuation_content
-            
         except Exception as e:
             print(f"LLM对话失败: {str(e)}")
             return None
 
-    def analyze_visual_insight(
+    async def astream_chat(self, question: str, context: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        流式对话：逐段产出文本；首段因长度截断时在同一个流里自动续写。
+        上游失败时异常照常抛出（可能已产出部分内容），由调用方以 error 事件结束流。
+        """
+        if not self.is_available():
+            return
+
+        try:
+            request = self._chat_request(question, context)
+            cached = await self.cache.aget("chat", request)
+            if cached is not None:
+                yield cached
+                return
+
+            pieces: List[str] = []
+            finish_reason = None
+            async for delta, reason in self._astream(request):
+                if delta:
+                    pieces.append(delta)
+                    yield delta
+                if reason:
+                    finish_reason = reason
+
+            first_content = "".join(pieces).strip()
+            if finish_reason == "length" and first_content:
+                yield "\n"
+                continuation_pieces: List[str] = []
+                continuation_request = self._chat_continuation_request(request["messages"], first_content)
+                async for delta, _ in self._astream(continuation_request):
+                    if delta:
+                        continuation_pieces.append(delta)
+                        yield delta
+                continuation_content = "".join(continuation_pieces).strip()
+                if continuation_content:
+                    first_content = first_content + "\n" + continuation_content
+
+            await self.cache.aset("chat", request, first_content)
+        except Exception as e:
+            print(f"LLM对话失败: {str(e)}")
+            raise
+
+    def astream_enhance_bazi_analysis(self, bazi_data: Dict) -> AsyncIterator[str]:
+        """enhance_bazi_analysis 的流式版本。"""
+        return self._astream_text("bazi", lambda: self._bazi_request(bazi_data), "LLM增强分析失败")
+
+    def astream_enhance_liuyao_interpretation(self, liuyao_data: Dict) -> AsyncIterator[str]:
+        """enhance_liuyao_interpretation 的流式版本。"""
+        return self._astream_text("liuyao", lambda: self._liuyao_request(liuyao_data), "LLM增强解读失败")
+
+    def astream_enhance_qimen_interpretation(self, qimen_data: Dict, matter_type: str = "通用") -> AsyncIterator[str]:
+        """enhance_qimen_interpretation 的流式版本。"""
+        return self._astream_text("qimen", lambda: self._qimen_request(qimen_data, matter_type), "LLM增强解读失败")
+
+    def astream_enhance_zeri_advice(self, zeri_data: Dict, purpose: str = "通用") -> AsyncIterator[str]:
+        """enhance_zeri_advice 的流式版本。"""
+        return self._astream_text("zeri", lambda: self._zeri_request(zeri_data, purpose), "LLM增强建议失败")
+
+    def _visual_insight_request(
         self,
         image_data_urls: list[str],
         mode: str,
         question: Optional[str] = None,
         location: Optional[str] = None,
         scene_type: Optional[str] = None,
-    ) -> Optional[str]:
-        """
-        多模态图片分析，支持空间/风水观察、手相参考与面相参考。
-        """
-        if not self.is_available():
-            return None
-
-        try:
-            mode_prompts = {
-                "space": """你是一位擅长空间观察与风水场景拆解的文化顾问。
+    ) -> Dict[str, Any]:
+        """构建图片分析请求"""
+        mode_prompts = {
+            "space": """你是一位擅长空间观察与风水场景拆解的文化顾问。
 请只基于图片中可见的空间、采光、动线、朝向线索、整洁度、压迫感、门窗关系、座位背靠与遮挡关系进行分析。
 不要臆造无法从图中确认的事实。若图像不足以判断，请明确指出需要补拍的角度。
 输出结构：
@@ -388,7 +656,7 @@ class LLMHelper:
 3. 建议补拍的角度
 4. 可以立即调整的事项
 5. 免责声明：仅作文化娱乐与环境观察参考，不替代实地勘测""",
-                "palm": """你是一位做传统手相文化解读的参考助手。
+            "palm": """你是一位做传统手相文化解读的参考助手。
 请只描述图中可见的手掌纹理、掌丘起伏、手型轮廓与手部姿态，再结合传统手相文化给出“仅供娱乐参考”的解读。
 不要做身份识别、年龄识别、健康诊断、医学建议或确定性命运判断。
 如果图片角度、光线、清晰度不足，请明确指出需要如何重拍。
@@ -397,7 +665,7 @@ class LLMHelper:
 2. 传统手相里的参考含义
 3. 还需要补拍哪些细节
 4. 免责声明：仅作文化娱乐参考，不代表确定事实""",
-                "face": """你是一位做传统面相文化解读的参考助手。
+            "face": """你是一位做传统面相文化解读的参考助手。
 请只基于图中可见的五官比例、额头、眉眼、鼻梁、嘴部、下颌与整体神态，给出传统面相文化中的“仅供娱乐参考”的解读。
 不要做身份识别、相似人比对、年龄推断、种族民族推断、健康诊断、心理诊断或确定性人格结论。
 如果图片不够正面、光线不足、遮挡明显，请明确说明需要如何重拍。
@@ -406,54 +674,76 @@ class LLMHelper:
 2. 传统面相里的参考含义
 3. 还需要补拍哪些细节
 4. 免责声明：仅作文化娱乐参考，不代表确定事实""",
-            }
+        }
+
+        prompt = [
+            mode_prompts.get(mode, mode_prompts["space"]),
+            question and ("补充问题：" + question.strip()) or "",
+            location and ("地点信息：" + location.strip()) or "",
+            scene_type and mode == "space" and ("场景类型：" + scene_type.strip()) or "",
+        ]
+        prompt_text = "\n".join([item for item in prompt if item])
+
+        content_items = [{"type": "text", "text": prompt_text}]
+        for image_data_url in image_data_urls:
+            content_items.append({"type": "image_url", "image_url": {"url": image_data_url}})
+
+        return {
+            "model": self.vision_model,
+            "messages": [{"role": "user", "content": content_items}],
+            "temperature": 0.5,
+            "max_tokens": 1200,
+        }
 
-            prompt = [
-                mode_prompts.get(mode, mode_prompts["space"]),
-                question and ("补充问题：" + question.strip()) or "",
-                location and ("地点信息：" + location.strip()) or "",
-                scene_type and mode == "space" and ("场景类型：" + scene_type.strip()) or "",
-            ]
-            prompt_text = "\n".join([item for item in prompt if item])
-
-            content_items = [{"type": "text", "text": prompt_text}]
-            for image_data_url in image_data_urls:
-                content_items.append({"type": "image_url", "image_url": {"url": image_data_url}})
-
-            response = self.client.chat.completions.create(
-                model=self.vision_model,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": content_items,
-                    }
-                ],
-                temperature=0.5,
-                max_tokens=1200,
-            )
+    def analyze_visual_insight(
+        self,
+        image_data_urls: list[str],
+        mode: str,
+        question: Optional[str] = None,
+        location: Optional[str] = None,
+        scene_type: Optional[str] = None,
+    ) -> Optional[str]:
+        """
+        多模态图片分析，支持空间/风水观察、手相参考与面相参考。
+        """
+        if not self.is_available():
+            return None
 
-            return response.choices[0].message.content
+        try:
+            return self._complete_text("visual_insight", self._visual_insight_request(image_data_urls, mode, question, location, scene_type))
         except Exception as e:
             print(f"LLM图片分析失败: {str(e)}")
             return None
 
-    def extract_visual_structure(
+    async def aanalyze_visual_insight(
         self,
         image_data_urls: list[str],
         mode: str,
         question: Optional[str] = None,
         location: Optional[str] = None,
         scene_type: Optional[str] = None,
-    ) -> Optional[Dict[str, Any]]:
-        """
-        对图片做结构化提取，输出稳定 JSON 字段，便于统一问事吸收。
-        """
+    ) -> Optional[str]:
+        """analyze_visual_insight 的异步版本，不阻塞事件循环。"""
         if not self.is_available():
             return None
 
         try:
-            schema_prompts = {
-                "space": """请只输出 JSON，不要输出任何额外说明。
+            return await self._acomplete_text("visual_insight", self._visual_insight_request(image_data_urls, mode, question, location, scene_type))
+        except Exception as e:
+            print(f"LLM图片分析失败: {str(e)}")
+            return None
+
+    def _visual_structure_request(
+        self,
+        image_data_urls: list[str],
+        mode: str,
+        question: Optional[str] = None,
+        location: Optional[str] = None,
+        scene_type: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """构建图片结构提取请求"""
+        schema_prompts = {
+            "space": """请只输出 JSON，不要输出任何额外说明。
 从空间照片中提取结构化信息，字段如下：
 {
   "shots": [
@@ -483,7 +773,7 @@ class LLMHelper:
   }
 }
 要求：只填图中看得见的，不确定就写 unknown 或空数组。""",
-                "palm": """请只输出 JSON，不要输出任何额外说明。
+            "palm": """请只输出 JSON，不要输出任何额外说明。
 从手掌照片中提取结构化信息，字段如下：
 {
   "hand_side_guess": "left/right/unknown",
@@ -497,7 +787,7 @@ class LLMHelper:
   "confidence": 0-100
 }
 要求：只做可见特征提取，不做身份、年龄、健康判断。""",
-                "face": """请只输出 JSON，不要输出任何额外说明。
+            "face": """请只输出 JSON，不要输出任何额外说明。
 从正脸或近似正脸照片中提取结构化信息，字段如下：
 {
   "face_angle": "front/near-front/side/unknown",
@@ -514,41 +804,72 @@ class LLMHelper:
   "confidence": 0-100
 }
 要求：只做可见结构提取，不做身份、年龄、种族、健康或心理判断。""",
-            }
+        }
+
+        prompt = [
+            schema_prompts.get(mode, schema_prompts["space"]),
+            question and ("补充问题：" + question.strip()) or "",
+            location and ("地点信息：" + location.strip()) or "",
+            scene_type and mode == "space" and ("场景类型：" + scene_type.strip()) or "",
+        ]
+        prompt_text = "\n".join([item for item in prompt if item])
+
+        content_items = [{"type": "text", "text": prompt_text}]
+        for image_data_url in image_data_urls:
+            content_items.append({"type": "image_url", "image_url": {"url": image_data_url}})
+
+        return {
+            "model": self.vision_model,
+            "messages": [{"role": "user", "content": content_items}],
+            "temperature": 0.1,
+            "max_tokens": 1200,
+            "response_format": {"type": "json_object"},
+        }
 
-            prompt = [
-                schema_prompts.get(mode, schema_prompts["space"]),
-                question and ("补充问题：" + question.strip()) or "",
-                location and ("地点信息：" + location.strip()) or "",
-                scene_type and mode == "space" and ("场景类型：" + scene_type.strip()) or "",
-            ]
-            prompt_text = "\n".join([item for item in prompt if item])
-
-            content_items = [{"type": "text", "text": prompt_text}]
-            for image_data_url in image_data_urls:
-                content_items.append({"type": "image_url", "image_url": {"url": image_data_url}})
-
-            response = self.client.chat.completions.create(
-                model=self.vision_model,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": content_items,
-                    }
-                ],
-                temperature=0.1,
-                max_tokens=1200,
-                response_format={"type": "json_object"},
-            )
+    def extract_visual_structure(
+        self,
+        image_data_urls: list[str],
+        mode: str,
+        question: Optional[str] = None,
+        location: Optional[str] = None,
+        scene_type: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        对图片做结构化提取，输出稳定 JSON 字段，便于统一问事吸收。
+        """
+        if not self.is_available():
+            return None
+
+        try:
+            return self._parse_visual_structure(self._complete_text("visual_structure", self._visual_structure_request(image_data_urls, mode, question, location, scene_type)))
+        except Exception as e:
+            print(f"LLM图片结构提取失败: {str(e)}")
+            return None
 
-            content = response.choices[0].message.content
-            if not content:
-                return None
-            return json.loads(content)
+    async def aextract_visual_structure(
+        self,
+        image_data_urls: list[str],
+        mode: str,
+        question: Optional[str] = None,
+        location: Optional[str] = None,
+        scene_type: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """extract_visual_structure 的异步版本，不阻塞事件循环。"""
+        if not self.is_available():
+            return None
+
+        try:
+            return self._parse_visual_structure(await self._acomplete_text("visual_structure", self._visual_structure_request(image_data_urls, mode, question, location, scene_type)))
         except Exception as e:
             print(f"LLM图片结构提取失败: {str(e)}")
             return None
 
+    @staticmethod
+    def _parse_visual_structure(content: Optional[str]) -> Optional[Dict[str, Any]]:
+        if not content:
+            return None
+        return json.loads(content)
+
 
 # 全局实例
 llm_helper = LLMHelper()
@@ -56,6 +56,18 @@ class QiMenChart:
         "天英": {"type": "中平", "desc": "文书火光，虚名虚利"}
     }
     
+    # 事项类型 → 关键八门
+    MATTER_GATES = {
+        "求财": ["生门", "开门"],
+        "求职": ["开门", "休门"],
+        "婚姻": ["生门", "景门"],
+        "出行": ["开门", "休门"],
+        "诉讼": ["惊门", "伤门"],
+        "疾病": ["死门", "伤门"],
+        "学业": ["景门", "开门"],
+        "通用": ["开门", "生门", "休门"]
+    }
+    
     def __init__(self, year: int, month: int, day: int, hour: int, minute: int = 0):
         """初始化奇门遁甲盘"""
         self.year = year
@@ -81,6 +93,18 @@ class QiMenChart:
         # 排盘
         self.chart = self._arrange_chart()
     
+    @staticmethod
+    def layout_key(month: int, day: int, hour: int) -> Tuple[int, int]:
+        """决定九宫排布的 (局数, 值符宫)；阴阳遁与四柱不影响宫位，同键的盘面完全相同。"""
+        # 简化局数计算：根据日期模拟
+        # 实际应该根据节气和日干支精确计算
+        ju_number = ((month + day) % 9) + 1
+        # 确定值符宫位（简化：根据时辰）
+        zhifu_palace = (hour % 8) + 1
+        if zhifu_palace == 5:
+            zhifu_palace = 2  # 中宫寄坤二宫
+        return ju_number, zhifu_palace
+
     def _determine_dun_and_ju(self) -> Tuple[str, int]:
         """确定阴遁阳遁和局数"""
         # 简化版：根据节气判断
@@ -96,40 +120,36 @@ class QiMenChart:
         else:
             dun_type = "阴遁"
         
-        # 简化局数计算：根据日期模拟
-        # 实际应该根据节气和日干支精确计算
-        ju_number = ((self.month + self.day) % 9) + 1
-        
+        ju_number, _ = self.layout_key(self.month, self.day, self.hour)
         return dun_type, ju_number
     
-    def _arrange_chart(self) -> Dict:
-        """排盘"""
-        chart = {}
+    @classmethod
+    def arrange_layout(cls, ju_number: int, zhifu_palace: int) -> Tuple[Tuple[str, int, str, str, str, str, str], ...]:
+        """按 (局数, 值符宫) 排九宫，返回各宫 (宫名, 宫数, 地盘, 天盘, 八门, 九星, 八神)。"""
         palace_order = [4, 9, 2, 3, 5, 7, 8, 1, 6]
-        
-        # 确定值符宫位（简化：根据时辰）
-        zhifu_palace = (self.hour % 8) + 1
-        if zhifu_palace == 5:
-            zhifu_palace = 2  # 中宫寄坤二宫
         zhifu_offset = palace_order.index(zhifu_palace) if zhifu_palace in palace_order else 0
         
         # 为每个宫位分配天干、八门、九星、八神
+        layout = []
         for palace_index, palace_num in enumerate(palace_order):
-            palace_name = self.PALACES[palace_num]
-            
-            # 分配天干（地盘和天盘）
-            dipan_gan = self.TIANGAN_ORDER[palace_index % 9]
-            tianpan_gan = self.TIANGAN_ORDER[(palace_index + self.ju_number) % 9]
-            
-            # 分配八门
-            gate = self.EIGHT_GATES[(palace_index + zhifu_offset) % 8]
-            
-            # 分配九星
-            star = self.NINE_STARS[(palace_index + zhifu_offset) % 9]
-            
-            # 分配八神
-            spirit = self.EIGHT_SPIRITS[(palace_index + zhifu_offset) % 8]
-            
+            layout.append((
+                cls.PALACES[palace_num],
+                palace_num,
+                # 分配天干（地盘和天盘）
+                cls.TIANGAN_ORDER[palace_index % 9],
+                cls.TIANGAN_ORDER[(palace_index + ju_number) % 9],
+                # 分配八门、九星、八神
+                cls.EIGHT_GATES[(palace_index + zhifu_offset) % 8],
+                cls.NINE_STARS[(palace_index + zhifu_offset) % 9],
+                cls.EIGHT_SPIRITS[(palace_index + zhifu_offset) % 8],
+            ))
+        return tuple(layout)
+    
+    def _arrange_chart(self) -> Dict:
+        """排盘：查预计算的排布表，每个盘持有自己的宫位 dict（可单独修改，不影响其他盘）"""
+        layout = QIMEN_LAYOUTS[self.layout_key(self.month, self.day, self.hour)]
+        chart = {}
+        for palace_name, palace_num, dipan_gan, tianpan_gan, gate, star, spirit in layout:
             chart[palace_name] = {
                 "宫位": palace_name,
                 "宫数": palace_num,
@@ -138,10 +158,9 @@ class QiMenChart:
                 "八门": gate,
                 "九星": star,
                 "八神": spirit,
-                "门吉凶": self.GATE_FORTUNE[gate],
-                "星吉凶": self.STAR_FORTUNE[star]
+                "门吉凶": dict(self.GATE_FORTUNE[gate]),
+                "星吉凶": dict(self.STAR_FORTUNE[star])
             }
-        
         return chart
 
     def get_calc_trace(self) -> Dict:
@@ -149,9 +168,7 @@ class QiMenChart:
         dongzhi = get_solar_term_date(self.year, 21)
         xiazhi = get_solar_term_date(self.year, 9)
         palace_order = [4, 9, 2, 3, 5, 7, 8, 1, 6]
-        zhifu_palace = (self.hour % 8) + 1
-        if zhifu_palace == 5:
-            zhifu_palace = 2
+        _, zhifu_palace = self.layout_key(self.month, self.day, self.hour)
         zhifu_offset = palace_order.index(zhifu_palace) if zhifu_palace in palace_order else 0
 
         palace_steps = []
@@ -211,40 +228,8 @@ class QiMenChart:
         
         palace = self.chart[palace_name]
         
-        # 综合吉凶判断
-        gate_type = palace["门吉凶"]["type"]
-        star_type = palace["星吉凶"]["type"]
-        
-        # 简单的吉凶评分
-        fortune_score = 0
-        if "大凶" in gate_type:
-            fortune_score -= 2
-        elif "大吉" in gate_type:
-            fortune_score += 2
-        elif "吉" in gate_type:
-            fortune_score += 1
-        elif "凶" in gate_type:
-            fortune_score -= 1
-        
-        if "大凶" in star_type:
-            fortune_score -= 2
-        elif "大吉" in star_type:
-            fortune_score += 2
-        elif "吉" in star_type:
-            fortune_score += 1
-        elif "凶" in star_type:
-            fortune_score -= 1
-        
-        if fortune_score >= 3:
-            overall = "大吉"
-        elif fortune_score >= 1:
-            overall = "吉"
-        elif fortune_score <= -3:
-            overall = "大凶"
-        elif fortune_score <= -1:
-            overall = "凶"
-        else:
-            overall = "中平"
+        # 综合吉凶判断：按宫位当前的门 / 星吉凶类型查预计算分数
+        fortune_score, overall = palace_fortune(palace["门吉凶"]["type"], palace["星吉凶"]["type"])
         
         return {
             "宫位": palace_name,
@@ -257,38 +242,28 @@ class QiMenChart:
         """寻找最佳方位"""
         best_palace = None
         best_score = -999
+        best_overall = None
         
         for palace_name, palace_data in self.chart.items():
             if palace_name == "中宫":
                 continue
-            analysis = self.analyze_palace(palace_name)
-            score = analysis["吉凶分数"]
+            score, overall = palace_fortune(palace_data["门吉凶"]["type"], palace_data["星吉凶"]["type"])
             
             if score > best_score:
                 best_score = score
                 best_palace = palace_name
+                best_overall = overall
         
         return {
             "最佳方位": best_palace,
-            "吉凶": self.analyze_palace(best_palace)["综合吉凶"],
+            "吉凶": best_overall,
             "详情": self.chart[best_palace]
         }
     
     def predict_matter(self, matter_type: str = "通用") -> Dict:
         """预测事情吉凶"""
         # 根据事情类型选择关键宫位
-        key_palaces = {
-            "求财": ["生门", "开门"],
-            "求职": ["开门", "休门"],
-            "婚姻": ["生门", "景门"],
-            "出行": ["开门", "休门"],
-            "诉讼": ["惊门", "伤门"],
-            "疾病": ["死门", "伤门"],
-            "学业": ["景门", "开门"],
-            "通用": ["开门", "生门", "休门"]
-        }
-        
-        target_gates = key_palaces.get(matter_type, key_palaces["通用"])
+        target_gates = self.MATTER_GATES.get(matter_type, self.MATTER_GATES["通用"])
         
         # 找到对应的宫位
         relevant_palaces = []
@@ -349,6 +324,61 @@ class QiMenChart:
         }
 
 
+def _fortune_points(fortune_type: str) -> int:
+    # 简单的吉凶评分
+    if "大凶" in fortune_type:
+        return -2
+    if "大吉" in fortune_type:
+        return 2
+    if "吉" in fortune_type:
+        return 1
+    if "凶" in fortune_type:
+        return -1
+    return 0
+
+
+def _score_palace(gate_type: str, star_type: str) -> Tuple[int, str]:
+    fortune_score = _fortune_points(gate_type) + _fortune_points(star_type)
+    if fortune_score >= 3:
+        overall = "大吉"
+    elif fortune_score >= 1:
+        overall = "吉"
+    elif fortune_score <= -3:
+        overall = "大凶"
+    elif fortune_score <= -1:
+        overall = "凶"
+    else:
+        overall = "中平"
+    return fortune_score, overall
+
+
+_FORTUNE_TYPES = sorted(
+    {item["type"] for item in QiMenChart.GATE_FORTUNE.values()}
+    | {item["type"] for item in QiMenChart.STAR_FORTUNE.values()}
+)
+
+# (门吉凶类型, 星吉凶类型) → (吉凶分数, 综合吉凶)
+PALACE_FORTUNE_SCORES: Dict[Tuple[str, str], Tuple[int, str]] = {
+    (gate_type, star_type): _score_palace(gate_type, star_type)
+    for gate_type in _FORTUNE_TYPES
+    for star_type in _FORTUNE_TYPES
+}
+
+
+def palace_fortune(gate_type: str, star_type: str) -> Tuple[int, str]:
+    """宫位吉凶分数与综合吉凶；常见类型直接查表，其余现算。"""
+    cached = PALACE_FORTUNE_SCORES.get((gate_type, star_type))
+    return cached if cached is not None else _score_palace(gate_type, star_type)
+
+
+# 所有 (局数, 值符宫) 的九宫排布，导入时排好；值符宫由时辰决定，5 寄坤二宫故只有 7 种
+QIMEN_LAYOUTS: Dict[Tuple[int, int], Tuple[Tuple[str, int, str, str, str, str, str], ...]] = {
+    (ju_number, zhifu_palace): QiMenChart.arrange_layout(ju_number, zhifu_palace)
+    for ju_number in range(1, 10)
+    for zhifu_palace in (1, 2, 3, 4, 6, 7, 8)
+}
+
+
 def divine_qimen(year: int, month: int, day: int, hour: int, minute: int = 0, 
                  matter_type: str = "通用") -> Dict:
     """
@@ -0,0 +1,53 @@
+"""
+令牌桶限流
+In-process token-bucket limiter keyed by arbitrary strings (client IP, email, ...).
+
+单进程内有效；多 worker 部署时每个 worker 各自限流，整体上限约为配置值 × worker 数。
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+
+class TokenBucketLimiter:
+    """容量 capacity、每秒补充 refill_per_second 个令牌；capacity <= 0 表示不限流。"""
+
+    def __init__(self, capacity: float, refill_per_second: float, max_keys: int = 10000):
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0 and self.refill_per_second > 0
+
+    def acquire(self, key: str, cost: float = 1.0) -> Optional[int]:
+        """取令牌；成功返回 None，不足时返回建议的 Retry-After 秒数。"""
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated_at) * self.refill_per_second)
+            if tokens < cost:
+                self._buckets[key] = (tokens, now)
+                self._buckets.move_to_end(key)
+                self.rejected += 1
+                return max(1, math.ceil((cost - tokens) / self.refill_per_second))
+            self._buckets[key] = (tokens - cost, now)
+            self._buckets.move_to_end(key)
+            # 只保留最近活跃的 key，防止被随机邮箱 / IP 撑爆内存；被淘汰的 key 视为满桶
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return None
+
+    def reset(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+            self.rejected = 0
@@ -0,0 +1,173 @@
+"""
+计算执行器
+Bounded thread / process pool that keeps CPU-bound chart work off the event loop.
+
+环境变量：
+- COMPUTE_EXECUTOR_KIND: thread（默认）或 process
+- COMPUTE_EXECUTOR_WORKERS: 工作线程/进程数，默认 min(4, CPU 数)
+- COMPUTE_EXECUTOR_MAX_QUEUE: 工作者全忙时允许排队的任务数，默认 workers * 4
+"""
+
+import asyncio
+import math
+import os
+import random
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .metrics import Histogram
+
+
+EXECUTOR_KINDS = ("thread", "process")
+RETRY_AFTER_MIN_SECONDS = 1
+RETRY_AFTER_MAX_SECONDS = 30
+
+
+class ComputeSaturatedError(RuntimeError):
+    """执行器排队已满，调用方应按 retry_after 秒后重试。"""
+
+    def __init__(self, retry_after: int, pending: int, capacity: int):
+        super().__init__(f"compute executor saturated ({pending}/{capacity})")
+        self.retry_after = retry_after
+        self.pending = pending
+        self.capacity = capacity
+
+
+def _env_int(name: str, default: int, minimum: int) -> int:
+    raw = os.getenv(name)
+    if raw is None or not raw.strip():
+        return default
+    try:
+        return max(minimum, int(raw))
+    except ValueError:
+        return default
+
+
+def _reseed_worker() -> None:
+    # fork 出来的子进程会继承同一个随机状态，六爻 / 梅花起卦需要各自独立
+    random.seed()
+
+
+def _timed_call(fn: Callable[..., Any], args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Tuple[float, Any]:
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - started, result
+
+
+class ComputeExecutor:
+    """带排队上限与等待时间统计的计算执行器。"""
+
+    def __init__(
+        self,
+        kind: Optional[str] = None,
+        workers: Optional[int] = None,
+        max_queue: Optional[int] = None,
+    ):
+        resolved_kind = (kind or os.getenv("COMPUTE_EXECUTOR_KIND") or "thread").strip().lower()
+        if resolved_kind not in EXECUTOR_KINDS:
+            raise ValueError(f"kind must be one of {EXECUTOR_KINDS}")
+        self.kind = resolved_kind
+        self.workers = workers if workers is not None else _env_int(
+            "COMPUTE_EXECUTOR_WORKERS", min(4, os.cpu_count() or 1), 1
+        )
+        self.max_queue = max_queue if max_queue is not None else _env_int(
+            "COMPUTE_EXECUTOR_MAX_QUEUE", self.workers * 4, 0
+        )
+        self.wait_time = Histogram()
+        self.run_time = Histogram()
+        self._pool: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.workers + self.max_queue
+
+    def _ensure_pool(self) -> Executor:
+        with self._lock:
+            if self._pool is None:
+                if self.kind == "process":
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_reseed_worker)
+                else:
+                    self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="compute")
+            return self._pool
+
+    def _retry_after(self, pending: int) -> int:
+        average = self.run_time.mean() or 1.0
+        estimate = math.ceil(average * pending / self.workers)
+        return max(RETRY_AFTER_MIN_SECONDS, min(RETRY_AFTER_MAX_SECONDS, estimate))
+
+    def _acquire_slot(self) -> None:
+        with self._lock:
+            if self._pending >= self.capacity:
+                self._rejected += 1
+                raise ComputeSaturatedError(self._retry_after(self._pending), self._pending, self.capacity)
+            self._pending += 1
+
+    def _release_slot(self, failed: bool) -> None:
+        with self._lock:
+            self._pending -= 1
+            if failed:
+                self._failed += 1
+            else:
+                self._completed += 1
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """在池中执行 fn；process 模式下 fn 与参数必须可 pickle。"""
+        self._acquire_slot()
+        failed = True
+        submitted = time.perf_counter()
+        try:
+            pool = self._ensure_pool()
+            loop = asyncio.get_running_loop()
+            try:
+                run_seconds, result = await loop.run_in_executor(pool, partial(_timed_call, fn, args, kwargs))
+            except BrokenProcessPool:
+                self._discard_pool(pool)
+                raise
+            self.run_time.observe(run_seconds)
+            self.wait_time.observe(time.perf_counter() - submitted - run_seconds)
+            failed = False
+            return result
+        finally:
+            self._release_slot(failed)
+
+    def _discard_pool(self, pool: Executor) -> None:
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = self._pending
+            snapshot = {
+                "kind": self.kind,
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "pending": pending,
+                "running": min(pending, self.workers),
+                "queue_depth": max(0, pending - self.workers),
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+            }
+        snapshot["wait_seconds"] = self.wait_time.snapshot()
+        snapshot["run_seconds"] = self.run_time.snapshot()
+        return snapshot
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+
+compute_executor = ComputeExecutor()
@@ -0,0 +1,216 @@
+"""
+运行时指标
+Lightweight in-process counters and histograms for runtime observability.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+DEFAULT_LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+# 文件锁等待通常在亚毫秒级，桶往下多切两档
+LOCK_WAIT_BUCKETS: Tuple[float, ...] = (
+    0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0,
+)
+
+
+class Histogram:
+    """固定桶直方图（秒），线程安全，快照为累计计数。"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._count = 0
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        value = max(0.0, float(value))
+        with self._lock:
+            self._counts[bisect_left(self.buckets, value)] += 1
+            self._count += 1
+            self._sum += value
+            if value > self._max:
+                self._max = value
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    def mean(self) -> float:
+        with self._lock:
+            return self._sum / self._count if self._count else 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            cumulative = []
+            running = 0
+            for bound, bucket_count in zip(self.buckets, self._counts):
+                running += bucket_count
+                cumulative.append({"le": bound, "count": running})
+            cumulative.append({"le": "+Inf", "count": self._count})
+            return {
+                "count": self._count,
+                "sum": round(self._sum, 6),
+                "mean": round(self._sum / self._count, 6) if self._count else 0.0,
+                "max": round(self._max, 6),
+                "buckets": cumulative,
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts = [0] * (len(self.buckets) + 1)
+            self._count = 0
+            self._sum = 0.0
+            self._max = 0.0
+
+
+class HistogramFamily:
+    """同名、按标签区分的一组直方图，对应 Prometheus 的一个 histogram 指标。"""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str], buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names: Tuple[str, ...] = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._children: Dict[Tuple[str, ...], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str) -> Histogram:
+        key = tuple(str(value) for value in values)
+        with self._lock:
+            histogram = self._children.get(key)
+            if histogram is None:
+                histogram = Histogram(self.buckets)
+                self._children[key] = histogram
+            return histogram
+
+    def items(self) -> List[Tuple[Dict[str, str], Histogram]]:
+        with self._lock:
+            children = list(self._children.items())
+        return [(dict(zip(self.label_names, key)), histogram) for key, histogram in children]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._children.clear()
+
+
+class SpanRecorder:
+    """
+    记录一次请求内各阶段耗时；同名阶段多次进入时累加。
+
+    阶段可以嵌套（如 world_model 内的 arbitration），记录的是自身耗时：子阶段的时间从外层扣除，
+    因此各阶段可以直接相加，总和不超过 total_seconds。
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self._started = time.perf_counter()
+        # 进行中阶段的子阶段累计耗时，栈顶为最内层
+        self._child_seconds: List[float] = []
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        started = time.perf_counter()
+        self._child_seconds.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            children = self._child_seconds.pop()
+            if self._child_seconds:
+                self._child_seconds[-1] += elapsed
+            self.stages[stage] = self.stages.get(stage, 0.0) + elapsed - children
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "stages": {stage: round(seconds, 6) for stage, seconds in self.stages.items()},
+            "total_seconds": round(time.perf_counter() - self._started, 6),
+        }
+
+
+CONSULT_STAGE_SECONDS = HistogramFamily(
+    "xuanxue_consult_stage_seconds",
+    "Unified consult latency per pipeline stage.",
+    ("stage",),
+)
+CONSULT_MODULE_SECONDS = HistogramFamily(
+    "xuanxue_consult_module_seconds",
+    "Unified consult wall time per divination module.",
+    ("module", "status"),
+)
+
+
+def observe_consult_timings(timings: Dict[str, Any]) -> None:
+    """把问事响应里的 timings 块并入进程内直方图（问事可能在子进程里算，统一在 API 进程汇总）。"""
+    for stage, seconds in (timings.get("stages") or {}).items():
+        CONSULT_STAGE_SECONDS.labels(stage).observe(seconds)
+    if "total_seconds" in timings:
+        CONSULT_STAGE_SECONDS.labels("total").observe(timings["total_seconds"])
+    for module, item in (timings.get("modules") or {}).items():
+        CONSULT_MODULE_SECONDS.labels(module, item.get("status", "ok")).observe(item.get("seconds", 0.0))
+
+
+def _format_labels(labels: Dict[str, Any], extra: Optional[Dict[str, Any]] = None) -> str:
+    merged = {**labels, **(extra or {})}
+    if not merged:
+        return ""
+    parts = []
+    for key, value in merged.items():
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{key}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value: Any) -> str:
+    return "+Inf" if value == "+Inf" else repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class PrometheusWriter:
+    """
+    拼装 Prometheus 文本格式（0.0.4）。
+
+    样本先按指标族归并，render 时每个族只输出一次 HELP / TYPE，其下所有样本连续排列；
+    文本格式要求同族样本不被其他族打断，否则 Prometheus 会拒绝整次抓取。
+    """
+
+    def __init__(self):
+        # 指标族名 -> 该族的全部行（含 HELP / TYPE），按首次出现顺序输出
+        self._families: Dict[str, List[str]] = {}
+
+    def _family_lines(self, name: str, metric_type: str, help_text: str) -> List[str]:
+        lines = self._families.get(name)
+        if lines is None:
+            lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+            self._families[name] = lines
+        return lines
+
+    def sample(self, name: str, metric_type: str, help_text: str, value: Any, labels: Optional[Dict[str, Any]] = None) -> None:
+        lines = self._family_lines(name, metric_type, help_text)
+        lines.append(f"{name}{_format_labels(labels or {})} {_format_value(value)}")
+
+    def histogram(self, name: str, help_text: str, snapshot: Dict[str, Any], labels: Optional[Dict[str, Any]] = None) -> None:
+        """snapshot 为 Histogram.snapshot() 的结构（累计桶 + count + sum）。"""
+        lines = self._family_lines(name, "histogram", help_text)
+        labels = labels or {}
+        for bucket in snapshot["buckets"]:
+            lines.append(f"{name}_bucket{_format_labels(labels, {'le': _format_value(bucket['le'])})} {bucket['count']}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(float(snapshot['sum']))}")
+        lines.append(f"{name}_count{_format_labels(labels)} {snapshot['count']}")
+
+    def family(self, family: HistogramFamily) -> None:
+        for labels, histogram in family.items():
+            self.histogram(family.name, family.help_text, histogram.snapshot(), labels)
+
+    def render(self) -> str:
+        return "".join(line + "\n" for lines in self._families.values() for line in lines)
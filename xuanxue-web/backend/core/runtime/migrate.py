@@ -0,0 +1,66 @@
+"""
+运行时数据迁移
+One-shot import of the JSONL / JSON runtime files into the SQLite store.
+
+用法（在 backend 目录下）：
+    python -m core.runtime.migrate [--db runtime/runtime.sqlite3] [--force]
+
+- 集合表非空时默认跳过，--force 先清空再导入
+- 文档（账号、会话）仅在库中不存在时导入，--force 覆盖
+- 源文件不做修改，迁移完成后把 RUNTIME_STORE_BACKEND 设为 sqlite 即可切换
+"""
+
+import argparse
+import json
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .store import COLLECTIONS, DOCUMENTS, JsonlRuntimeStore, SqliteRuntimeStore, get_sqlite_store, read_jsonl
+
+
+def migrate_jsonl_to_sqlite(
+    target: Optional[SqliteRuntimeStore] = None,
+    source: Optional[JsonlRuntimeStore] = None,
+    force: bool = False,
+) -> Dict[str, Any]:
+    target = target or get_sqlite_store()
+    source = source or JsonlRuntimeStore()
+    report: Dict[str, Any] = {"database": str(target.db_path), "collections": {}, "documents": {}}
+
+    for collection in COLLECTIONS:
+        path = source.collection_path(collection)
+        existing = target.count(collection)
+        if existing and not force:
+            report["collections"][collection] = {"status": "skipped", "existing": existing, "source": str(path)}
+            continue
+        if existing:
+            target.clear(collection)
+        imported = target.append_many(collection, read_jsonl(path))
+        report["collections"][collection] = {"status": "imported", "imported": imported, "source": str(path)}
+
+    for name in DOCUMENTS:
+        path = source.document_path(name)
+        if not path.exists():
+            report["documents"][name] = {"status": "missing", "source": str(path)}
+            continue
+        if target.has_document(name) and not force:
+            report["documents"][name] = {"status": "skipped", "source": str(path)}
+            continue
+        target.write_document(name, source.read_document(name, {}))
+        report["documents"][name] = {"status": "imported", "source": str(path)}
+
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="将 backend/runtime 下的 JSONL/JSON 运行时数据导入 SQLite")
+    parser.add_argument("--db", type=Path, default=None, help="目标 SQLite 路径，默认 RUNTIME_STORE_SQLITE_PATH 或 runtime/runtime.sqlite3")
+    parser.add_argument("--force", action="store_true", help="覆盖目标库中已有的数据")
+    args = parser.parse_args()
+
+    report = migrate_jsonl_to_sqlite(get_sqlite_store(args.db), force=args.force)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
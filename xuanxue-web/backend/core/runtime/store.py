@@ -1,13 +1,23 @@
 """
 运行时存储层
-Shared JSONL persistence helpers for runtime data.
+Shared JSONL persistence helpers for runtime data, plus a pluggable backend
+(JSONL files or an embedded SQLite database in WAL mode).
+
+后端由 RUNTIME_STORE_BACKEND 选择：
+- jsonl（默认）：沿用 backend/runtime/ 下的 .jsonl / .json 文件
+- sqlite：单个 SQLite 库（RUNTIME_STORE_SQLITE_PATH，默认 runtime/runtime.sqlite3），
+  按 user_id / history_id / log_id / 时间戳建索引；旧文件用 core.runtime.migrate 一次性导入
 """
 
 import json
 import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
 from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Callable, Dict, List
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
 
 try:
     import fcntl
@@ -20,6 +30,13 @@ except ImportError:  # pragma: no cover - POSIX fallback
     msvcrt = None
 
 
+from .metrics import LOCK_WAIT_BUCKETS, Histogram
+
+
+# 倒读块大小：一条决策日志通常 1~4KB，64KB 一块足够覆盖默认的 20 条
+TAIL_BLOCK_SIZE = 64 * 1024
+
+
 def resolve_runtime_path(env_var: str, default_filename: str) -> Path:
     env_path = os.getenv(env_var)
     if env_path:
@@ -31,23 +48,144 @@ def _lock_path(path: Path) -> Path:
     return path.with_suffix(path.suffix + ".lock")
 
 
+LOCK_POLL_INTERVAL_SECONDS = 0.005
+
+
+class RuntimeLockTimeout(TimeoutError):
+    """在 timeout 内没拿到运行时文件锁。"""
+
+    def __init__(self, path: Path, shared: bool, timeout: float):
+        mode = "shared" if shared else "exclusive"
+        super().__init__(f"timed out after {timeout}s waiting for {mode} lock on {path}")
+        self.path = path
+        self.shared = shared
+        self.timeout = timeout
+
+
+class _LockContention:
+    """单个锁文件的等待统计：按模式分直方图，另记争用与超时次数。"""
+
+    def __init__(self):
+        self.wait_seconds = {
+            "shared": Histogram(LOCK_WAIT_BUCKETS),
+            "exclusive": Histogram(LOCK_WAIT_BUCKETS),
+        }
+        self.contended = 0
+        self.timeouts = 0
+
+
+_LOCK_CONTENTION: Dict[str, _LockContention] = {}
+_LOCK_CONTENTION_GUARD = threading.Lock()
+
+
+def _contention_for(lock_path: Path) -> _LockContention:
+    key = str(lock_path)
+    with _LOCK_CONTENTION_GUARD:
+        entry = _LOCK_CONTENTION.get(key)
+        if entry is None:
+            entry = _LockContention()
+            _LOCK_CONTENTION[key] = entry
+        return entry
+
+
+def _default_lock_timeout() -> Optional[float]:
+    raw = os.getenv("RUNTIME_LOCK_TIMEOUT")
+    if raw is None or not raw.strip():
+        return None
+    try:
+        value = float(raw)
+    except ValueError:
+        return None
+    return value if value > 0 else None
+
+
+def _try_lock(fileno: int, shared: bool) -> bool:
+    if fcntl is not None:
+        try:
+            fcntl.flock(fileno, (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        return True
+    if msvcrt is not None:  # pragma: no cover - Windows fallback（不支持共享锁，一律独占）
+        try:
+            msvcrt.locking(fileno, msvcrt.LK_NBLCK, 1)
+        except OSError:
+            return False
+        return True
+    return True
+
+
+def _blocking_lock(fileno: int, shared: bool) -> None:
+    if fcntl is not None:
+        fcntl.flock(fileno, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+    elif msvcrt is not None:  # pragma: no cover - Windows fallback
+        msvcrt.locking(fileno, msvcrt.LK_LOCK, 1)
+
+
+def _unlock(fileno: int) -> None:
+    if fcntl is not None:
+        fcntl.flock(fileno, fcntl.LOCK_UN)
+    elif msvcrt is not None:  # pragma: no cover - Windows fallback
+        msvcrt.locking(fileno, msvcrt.LK_UNLCK, 1)
+
+
+def _acquire_lock(fileno: int, lock_path: Path, shared: bool, timeout: Optional[float]) -> None:
+    contention = _contention_for(lock_path)
+    histogram = contention.wait_seconds["shared" if shared else "exclusive"]
+    if _try_lock(fileno, shared):
+        histogram.observe(0.0)
+        return
+
+    with _LOCK_CONTENTION_GUARD:
+        contention.contended += 1
+    started = time.perf_counter()
+    if timeout is None:
+        _blocking_lock(fileno, shared)
+    else:
+        deadline = started + timeout
+        while not _try_lock(fileno, shared):
+            if time.perf_counter() >= deadline:
+                histogram.observe(time.perf_counter() - started)
+                with _LOCK_CONTENTION_GUARD:
+                    contention.timeouts += 1
+                raise RuntimeLockTimeout(lock_path, shared, timeout)
+            time.sleep(LOCK_POLL_INTERVAL_SECONDS)
+    histogram.observe(time.perf_counter() - started)
+
+
 @contextmanager
-def runtime_file_lock(path: Path):
+def runtime_file_lock(path: Path, shared: bool = False, timeout: Optional[float] = None):
+    """跨进程文件锁。
+
+    shared=True 取共享锁（LOCK_SH），多个读者可同时持有，只与写者互斥；
+    timeout 为等待秒数，超时抛 RuntimeLockTimeout，缺省取 RUNTIME_LOCK_TIMEOUT，未配置则一直等。
+    Windows 回退时不区分读写，一律独占。
+    """
     lock_path = _lock_path(path)
     lock_path.parent.mkdir(parents=True, exist_ok=True)
+    if timeout is None:
+        timeout = _default_lock_timeout()
     with lock_path.open("a+b") as lock_file:
         lock_file.seek(0)
-        if fcntl is not None:
-            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
-        elif msvcrt is not None:  # pragma: no cover - Windows fallback
-            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        _acquire_lock(lock_file.fileno(), lock_path, shared, timeout)
         try:
             yield
         finally:
-            if fcntl is not None:
-                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
-            elif msvcrt is not None:  # pragma: no cover - Windows fallback
-                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            _unlock(lock_file.fileno())
+
+
+def runtime_lock_stats() -> Dict[str, Any]:
+    """各锁文件的等待时间直方图与争用 / 超时计数。"""
+    with _LOCK_CONTENTION_GUARD:
+        entries = list(_LOCK_CONTENTION.items())
+    stats: Dict[str, Any] = {}
+    for key, entry in entries:
+        stats[key] = {
+            "contended": entry.contended,
+            "timeouts": entry.timeouts,
+            "wait_seconds": {mode: histogram.snapshot() for mode, histogram in entry.wait_seconds.items()},
+        }
+    return stats
 
 
 def append_jsonl(path: Path, payload: Dict[str, Any]) -> None:
@@ -62,7 +200,7 @@ def read_jsonl(path: Path) -> List[Dict[str, Any]]:
         return []
 
     entries: List[Dict[str, Any]] = []
-    with runtime_file_lock(path):
+    with runtime_file_lock(path, shared=True):
         with path.open("r", encoding="utf-8") as file:
             for raw_line in file:
                 line = raw_line.strip()
@@ -77,18 +215,80 @@ def read_jsonl(path: Path) -> List[Dict[str, Any]]:
     return entries
 
 
+def _iter_lines_reversed(file: BinaryIO, block_size: int = TAIL_BLOCK_SIZE) -> Iterator[bytes]:
+    """从文件末尾按块倒读，逐行（不含换行符）由新到旧产出。"""
+    file.seek(0, os.SEEK_END)
+    position = file.tell()
+    remainder = b""
+    while position > 0:
+        read_size = min(block_size, position)
+        position -= read_size
+        file.seek(position)
+        lines = (file.read(read_size) + remainder).split(b"\n")
+        # 块首可能是上一行的后半截，留到下一块拼接
+        remainder = lines.pop(0)
+        for line in reversed(lines):
+            yield line
+    yield remainder
+
+
+def _iter_jsonl_reversed(file: BinaryIO, block_size: int = TAIL_BLOCK_SIZE) -> Iterator[Dict[str, Any]]:
+    for raw_line in _iter_lines_reversed(file, block_size):
+        line = raw_line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line.decode("utf-8"))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            continue
+        if isinstance(item, dict):
+            yield item
+
+
 def read_recent_jsonl(path: Path, limit: int = 20) -> List[Dict[str, Any]]:
+    """取最后 limit 条有效记录（时间正序），只读尾部若干块，耗时与文件大小无关。"""
     if limit <= 0 or not path.exists():
         return []
 
-    return read_jsonl(path)[-limit:]
+    entries: List[Dict[str, Any]] = []
+    with runtime_file_lock(path, shared=True):
+        with path.open("rb") as file:
+            for item in _iter_jsonl_reversed(file):
+                entries.append(item)
+                if len(entries) >= limit:
+                    break
+    entries.reverse()
+    return entries
+
+
+def query_recent_jsonl(
+    path: Path,
+    predicate: Callable[[Dict[str, Any]], bool],
+    limit: Optional[int] = None,
+    stop: Optional[Callable[[Dict[str, Any]], bool]] = None,
+) -> List[Dict[str, Any]]:
+    """由新到旧倒读并过滤，凑够 limit 条或 stop 命中即停止（结果为新→旧）。"""
+    if not path.exists() or (limit is not None and limit <= 0):
+        return []
+
+    matched: List[Dict[str, Any]] = []
+    with runtime_file_lock(path, shared=True):
+        with path.open("rb") as file:
+            for item in _iter_jsonl_reversed(file):
+                if stop is not None and stop(item):
+                    break
+                if predicate(item):
+                    matched.append(item)
+                    if limit is not None and len(matched) >= limit:
+                        break
+    return matched
 
 
 def read_json_file(path: Path, default: Any) -> Any:
     if not path.exists():
         return default
 
-    with runtime_file_lock(path):
+    with runtime_file_lock(path, shared=True):
         return _read_json_file_unlocked(path, default)
 
 
@@ -124,3 +324,446 @@ def _write_json_file_unlocked(path: Path, payload: Any) -> None:
     with temp_path.open("w", encoding="utf-8") as file:
         json.dump(payload, file, ensure_ascii=False, indent=2)
     temp_path.replace(path)
+
+
+class CollectionSpec(NamedTuple):
+    """追加型记录集合：文件位置 + 需要建索引的顶层字段 + 时间戳字段。"""
+
+    env_var: str
+    filename: str
+    indexed_fields: Tuple[str, ...]
+    time_field: str
+
+
+class DocumentSpec(NamedTuple):
+    """整体读改写的 JSON 文档（账号、会话、签名令牌吊销表）。"""
+
+    env_var: str
+    filename: str
+
+
+COLLECTIONS: Dict[str, CollectionSpec] = {
+    "decision_logs": CollectionSpec("DECISION_LOG_PATH", "decision_logs.jsonl", ("log_id", "feedback_id"), "logged_at"),
+    "weight_tuning": CollectionSpec("WEIGHT_TUNING_PATH", "weight_tuning_events.jsonl", ("event_id",), "recorded_at"),
+    "consult_history": CollectionSpec("CONSULT_HISTORY_PATH", "consult_history.jsonl", ("user_id", "history_id"), "created_at"),
+    "consult_traces": CollectionSpec("CONSULT_TRACE_PATH", "consult_traces.jsonl", ("user_id", "history_id"), "created_at"),
+}
+
+DOCUMENTS: Dict[str, DocumentSpec] = {
+    "users": DocumentSpec("USER_STORE_PATH", "users.json"),
+    "sessions": DocumentSpec("SESSION_STORE_PATH", "sessions.json"),
+    "revoked_tokens": DocumentSpec("REVOKED_TOKEN_PATH", "revoked_tokens.json"),
+}
+
+
+def _collection_spec(collection: str) -> CollectionSpec:
+    spec = COLLECTIONS.get(collection)
+    if spec is None:
+        raise ValueError(f"unknown runtime collection: {collection}")
+    return spec
+
+
+def _document_spec(name: str) -> DocumentSpec:
+    spec = DOCUMENTS.get(name)
+    if spec is None:
+        raise ValueError(f"unknown runtime document: {name}")
+    return spec
+
+
+def _matches(item: Dict[str, Any], filters: Dict[str, Any], time_field: str, since: Optional[str]) -> bool:
+    if since is not None and str(item.get(time_field) or "") < since:
+        return False
+    return all(item.get(field) == value for field, value in filters.items())
+
+
+def _older_than(time_field: str, since: str) -> Callable[[Dict[str, Any]], bool]:
+    return lambda item: str(item.get(time_field) or "") < since
+
+
+class RuntimeStore(ABC):
+    """运行时存储后端接口。记录按写入顺序保存，recent 返回时间正序的最后 N 条。"""
+
+    backend_name = "abstract"
+
+    @abstractmethod
+    def append(self, collection: str, record: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def recent(self, collection: str, limit: int = 20) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def query(
+        self,
+        collection: str,
+        filters: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        newest_first: bool = True,
+        since: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """按索引字段等值过滤；since 为时间戳下限（ISO 字符串比较）。"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def read_document(self, name: str, default: Any) -> Any:
+        raise NotImplementedError
+
+    @abstractmethod
+    def write_document(self, name: str, payload: Any) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_document(self, name: str, default: Any, updater: Callable[[Any], Any]) -> Any:
+        raise NotImplementedError
+
+    @abstractmethod
+    def document_generation(self, name: str) -> Any:
+        """文档版本标记（不透明，含来源路径）；值变化即说明文档被改过或换了来源，可用于缓存失效。"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def document_source(self, name: str) -> str:
+        """文档来源（文件路径或库路径），只解析配置、不做 I/O；用于判断是否换了来源。"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def location(self, collection: str) -> str:
+        raise NotImplementedError
+
+
+class JsonlRuntimeStore(RuntimeStore):
+    """文件后端：集合为 JSONL，文档为 JSON；路径每次按环境变量解析，便于测试切换。"""
+
+    backend_name = "jsonl"
+
+    def collection_path(self, collection: str) -> Path:
+        spec = _collection_spec(collection)
+        return resolve_runtime_path(spec.env_var, spec.filename)
+
+    def document_path(self, name: str) -> Path:
+        spec = _document_spec(name)
+        return resolve_runtime_path(spec.env_var, spec.filename)
+
+    def append(self, collection: str, record: Dict[str, Any]) -> None:
+        append_jsonl(self.collection_path(collection), record)
+
+    def recent(self, collection: str, limit: int = 20) -> List[Dict[str, Any]]:
+        return read_recent_jsonl(self.collection_path(collection), limit=limit)
+
+    def query(
+        self,
+        collection: str,
+        filters: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        newest_first: bool = True,
+        since: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        spec = _collection_spec(collection)
+        path = self.collection_path(collection)
+        filters = filters or {}
+        if newest_first:
+            # 文件按写入顺序即时间顺序，倒读遇到早于 since 的记录即可停止
+            stop = _older_than(spec.time_field, since) if since is not None else None
+            return query_recent_jsonl(path, lambda item: _matches(item, filters, spec.time_field, None), limit, stop)
+
+        matched: List[Dict[str, Any]] = []
+        for item in read_jsonl(path):
+            if _matches(item, filters, spec.time_field, since):
+                matched.append(item)
+                if limit is not None and len(matched) >= limit:
+                    break
+        return matched
+
+    def read_document(self, name: str, default: Any) -> Any:
+        return read_json_file(self.document_path(name), default)
+
+    def write_document(self, name: str, payload: Any) -> None:
+        write_json_file(self.document_path(name), payload)
+
+    def update_document(self, name: str, default: Any, updater: Callable[[Any], Any]) -> Any:
+        return update_json_file(self.document_path(name), default, updater)
+
+    def document_generation(self, name: str) -> Any:
+        path = self.document_path(name)
+        try:
+            stat = path.stat()
+        except OSError:
+            return (str(path), None)
+        # 写入走临时文件 + rename，inode 必变；mtime / size 兜底原地修改
+        return (str(path), stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def document_source(self, name: str) -> str:
+        return str(self.document_path(name))
+
+    def location(self, collection: str) -> str:
+        return str(self.collection_path(collection))
+
+
+class SqliteRuntimeStore(RuntimeStore):
+    """SQLite 后端（WAL）：每个集合一张表，索引字段与时间戳单独成列并建索引，原始记录存 payload。"""
+
+    backend_name = "sqlite"
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA busy_timeout=30000")
+            self._local.connection = connection
+            self._ensure_schema(connection)
+        return connection
+
+    def _ensure_schema(self, connection: sqlite3.Connection) -> None:
+        with self._schema_lock:
+            if self._schema_ready:
+                return
+            for collection, spec in COLLECTIONS.items():
+                columns = "".join(f", {field} TEXT" for field in spec.indexed_fields)
+                connection.execute(
+                    f"CREATE TABLE IF NOT EXISTS {collection} ("
+                    f"seq INTEGER PRIMARY KEY AUTOINCREMENT{columns}, ts TEXT, payload TEXT NOT NULL)"
+                )
+                for field in spec.indexed_fields:
+                    connection.execute(
+                        f"CREATE INDEX IF NOT EXISTS idx_{collection}_{field} ON {collection} ({field}, seq)"
+                    )
+                connection.execute(f"CREATE INDEX IF NOT EXISTS idx_{collection}_ts ON {collection} (ts)")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "name TEXT PRIMARY KEY, payload TEXT NOT NULL, generation INTEGER NOT NULL DEFAULT 0)"
+            )
+            self._schema_ready = True
+
+    @contextmanager
+    def _transaction(self):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        else:
+            connection.execute("COMMIT")
+
+    def append_many(self, collection: str, records: List[Dict[str, Any]]) -> int:
+        spec = _collection_spec(collection)
+        fields = spec.indexed_fields
+        placeholders = ", ".join("?" for _ in range(len(fields) + 2))
+        column_list = ", ".join((*fields, "ts", "payload"))
+        rows = [
+            (
+                *(None if record.get(field) is None else str(record.get(field)) for field in fields),
+                record.get(spec.time_field),
+                json.dumps(record, ensure_ascii=False),
+            )
+            for record in records
+        ]
+        with self._transaction() as connection:
+            connection.executemany(f"INSERT INTO {collection} ({column_list}) VALUES ({placeholders})", rows)
+        return len(rows)
+
+    def append(self, collection: str, record: Dict[str, Any]) -> None:
+        self.append_many(collection, [record])
+
+    @staticmethod
+    def _decode_rows(rows: List[Tuple[str]]) -> List[Dict[str, Any]]:
+        items: List[Dict[str, Any]] = []
+        for (payload,) in rows:
+            try:
+                item = json.loads(payload)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(item, dict):
+                items.append(item)
+        return items
+
+    def recent(self, collection: str, limit: int = 20) -> List[Dict[str, Any]]:
+        _collection_spec(collection)
+        if limit <= 0:
+            return []
+        rows = self._connection().execute(
+            f"SELECT payload FROM {collection} ORDER BY seq DESC LIMIT ?", (limit,)
+        ).fetchall()
+        items = self._decode_rows(rows)
+        items.reverse()
+        return items
+
+    def query(
+        self,
+        collection: str,
+        filters: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        newest_first: bool = True,
+        since: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        spec = _collection_spec(collection)
+        clauses: List[str] = []
+        params: List[Any] = []
+        for field, value in (filters or {}).items():
+            if field not in spec.indexed_fields:
+                raise ValueError(f"{collection}.{field} is not an indexed field")
+            clauses.append(f"{field} = ?")
+            params.append(None if value is None else str(value))
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        sql = f"SELECT payload FROM {collection}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY seq " + ("DESC" if newest_first else "ASC")
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return self._decode_rows(self._connection().execute(sql, params).fetchall())
+
+    def count(self, collection: str) -> int:
+        _collection_spec(collection)
+        return int(self._connection().execute(f"SELECT COUNT(*) FROM {collection}").fetchone()[0])
+
+    def clear(self, collection: str) -> None:
+        _collection_spec(collection)
+        with self._transaction() as connection:
+            connection.execute(f"DELETE FROM {collection}")
+
+    def _read_document_row(self, connection: sqlite3.Connection, name: str) -> Optional[Tuple[str, int]]:
+        _document_spec(name)
+        return connection.execute("SELECT payload, generation FROM documents WHERE name = ?", (name,)).fetchone()
+
+    def has_document(self, name: str) -> bool:
+        return self._read_document_row(self._connection(), name) is not None
+
+    def read_document(self, name: str, default: Any) -> Any:
+        row = self._read_document_row(self._connection(), name)
+        if row is None:
+            return default
+        try:
+            return json.loads(row[0])
+        except json.JSONDecodeError:
+            return default
+
+    def _store_document(self, connection: sqlite3.Connection, name: str, payload: Any) -> None:
+        connection.execute(
+            "INSERT INTO documents (name, payload, generation) VALUES (?, ?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET payload = excluded.payload, generation = documents.generation + 1",
+            (name, json.dumps(payload, ensure_ascii=False)),
+        )
+
+    def write_document(self, name: str, payload: Any) -> None:
+        _document_spec(name)
+        with self._transaction() as connection:
+            self._store_document(connection, name, payload)
+
+    def update_document(self, name: str, default: Any, updater: Callable[[Any], Any]) -> Any:
+        with self._transaction() as connection:
+            row = self._read_document_row(connection, name)
+            payload = default
+            if row is not None:
+                try:
+                    payload = json.loads(row[0])
+                except json.JSONDecodeError:
+                    payload = default
+            result = updater(payload)
+            next_payload = result if result is not None else payload
+            self._store_document(connection, name, next_payload)
+            return next_payload
+
+    def document_generation(self, name: str) -> Any:
+        row = self._read_document_row(self._connection(), name)
+        return (str(self.db_path), row[1] if row is not None else None)
+
+    def document_source(self, name: str) -> str:
+        _document_spec(name)
+        return str(self.db_path)
+
+    def location(self, collection: str) -> str:
+        _collection_spec(collection)
+        return f"{self.db_path}#{collection}"
+
+
+STORE_BACKENDS = ("jsonl", "sqlite")
+
+_JSONL_STORE = JsonlRuntimeStore()
+_SQLITE_STORES: Dict[str, SqliteRuntimeStore] = {}
+_SQLITE_STORES_LOCK = threading.Lock()
+
+
+def resolve_sqlite_path() -> Path:
+    return resolve_runtime_path("RUNTIME_STORE_SQLITE_PATH", "runtime.sqlite3")
+
+
+def get_sqlite_store(db_path: Optional[Path] = None) -> SqliteRuntimeStore:
+    resolved = Path(db_path) if db_path is not None else resolve_sqlite_path()
+    key = str(resolved.resolve())
+    with _SQLITE_STORES_LOCK:
+        store = _SQLITE_STORES.get(key)
+        if store is None:
+            store = SqliteRuntimeStore(resolved)
+            _SQLITE_STORES[key] = store
+        return store
+
+
+def get_runtime_store() -> RuntimeStore:
+    """按 RUNTIME_STORE_BACKEND 返回当前后端（每次调用时读取，便于测试切换）。"""
+    backend = (os.getenv("RUNTIME_STORE_BACKEND") or "jsonl").strip().lower()
+    if backend == "sqlite":
+        return get_sqlite_store()
+    if backend != "jsonl":
+        raise ValueError(f"RUNTIME_STORE_BACKEND must be one of {STORE_BACKENDS}")
+    return _JSONL_STORE
+
+
+DEFAULT_DOCUMENT_REFRESH_SECONDS = 1.0
+
+
+def document_refresh_seconds() -> float:
+    raw = os.getenv("RUNTIME_DOCUMENT_REFRESH_SECONDS")
+    try:
+        return max(0.0, float(raw)) if raw and raw.strip() else DEFAULT_DOCUMENT_REFRESH_SECONDS
+    except ValueError:
+        return DEFAULT_DOCUMENT_REFRESH_SECONDS
+
+
+class DocumentWatcher:
+    """
+    进程内文档缓存的失效判断：document_generation 检查（JSONL 为一次 stat，SQLite 为一次查询）
+    在 RUNTIME_DOCUMENT_REFRESH_SECONDS（默认 1 秒）内最多做一次。
+
+    其他 worker 的写入最多延迟一个间隔可见；本进程写入后调用 invalidate()，下次查找立即重新检查。
+    换了来源（环境变量指向另一份文件或切换后端）不受间隔限制。
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._source: Optional[str] = None
+        self._generation: Any = object()
+        self._checked_at = float("-inf")
+
+    def poll(self, force: bool = False) -> Tuple[bool, Any]:
+        """返回 (是否需要重载, 当前文档版本)；force 跳过节流。重载完成后调用 loaded(版本)。"""
+        store = get_runtime_store()
+        source = store.document_source(self.name)
+        now = time.monotonic()
+        if not force and source == self._source and now - self._checked_at < document_refresh_seconds():
+            return False, self._generation
+        generation = store.document_generation(self.name)
+        self._source = source
+        self._checked_at = now
+        return generation != self._generation, generation
+
+    def loaded(self, generation: Any) -> None:
+        self._generation = generation
+
+    def invalidate(self) -> None:
+        self._generation = object()
+        self._checked_at = float("-inf")
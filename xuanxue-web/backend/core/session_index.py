@@ -0,0 +1,162 @@
+"""
+会话索引
+In-process session cache keyed by token hash, kept in sync with the sessions document.
+
+- 鉴权热路径只做一次文档版本检查（JSONL 为一次 stat，SQLite 为一次主键查询）+ dict 查找
+- 版本变化（其他 worker 登录 / 登出）时整体重载
+- 过期清理由后台线程定期执行：内存中立即剔除，落盘合并进下一次 sweep（write-behind）
+
+环境变量：
+- SESSION_SWEEP_INTERVAL_SECONDS: 后台清理间隔（秒），默认 300
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from .runtime.store import get_runtime_store
+
+
+SESSIONS_DOCUMENT = "sessions"
+DEFAULT_SWEEP_INTERVAL_SECONDS = 300.0
+
+
+def parse_expiry(expires_at: Any) -> Optional[float]:
+    if not expires_at:
+        return None
+    try:
+        return datetime.fromisoformat(str(expires_at).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def _extract_sessions(payload: Any) -> List[Dict[str, Any]]:
+    sessions = payload.get("sessions") if isinstance(payload, dict) else []
+    return sessions if isinstance(sessions, list) else []
+
+
+class SessionIndex:
+    """token_hash → 会话记录；只读缓存，所有增删仍经运行时存储同步落盘。"""
+
+    def __init__(self):
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+        self._expiry: Dict[str, float] = {}
+        self._generation: Any = object()
+        self._lock = threading.Lock()
+        self._pending_cleanup = False
+        self._sweeper: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._counters = {"hits": 0, "misses": 0, "reloads": 0, "swept": 0, "flushes": 0}
+
+    def _load(self, generation: Any) -> None:
+        payload = get_runtime_store().read_document(SESSIONS_DOCUMENT, {"sessions": []})
+        sessions: Dict[str, Dict[str, Any]] = {}
+        expiry: Dict[str, float] = {}
+        for session in _extract_sessions(payload):
+            token_hash = str(session.get("token_hash") or "")
+            expires = parse_expiry(session.get("expires_at"))
+            if not token_hash or expires is None:
+                continue
+            sessions[token_hash] = session
+            expiry[token_hash] = expires
+        with self._lock:
+            self._sessions = sessions
+            self._expiry = expiry
+            self._generation = generation
+            self._counters["reloads"] += 1
+
+    def _ensure_fresh(self) -> None:
+        generation = get_runtime_store().document_generation(SESSIONS_DOCUMENT)
+        if generation != self._generation:
+            self._load(generation)
+
+    def lookup(self, token_hash: str) -> Optional[Dict[str, Any]]:
+        """按 token 哈希取未过期的会话；过期的顺手剔除，落盘交给 sweep。"""
+        self._ensure_fresh()
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(token_hash)
+            if session is None:
+                self._counters["misses"] += 1
+                return None
+            if self._expiry.get(token_hash, 0) <= now:
+                self._sessions.pop(token_hash, None)
+                self._expiry.pop(token_hash, None)
+                self._pending_cleanup = True
+                self._counters["misses"] += 1
+                return None
+            self._counters["hits"] += 1
+            return session
+
+    def invalidate(self, token_hash: Optional[str] = None) -> None:
+        """本进程写过会话文档后调用：下次查找强制重载；登出时同时立即摘掉该 token。"""
+        with self._lock:
+            if token_hash is not None:
+                self._sessions.pop(token_hash, None)
+                self._expiry.pop(token_hash, None)
+            self._generation = object()
+
+    def sweep(self, cleanup: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]]) -> int:
+        """剔除内存中的过期会话，并把清理结果合并写回存储。返回本次剔除条数。"""
+        self._ensure_fresh()
+        now = time.time()
+        with self._lock:
+            expired = [token_hash for token_hash, expires in self._expiry.items() if expires <= now]
+            for token_hash in expired:
+                self._sessions.pop(token_hash, None)
+                self._expiry.pop(token_hash, None)
+            needs_flush = bool(expired) or self._pending_cleanup
+            self._pending_cleanup = False
+            self._counters["swept"] += len(expired)
+
+        if needs_flush:
+            # 在锁内重读最新文档再清理，不会覆盖其他 worker 刚写入的会话
+            get_runtime_store().update_document(
+                SESSIONS_DOCUMENT,
+                {"sessions": []},
+                lambda payload: {"sessions": cleanup(_extract_sessions(payload))},
+            )
+            self.invalidate()
+            with self._lock:
+                self._counters["flushes"] += 1
+        return len(expired)
+
+    def start_sweeper(self, cleanup: Callable[[List[Dict[str, Any]]], List[Dict[str, Any]]], interval: Optional[float] = None) -> None:
+        if self._sweeper is not None and self._sweeper.is_alive():
+            return
+        if interval is None:
+            raw = os.getenv("SESSION_SWEEP_INTERVAL_SECONDS")
+            try:
+                interval = float(raw) if raw and raw.strip() else DEFAULT_SWEEP_INTERVAL_SECONDS
+            except ValueError:
+                interval = DEFAULT_SWEEP_INTERVAL_SECONDS
+        self._stop.clear()
+
+        def run() -> None:
+            while not self._stop.wait(interval):
+                try:
+                    self.sweep(cleanup)
+                except Exception as exc:  # 清理失败不影响服务，下个周期再试
+                    print(f"会话清理失败: {str(exc)}")
+
+        self._sweeper = threading.Thread(target=run, name="session-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self) -> None:
+        self._stop.set()
+        sweeper, self._sweeper = self._sweeper, None
+        if sweeper is not None:
+            sweeper.join(timeout=5)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "sweeper_running": self._sweeper is not None and self._sweeper.is_alive(),
+                **self._counters,
+            }
+
+
+session_index = SessionIndex()
@@ -0,0 +1,138 @@
+"""
+签名会话令牌
+Stateless HMAC-SHA256 tokens carrying user_id and expiry, plus a small revocation denylist.
+
+格式：st1.<base64url(JSON 载荷)>.<base64url(签名)>，载荷为 {"uid", "exp", "jti"}。
+校验只做 HMAC + 过期判断，不读会话文件；登出把 jti 写入 revoked_tokens 文档，
+各 worker 按文档版本同步内存中的吊销表（版本检查按 RUNTIME_DOCUMENT_REFRESH_SECONDS 节流，
+其他 worker 的登出最多延迟一个间隔生效）。
+
+环境变量：
+- AUTH_TOKEN_SECRET: 签名密钥；未设置时自动生成并保存在 AUTH_TOKEN_SECRET_PATH（默认 runtime/auth_token_secret）
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from .runtime.store import DocumentWatcher, get_runtime_store, resolve_runtime_path, runtime_file_lock
+
+
+TOKEN_PREFIX = "st1"
+REVOKED_TOKENS_DOCUMENT = "revoked_tokens"
+
+_SECRETS: Dict[str, bytes] = {}
+_SECRETS_LOCK = threading.Lock()
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _load_secret() -> bytes:
+    configured = os.getenv("AUTH_TOKEN_SECRET")
+    if configured:
+        return configured.encode("utf-8")
+
+    path = resolve_runtime_path("AUTH_TOKEN_SECRET_PATH", "auth_token_secret")
+    key = str(path)
+    with _SECRETS_LOCK:
+        cached = _SECRETS.get(key)
+        if cached is not None:
+            return cached
+        # 多个 worker 同时首启时只能有一个生成密钥，其余读同一份
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with runtime_file_lock(path):
+            if not path.exists():
+                path.write_text(secrets.token_hex(32), encoding="utf-8")
+                os.chmod(path, 0o600)
+            secret = path.read_text(encoding="utf-8").strip().encode("utf-8")
+        _SECRETS[key] = secret
+        return secret
+
+
+def _sign(body: str) -> str:
+    return _b64encode(hmac.new(_load_secret(), body.encode("ascii"), hashlib.sha256).digest())
+
+
+def is_signed_token(token: str) -> bool:
+    return token.isascii() and token.startswith(TOKEN_PREFIX + ".") and token.count(".") == 2
+
+
+def issue_signed_token(user_id: str, expires_at: float) -> str:
+    payload = {"uid": user_id, "exp": int(expires_at), "jti": secrets.token_urlsafe(12)}
+    body = TOKEN_PREFIX + "." + _b64encode(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+    return body + "." + _sign(body)
+
+
+def decode_signed_token(token: str, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """校验签名与过期时间，通过则返回载荷；吊销检查由调用方结合 denylist 完成。"""
+    if not is_signed_token(token):
+        return None
+    body, _, signature = token.rpartition(".")
+    if not hmac.compare_digest(signature, _sign(body)):
+        return None
+    try:
+        payload = json.loads(_b64decode(body.split(".", 1)[1]))
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if not isinstance(payload, dict) or not payload.get("uid") or not payload.get("jti"):
+        return None
+    try:
+        expires_at = float(payload.get("exp"))
+    except (TypeError, ValueError):
+        return None
+    if expires_at <= (time.time() if now is None else now):
+        return None
+    return payload
+
+
+class TokenDenylist:
+    """已吊销的 jti → 原过期时间；过期后条目自然失效并在下次写入时清理。"""
+
+    def __init__(self):
+        self._revoked: Dict[str, float] = {}
+        self._watcher = DocumentWatcher(REVOKED_TOKENS_DOCUMENT)
+        self._lock = threading.Lock()
+
+    def _ensure_fresh(self) -> None:
+        stale, generation = self._watcher.poll()
+        if not stale:
+            return
+        payload = get_runtime_store().read_document(REVOKED_TOKENS_DOCUMENT, {"revoked": {}})
+        revoked = payload.get("revoked") if isinstance(payload, dict) else {}
+        with self._lock:
+            self._revoked = dict(revoked) if isinstance(revoked, dict) else {}
+            self._watcher.loaded(generation)
+
+    def is_revoked(self, jti: str) -> bool:
+        self._ensure_fresh()
+        with self._lock:
+            return jti in self._revoked
+
+    def revoke(self, jti: str, expires_at: float) -> None:
+        now = time.time()
+
+        def updater(payload: Dict[str, Any]) -> Dict[str, Any]:
+            revoked = payload.get("revoked") if isinstance(payload, dict) else {}
+            revoked = {key: value for key, value in (revoked or {}).items() if float(value) > now}
+            revoked[jti] = expires_at
+            return {"revoked": revoked}
+
+        get_runtime_store().update_document(REVOKED_TOKENS_DOCUMENT, {"revoked": {}}, updater)
+        with self._lock:
+            self._revoked[jti] = expires_at
+            self._watcher.invalidate()
+
+
+token_denylist = TokenDenylist()
@@ -0,0 +1,92 @@
+"""
+账号索引
+In-process user directory (email → user, user_id → user) kept in sync with the users document.
+
+查找前经 DocumentWatcher 比对文档版本（按 RUNTIME_DOCUMENT_REFRESH_SECONDS 节流），变化才整体重载；
+未命中时跳过节流再查一次，其他 worker 刚注册的账号立即可见。登录传 fresh=True 总是重新检查，
+其他 worker 刚改的密码不会在节流窗口内继续沿用旧哈希。
+写入仍经运行时存储在锁内完成，写完调用 invalidate()。返回的账号记录是副本，调用方修改不影响索引。
+"""
+
+import copy
+import threading
+from typing import Any, Dict, List, Optional
+
+from .runtime.store import DocumentWatcher, get_runtime_store
+
+
+USERS_DOCUMENT = "users"
+
+
+def normalize_email(email: str) -> str:
+    return (email or "").strip().lower()
+
+
+def _extract_users(payload: Any) -> List[Dict[str, Any]]:
+    users = payload.get("users") if isinstance(payload, dict) else []
+    return users if isinstance(users, list) else []
+
+
+class UserIndex:
+    def __init__(self):
+        self._by_email: Dict[str, Dict[str, Any]] = {}
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        self._watcher = DocumentWatcher(USERS_DOCUMENT)
+        self._lock = threading.Lock()
+        self._reloads = 0
+
+    def _load(self, generation: Any) -> None:
+        payload = get_runtime_store().read_document(USERS_DOCUMENT, {"users": []})
+        by_email: Dict[str, Dict[str, Any]] = {}
+        by_id: Dict[str, Dict[str, Any]] = {}
+        for user in _extract_users(payload):
+            if not isinstance(user, dict):
+                continue
+            email = normalize_email(str(user.get("email") or ""))
+            # 与原先线性扫描一致：重复时以先出现的记录为准
+            if email and email not in by_email:
+                by_email[email] = user
+            user_id = user.get("user_id")
+            if user_id and user_id not in by_id:
+                by_id[str(user_id)] = user
+        with self._lock:
+            self._by_email = by_email
+            self._by_id = by_id
+            self._watcher.loaded(generation)
+            self._reloads += 1
+
+    def _ensure_fresh(self, force: bool = False) -> bool:
+        """必要时重载；返回是否重载过。"""
+        stale, generation = self._watcher.poll(force)
+        if stale:
+            self._load(generation)
+        return stale
+
+    def _get(self, by_email: bool, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return (self._by_email if by_email else self._by_id).get(key)
+
+    def _lookup(self, by_email: bool, key: str, fresh: bool) -> Optional[Dict[str, Any]]:
+        self._ensure_fresh(force=fresh)
+        user = self._get(by_email, key)
+        # 未命中可能只是节流窗口内还没看到其他 worker 的写入，跳过节流再查一次
+        if user is None and not fresh and self._ensure_fresh(force=True):
+            user = self._get(by_email, key)
+        return copy.deepcopy(user) if user is not None else None
+
+    def by_email(self, email: str, fresh: bool = False) -> Optional[Dict[str, Any]]:
+        return self._lookup(True, normalize_email(email), fresh)
+
+    def by_id(self, user_id: str, fresh: bool = False) -> Optional[Dict[str, Any]]:
+        return self._lookup(False, user_id, fresh)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._watcher.invalidate()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"users": len(self._by_id), "reloads": self._reloads}
+
+
+user_index = UserIndex()
@@ -7,7 +7,7 @@ from datetime import datetime, timezone
 from typing import Any, Dict, List
 from uuid import uuid4
 
-from .runtime.store import append_jsonl, read_recent_jsonl, resolve_runtime_path
+from .runtime.store import get_runtime_store
 
 
 DEFAULT_WEIGHT_PRESETS = {
@@ -18,28 +18,27 @@ DEFAULT_WEIGHT_PRESETS = {
 }
 
 
-def _tuning_path():
-    return resolve_runtime_path("WEIGHT_TUNING_PATH", "weight_tuning_events.jsonl")
+COLLECTION = "weight_tuning"
 
 
 def record_weight_tuning(event: Dict[str, Any]) -> Dict[str, Any]:
-    path = _tuning_path()
+    store = get_runtime_store()
     event_id = str(uuid4())
     payload = {
         "event_id": event_id,
         "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
         "event": event,
     }
-    append_jsonl(path, payload)
+    store.append(COLLECTION, payload)
     return {
         "recorded": True,
         "event_id": event_id,
-        "path": str(path),
+        "path": store.location(COLLECTION),
     }
 
 
 def read_weight_tuning_events(limit: int = 200) -> List[Dict[str, Any]]:
-    return read_recent_jsonl(_tuning_path(), limit=limit)
+    return get_runtime_store().recent(COLLECTION, limit=limit)
 
 
 def resolve_effective_weight_presets() -> Dict[str, Dict[str, float]]:
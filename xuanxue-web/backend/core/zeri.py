@@ -3,9 +3,13 @@
 Date Selection Module - Auspicious Days
 """
 
-from datetime import datetime, timedelta
-from typing import Dict, List
-from .ganzhi import get_year_ganzhi, get_month_ganzhi, get_day_ganzhi, get_wuxing, DIZHI
+import heapq
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from operator import itemgetter
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from .almanac_table import AlmanacRow, AlmanacTable, get_almanac_table
+from .ganzhi import get_year_ganzhi, get_month_ganzhi, get_day_ganzhi, get_wuxing, get_ganzhi, DIZHI, TIANGAN
 
 
 # 二十八星宿
@@ -55,14 +59,85 @@ PENGZU_BAIJI = {
 }
 
 
+# 十二神起始：甲己日青龙、乙庚日天德、丙辛日司命、丁壬日朱雀、戊癸日玉堂
+SHIER_SHEN_START = {
+    '甲': 0, '己': 0,
+    '乙': 5, '庚': 5,
+    '丙': 10, '辛': 10,
+    '丁': 3, '壬': 3,
+    '戊': 7, '癸': 7
+}
+
+# 用途关键词映射
+PURPOSE_KEYWORDS = {
+    '结婚': ['结婚', '嫁娶', '婚姻'],
+    '开业': ['开业', '开市', '开张', '交易'],
+    '搬家': ['搬家', '移徙', '入宅'],
+    '出行': ['出行', '远行', '旅游'],
+    '动土': ['动土', '修造', '装修'],
+    '安葬': ['安葬', '下葬', '葬礼'],
+    '祈福': ['祈福', '祭祀', '求神'],
+    '求财': ['求财', '纳财', '开市'],
+    '签约': ['签约', '立券', '交易']
+}
+
+WEEKDAY_NAMES = ['周一', '周二', '周三', '周四', '周五', '周六', '周日']
+
+
+def score_day(jianxing: str, shier_shen: str) -> Tuple[int, str, str]:
+    """建星吉凶 + 黄道黑道 → (评分, 等级, 颜色)"""
+    jianxing_level = JIANXING_JIXIONG.get(jianxing, {}).get('level')
+    huangdao_type = HUANGDAO_HEIDAO.get(shier_shen, '未知')
+
+    score = 50  # 基础分
+
+    if jianxing_level == '吉':
+        score += 15
+    elif jianxing_level == '大吉':
+        score += 25
+    elif jianxing_level == '凶':
+        score -= 15
+    elif jianxing_level == '大凶':
+        score -= 30
+
+    if huangdao_type == '黄道':
+        score += 20
+    elif huangdao_type == '黑道':
+        score -= 20
+
+    return (score,) + score_level(score)
+
+
+def score_level(score: int) -> Tuple[str, str]:
+    """评分 → (等级, 颜色)"""
+    if score >= 80:
+        return '大吉', '#4caf50'
+    if score >= 65:
+        return '吉', '#8bc34a'
+    if score >= 50:
+        return '平', '#ff9800'
+    if score >= 35:
+        return '凶', '#f44336'
+    return '大凶', '#d32f2f'
+
+
 class DateSelection:
-    """择日类"""
+    """择日类
     
-    def __init__(self, year: int, month: int, day: int):
+    默认从黄历预计算表（core.almanac_table）读取当日结果，表不可用或日期超出表范围时实时计算；
+    live=True 强制实时计算，table 可指定要读取的表（校验用）。
+    """
+    
+    def __init__(self, year: int, month: int, day: int, table: Optional[AlmanacTable] = None, live: bool = False):
         self.year = year
         self.month = month
         self.day = day
         self.date = datetime(year, month, day)
+        if live:
+            self._row = None
+        else:
+            table = table or get_almanac_table()
+            self._row = table.row(self.date.date()) if table is not None else None
         
     def get_jianxing(self) -> str:
         """获取建星"""
@@ -87,15 +162,7 @@ class DateSelection:
         day_zhi = day_ganzhi[1]
         
         # 根据日干确定起始神
-        start_map = {
-            '甲': 0, '己': 0,  # 甲己日从青龙起
-            '乙': 5, '庚': 5,  # 乙庚日从天德起
-            '丙': 10, '辛': 10,  # 丙辛日从司命起
-            '丁': 3, '壬': 3,  # 丁壬日从朱雀起
-            '戊': 7, '癸': 7   # 戊癸日从玉堂起
-        }
-        
-        start_index = start_map.get(day_gan, 0)
+        start_index = SHIER_SHEN_START.get(day_gan, 0)
         # 按日支推进，避免固定 0 点导致结果失真
         day_zhi_index = DIZHI.index(day_zhi)
         shen_index = (start_index + day_zhi_index) % 12
@@ -122,6 +189,8 @@ class DateSelection:
     
     def analyze_day(self) -> Dict:
         """分析日期吉凶"""
+        if self._row is not None:
+            return _day_record(self.date.date(), self._row)
         jianxing = self.get_jianxing()
         shier_shen = self.get_shier_shen()
         xingxiu = self.get_xingxiu()
@@ -130,39 +199,7 @@ class DateSelection:
         jianxing_info = JIANXING_JIXIONG.get(jianxing, {})
         huangdao_type = HUANGDAO_HEIDAO.get(shier_shen, '未知')
         
-        # 综合评分
-        score = 50  # 基础分
-        
-        if jianxing_info.get('level') == '吉':
-            score += 15
-        elif jianxing_info.get('level') == '大吉':
-            score += 25
-        elif jianxing_info.get('level') == '凶':
-            score -= 15
-        elif jianxing_info.get('level') == '大凶':
-            score -= 30
-        
-        if huangdao_type == '黄道':
-            score += 20
-        elif huangdao_type == '黑道':
-            score -= 20
-        
-        # 判断等级
-        if score >= 80:
-            level = '大吉'
-            color = '#4caf50'
-        elif score >= 65:
-            level = '吉'
-            color = '#8bc34a'
-        elif score >= 50:
-            level = '平'
-            color = '#ff9800'
-        elif score >= 35:
-            level = '凶'
-            color = '#f44336'
-        else:
-            level = '大凶'
-            color = '#d32f2f'
+        score, level, color = score_day(jianxing, shier_shen)
         
         return {
             'date': f'{self.year}年{self.month}月{self.day}日',
@@ -182,8 +219,12 @@ class DateSelection:
 
     def get_calc_trace(self) -> Dict:
         """返回择日评分的中间计算过程。"""
-        month_ganzhi = get_month_ganzhi(self.year, self.month)
-        day_ganzhi = get_day_ganzhi(self.year, self.month, self.day)
+        if self._row is not None:
+            month_ganzhi = TIANGAN[self._row.month_gan] + DIZHI[month_zhi_index(self.month)]
+            day_ganzhi = get_ganzhi(self._row.day_cycle)
+        else:
+            month_ganzhi = get_month_ganzhi(self.year, self.month)
+            day_ganzhi = get_day_ganzhi(self.year, self.month, self.day)
         month_zhi = month_ganzhi[1]
         day_zhi = day_ganzhi[1]
         month_index = DIZHI.index(month_zhi)
@@ -191,14 +232,7 @@ class DateSelection:
         jianxing_index = (day_index - month_index) % 12
 
         day_gan = day_ganzhi[0]
-        start_map = {
-            '甲': 0, '己': 0,
-            '乙': 5, '庚': 5,
-            '丙': 10, '辛': 10,
-            '丁': 3, '壬': 3,
-            '戊': 7, '癸': 7
-        }
-        start_index = start_map.get(day_gan, 0)
+        start_index = SHIER_SHEN_START.get(day_gan, 0)
         shier_shen_index = (start_index + day_index) % 12
         days_from_epoch = (self.date - datetime(2000, 1, 1)).days
         xingxiu_index = days_from_epoch % 28
@@ -272,49 +306,196 @@ def find_auspicious_days(year: int, month: int, purpose: str = '通用', days: i
         days: 查找天数
     
     Returns:
-        吉日列表
+        吉日列表（按分数从高到低，同分按日期先后）
     """
-    start_date = datetime(year, month, 1)
-    results = []
-    
-    # 用途关键词映射
-    purpose_keywords = {
-        '结婚': ['结婚', '嫁娶', '婚姻'],
-        '开业': ['开业', '开市', '开张', '交易'],
-        '搬家': ['搬家', '移徙', '入宅'],
-        '出行': ['出行', '远行', '旅游'],
-        '动土': ['动土', '修造', '装修'],
-        '安葬': ['安葬', '下葬', '葬礼'],
-        '祈福': ['祈福', '祭祀', '求神'],
-        '求财': ['求财', '纳财', '开市']
+    if days <= 0:
+        return []
+    start = date(year, month, 1)
+    _, results = scan_almanac(start, start + timedelta(days=days - 1), purpose)
+    return results
+
+
+# 日期区间择日引擎：建星只看日支与月支（月支按公历月取寅月为正月），十二神只看日干支，
+# 因此一天的评分完全由 (月支, 六十甲子日序) 决定，预先按 12 × 60 的周期表算好，扫描时只做查表
+MAX_RANGE_DAYS = 366 * 5
+DAY_CYCLE_BASE = 40 - date(1900, 1, 1).toordinal()   # 1900-01-01 为甲辰日（序号 40）
+_XINGXIU_BASE = date(2000, 1, 1).toordinal()
+
+
+def month_zhi_index(month: int) -> int:
+    return (month + 1) % 12
+
+
+def _cycle_jianxing_and_shen(month_zhi: int, cycle: int) -> Tuple[int, int]:
+    day_zhi = cycle % 12
+    jianxing_index = (day_zhi - month_zhi) % 12
+    shen_index = (SHIER_SHEN_START[TIANGAN[cycle % 10]] + day_zhi) % 12
+    return jianxing_index, shen_index
+
+
+CYCLE_JIANXING: Tuple[Tuple[int, ...], ...] = tuple(
+    tuple(_cycle_jianxing_and_shen(month_zhi, cycle)[0] for cycle in range(60))
+    for month_zhi in range(12)
+)
+
+CYCLE_SCORES: Tuple[Tuple[int, ...], ...] = tuple(
+    tuple(
+        score_day(JIANXING[jianxing_index], SHIER_SHEN[shen_index])[0]
+        for jianxing_index, shen_index in (_cycle_jianxing_and_shen(month_zhi, cycle) for cycle in range(60))
+    )
+    for month_zhi in range(12)
+)
+
+
+# 不直接宜该用途的日子，评分至少到这里才可选（与 find_auspicious_days 原规则一致）
+PURPOSE_FALLBACK_SCORE = 60
+
+
+def iter_month_spans(start: date, end: date) -> Iterator[Tuple[int, int, int]]:
+    """把 [start, end] 按公历月切段，逐段产出 (首日 ordinal, 天数, 月支)；区间扫描与位图索引共用。"""
+    cursor = start
+    while cursor <= end:
+        next_month = date(cursor.year + cursor.month // 12, cursor.month % 12 + 1, 1)
+        month_last = min(end, next_month - timedelta(days=1))
+        yield cursor.toordinal(), (month_last - cursor).days + 1, month_zhi_index(cursor.month)
+        cursor = next_month
+
+
+def match_jianxing_keywords(keywords: Sequence[str]) -> Tuple[Tuple[bool, ...], Tuple[bool, ...]]:
+    """
+    关键词对十二建星的宜 / 忌做子串匹配，返回 (宜命中, 忌命中)，按 JIANXING 顺序。
+
+    关键词出现在拼接后的宜 / 忌文本中即命中；择日筛选与用途倒排索引都由这里判定。
+    """
+    suitable = []
+    avoid = []
+    for jianxing in JIANXING:
+        info = JIANXING_JIXIONG[jianxing]
+        suitable_text = ' '.join(info['suitable'])
+        avoid_text = ' '.join(info['avoid'])
+        suitable.append(any(kw in suitable_text for kw in keywords))
+        avoid.append(any(kw in avoid_text for kw in keywords))
+    return tuple(suitable), tuple(avoid)
+
+
+def _purpose_key(purpose: str) -> str:
+    """用途归到 PURPOSE_KEYWORDS 的键，未知用途按通用处理；缓存只以归并后的键为准，不随请求参数增长。"""
+    return purpose if purpose in PURPOSE_KEYWORDS else '通用'
+
+
+@lru_cache(maxsize=len(PURPOSE_KEYWORDS) + 1)
+def _purpose_jianxing_flags(purpose: str) -> Optional[Tuple[Tuple[bool, ...], Tuple[bool, ...]]]:
+    """用途整组关键词的建星宜 / 忌命中；通用或未知用途返回 None。"""
+    keywords = PURPOSE_KEYWORDS.get(purpose, [])
+    if purpose == '通用' or not keywords:
+        return None
+    return match_jianxing_keywords(keywords)
+
+
+@lru_cache(maxsize=256)
+def _eligible_cycle_scores(purpose: str, min_score: int) -> Tuple[Tuple[Optional[int], ...], ...]:
+    """按 (月支, 日序) 给出入选的评分，不入选为 None；规则与逐日 analyze_day 筛选一致。"""
+    flags = _purpose_jianxing_flags(purpose)
+    table = []
+    for month_zhi in range(12):
+        row = []
+        for cycle in range(60):
+            score = CYCLE_SCORES[month_zhi][cycle]
+            jianxing_index = CYCLE_JIANXING[month_zhi][cycle]
+            eligible = score >= min_score
+            if flags is not None:
+                suitable, avoid = flags
+                if avoid[jianxing_index] or (not suitable[jianxing_index] and score < PURPOSE_FALLBACK_SCORE):
+                    eligible = False
+            row.append(score if eligible else None)
+        table.append(tuple(row))
+    return tuple(table)
+
+
+def compute_almanac_row(day: date) -> AlmanacRow:
+    """按周期算术得到单日的黄历表行（建表与表外日期使用）。"""
+    ordinal = day.toordinal()
+    cycle = (DAY_CYCLE_BASE + ordinal) % 60
+    month_zhi = month_zhi_index(day.month)
+    jianxing_index, shen_index = _cycle_jianxing_and_shen(month_zhi, cycle)
+    return AlmanacRow(
+        day_cycle=cycle,
+        month_gan=TIANGAN.index(get_month_ganzhi(day.year, day.month)[0]),
+        jianxing=jianxing_index,
+        shier_shen=shen_index,
+        xingxiu=(ordinal - _XINGXIU_BASE) % 28,
+        score=CYCLE_SCORES[month_zhi][cycle],
+    )
+
+
+def _day_record(day: date, row: AlmanacRow) -> Dict:
+    """由黄历表行组装 analyze_day 同结构的记录。"""
+    jianxing = JIANXING[row.jianxing]
+    shier_shen = SHIER_SHEN[row.shier_shen]
+    jianxing_info = JIANXING_JIXIONG[jianxing]
+    level, color = score_level(row.score)
+    return {
+        'date': f'{day.year}年{day.month}月{day.day}日',
+        'ganzhi': get_ganzhi(row.day_cycle),
+        'jianxing': jianxing,
+        'jianxing_info': jianxing_info,
+        'shier_shen': shier_shen,
+        'huangdao_type': HUANGDAO_HEIDAO.get(shier_shen, '未知'),
+        'xingxiu': ERSHIBA_XINGXIU[row.xingxiu],
+        'pengzu_baiji': {
+            'gan_ji': PENGZU_BAIJI.get(TIANGAN[row.day_cycle % 10], ''),
+            'zhi_ji': PENGZU_BAIJI.get(DIZHI[row.day_cycle % 12], '')
+        },
+        'score': row.score,
+        'level': level,
+        'color': color,
+        'suitable': jianxing_info.get('suitable', []),
+        'avoid': jianxing_info.get('avoid', [])
     }
+
+
+def almanac_day(day: date) -> Dict:
+    """单日黄历记录，字段与 DateSelection.analyze_day 一致并附带星期。"""
+    table = get_almanac_table()
+    row = table.row(day) if table is not None else None
+    record = _day_record(day, row if row is not None else compute_almanac_row(day))
+    record['weekday'] = WEEKDAY_NAMES[day.weekday()]
+    return record
+
+
+def scan_almanac(
+    start: date,
+    end: date,
+    purpose: str = '通用',
+    limit: Optional[int] = None,
+    min_score: int = 50,
+) -> Tuple[int, List[Dict]]:
+    """
+    扫描 [start, end] 内符合用途的日子
     
-    keywords = purpose_keywords.get(purpose, [])
-    
-    for i in range(days):
-        current_date = start_date + timedelta(days=i)
-        selector = DateSelection(current_date.year, current_date.month, current_date.day)
-        analysis = selector.analyze_day()
-        
-        # 如果指定了用途，检查是否适合
-        if purpose != '通用' and keywords:
-            is_suitable = any(kw in ' '.join(analysis['suitable']) for kw in keywords)
-            is_avoid = any(kw in ' '.join(analysis['avoid']) for kw in keywords)
-            
-            if is_avoid:
-                continue
-            if not is_suitable and analysis['score'] < 60:
-                continue
-        
-        # 只返回平以上的日子
-        if analysis['score'] >= 50:
-            analysis['weekday'] = ['周一', '周二', '周三', '周四', '周五', '周六', '周日'][current_date.weekday()]
-            results.append(analysis)
-    
-    # 按分数排序
-    results.sort(key=lambda x: x['score'], reverse=True)
-    
-    return results
+    逐月查周期表筛出 (评分, 日序)，再用 heapq 取前 limit 个（limit 为 None 时全量排序），
+    只为入选的日子组装完整记录。返回 (入选总数, 记录列表)，同分按日期先后。
+    """
+    if end < start:
+        raise ValueError("end must not be earlier than start")
+    if (end - start).days + 1 > MAX_RANGE_DAYS:
+        raise ValueError(f"date range must not exceed {MAX_RANGE_DAYS} days")
+
+    table = _eligible_cycle_scores(_purpose_key(purpose), min_score)
+    candidates: List[Tuple[int, int]] = []
+    for first, day_count, month_zhi in iter_month_spans(start, end):
+        scores = table[month_zhi]
+        offset = DAY_CYCLE_BASE + first
+        for index in range(day_count):
+            score = scores[(offset + index) % 60]
+            if score is not None:
+                candidates.append((score, first + index))
+
+    if limit is None:
+        selected = sorted(candidates, key=itemgetter(0), reverse=True)
+    else:
+        selected = heapq.nlargest(limit, candidates, key=itemgetter(0))
+    return len(candidates), [almanac_day(date.fromordinal(ordinal)) for _, ordinal in selected]
 
 
 def get_today_fortune(year: int, month: int, day: int) -> Dict:
@@ -334,9 +515,7 @@ def get_today_fortune(year: int, month: int, day: int) -> Dict:
     }
     
     analysis['fortune_advice'] = fortune_advice.get(level, '')
-    analysis['weekday'] = ['周一', '周二', '周三', '周四', '周五', '周六', '周日'][
-        datetime(year, month, day).weekday()
-    ]
+    analysis['weekday'] = WEEKDAY_NAMES[datetime(year, month, day).weekday()]
     analysis['calc_trace'] = selector.get_calc_trace()
     
     return analysis
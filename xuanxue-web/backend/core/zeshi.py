@@ -0,0 +1,153 @@
+"""
+择时模块
+Hour-level search: combines the day's zeri score with the QiMen chart of each 2-hour period.
+
+日级先走择日位图（core.almanac_index）筛出可选日，再对每个可选日的 12 个时辰取奇门盘的
+事项预测与最佳方位。奇门盘的宫位排布只由 (局数, 值符宫) 决定，共 9 × 7 = 63 种
+（见 core.qimen.QIMEN_LAYOUTS），偶数整点上值符宫只落在其中 4 种，实际用到 36 种；
+同一排布与事项的结果只算一次并缓存，因此扫描成本与区间天数基本无关。
+"""
+
+import heapq
+import threading
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .almanac_index import iter_selected_days, select_days
+from .ganzhi import DIZHI, TIANGAN, get_day_ganzhi, get_hour_ganzhi
+from .qimen import QiMenChart
+from .zeri import almanac_day
+
+
+# 每个时辰取中间的整点排盘：0 点为子时（23:00-01:00），2 点为丑时，依此类推
+SHICHEN_HOURS = tuple(range(0, 24, 2))
+
+# 奇门事项类型，取自 predict_matter 所用的事项 → 关键八门表
+MATTER_TYPES = tuple(QiMenChart.MATTER_GATES)
+
+# 未指定择日用途时按事项类型取默认用途
+MATTER_PURPOSES = {
+    '求财': '求财',
+    '婚姻': '结婚',
+    '出行': '出行',
+}
+
+PALACE_DIRECTIONS = {
+    '坎宫': '北', '离宫': '南', '震宫': '东', '兑宫': '西',
+    '巽宫': '东南', '坤宫': '西南', '乾宫': '西北', '艮宫': '东北', '中宫': '中'
+}
+
+# 综合分 = 日评分 × DAY_WEIGHT + 时辰奇门分 × HOUR_WEIGHT；奇门分由宫位吉凶分数 -4..4 线性映射到 0..100
+DAY_WEIGHT = 0.5
+HOUR_WEIGHT = 0.5
+
+_OUTCOMES: Dict[Tuple[int, int, str], Optional[Dict[str, Any]]] = {}
+_OUTCOMES_LOCK = threading.Lock()
+
+
+def _hour_outcome(day: date, hour: int, matter_type: str) -> Optional[Dict[str, Any]]:
+    """某时辰奇门盘对该事项的结论；按排布缓存，事项无对应宫位时为 None。"""
+    key = QiMenChart.layout_key(day.month, day.day, hour) + (matter_type,)
+    with _OUTCOMES_LOCK:
+        if key in _OUTCOMES:
+            return _OUTCOMES[key]
+
+    chart = QiMenChart(day.year, day.month, day.day, hour)
+    prediction = chart.predict_matter(matter_type)
+    outcome = None
+    if '最佳宫位' in prediction:
+        fortune_score = chart.analyze_palace(prediction['最佳宫位'])['吉凶分数']
+        best_direction = chart.find_best_direction()
+        outcome = {
+            'score': round((fortune_score + 4) * 12.5, 1),
+            'qimen': {
+                '最佳宫位': prediction['最佳宫位'],
+                '综合吉凶': prediction['综合吉凶'],
+                '吉凶分数': fortune_score,
+                '建议': prediction['建议'],
+            },
+            'direction': {
+                '宫位': best_direction['最佳方位'],
+                '方位': PALACE_DIRECTIONS.get(best_direction['最佳方位'], ''),
+                '吉凶': best_direction['吉凶'],
+            },
+        }
+    with _OUTCOMES_LOCK:
+        _OUTCOMES[key] = outcome
+    return outcome
+
+
+def clear_hour_cache() -> None:
+    with _OUTCOMES_LOCK:
+        _OUTCOMES.clear()
+
+
+def _slot_record(day: date, hour: int, score: float, day_score: int, outcome: Dict[str, Any]) -> Dict[str, Any]:
+    day_gan_index = TIANGAN.index(get_day_ganzhi(day.year, day.month, day.day)[0])
+    shichen = DIZHI[hour // 2]
+    day_info = almanac_day(day)
+    return {
+        'date': day_info['date'],
+        'weekday': day_info['weekday'],
+        'hour': hour,
+        'shichen': f'{shichen}时',
+        'time_range': f'{(hour - 1) % 24:02d}:00-{hour + 1:02d}:00',
+        'hour_ganzhi': get_hour_ganzhi(day_gan_index, hour),
+        'score': score,
+        'day': {
+            'score': day_score,
+            'level': day_info['level'],
+            'jianxing': day_info['jianxing'],
+            'shier_shen': day_info['shier_shen'],
+            'huangdao_type': day_info['huangdao_type'],
+        },
+        'qimen': dict(outcome['qimen']),
+        'direction': dict(outcome['direction']),
+    }
+
+
+def search_auspicious_hours(
+    start: date,
+    end: date,
+    matter_type: str = '通用',
+    purposes: Optional[Sequence[str]] = None,
+    exclude: Iterable[date] = (),
+    limit: int = 10,
+    min_day_score: int = 50,
+) -> Tuple[int, List[Dict[str, Any]]]:
+    """
+    区间择时
+
+    Args:
+        matter_type: 奇门事项类型
+        purposes: 日级择日用途，默认按 MATTER_PURPOSES 由事项类型推出
+        exclude: 排除的日期
+        limit: 返回前 k 个时辰
+        min_day_score: 日评分下限
+
+    Returns:
+        (候选时辰总数, 前 limit 个 (日期, 时辰, 方位) 记录)，按综合分从高到低，同分按时间先后
+    """
+    if matter_type not in MATTER_TYPES:
+        raise ValueError(f"unknown matter_type: {matter_type}")
+    if purposes is None:
+        purposes = [MATTER_PURPOSES.get(matter_type, '通用')]
+
+    bitsets, selected = select_days(start, end, purposes, exclude, min_day_score)
+    candidates: List[Tuple[float, int, int, int]] = []
+    for index, day_score in iter_selected_days(bitsets, selected):
+        day = start + timedelta(days=index)
+        for hour in SHICHEN_HOURS:
+            outcome = _hour_outcome(day, hour, matter_type)
+            if outcome is not None:
+                score = round(day_score * DAY_WEIGHT + outcome['score'] * HOUR_WEIGHT, 1)
+                candidates.append((score, index, hour, day_score))
+
+    # 候选按时间先后排好再取前 k，nlargest 稳定，同分保持时间顺序
+    candidates.sort(key=lambda item: (item[1], item[2]))
+    top = heapq.nlargest(limit, candidates, key=lambda item: item[0])
+    results = []
+    for score, index, hour, day_score in top:
+        day = start + timedelta(days=index)
+        results.append(_slot_record(day, hour, score, day_score, _hour_outcome(day, hour, matter_type)))
+    return len(candidates), results
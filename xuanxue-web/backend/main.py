@@ -2,6 +2,7 @@
 玄学预测系统 - FastAPI后端主程序
 """
 
+from contextlib import asynccontextmanager
 from uuid import uuid4
 
 from fastapi import FastAPI, HTTPException, Request
@@ -12,8 +13,10 @@ from api.auth import router as auth_router
 from api.bazi import router as bazi_router
 from api.common import (
     AI_RUNTIME_STATE,
+    FastJSONResponse,
     configure_cors,
     http_exception_handler,
+    runtime_lock_timeout_handler,
     unhandled_exception_handler,
     validation_exception_handler,
 )
@@ -22,13 +25,30 @@ from api.fengshui import router as fengshui_router
 from api.location import router as location_router
 from api.system import router as system_router
 from api.ziwei import router as ziwei_router
+from core.auth import password_executor, start_session_sweeper, stop_session_sweeper
+from core.consult.fanout import shutdown_module_executor
 from core.llm_helper import llm_helper
+from core.runtime.executor import compute_executor
+from core.runtime.store import RuntimeLockTimeout
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_session_sweeper()
+    yield
+    stop_session_sweeper()
+    compute_executor.shutdown(wait=False)
+    password_executor.shutdown(wait=False)
+    shutdown_module_executor(wait=False)
+    await llm_helper.aclose()
 
 
 app = FastAPI(
     title="玄学预测系统API",
     description="综合性玄学预测平台API",
     version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
 
@@ -45,6 +65,7 @@ async def request_id_middleware(request: Request, call_next):
 
 app.add_exception_handler(RequestValidationError, validation_exception_handler)
 app.add_exception_handler(HTTPException, http_exception_handler)
+app.add_exception_handler(RuntimeLockTimeout, runtime_lock_timeout_handler)
 app.add_exception_handler(Exception, unhandled_exception_handler)
 
 app.include_router(system_router)
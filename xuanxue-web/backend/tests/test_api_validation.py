@@ -1,13 +1,23 @@
 import sys
+import json
 import unittest
 import asyncio
 import tempfile
+from pathlib import Path
 from unittest.mock import patch
 
 import httpx
 
 sys.path.append('/home/alfred/multiproject/xuanxue/xuanxue-web/backend')
 import main
+from api.bazi import BaZiRequest
+from api.common import dumps_json
+from core.auth import login_email_limiter, login_ip_limiter, sweep_expired_sessions
+from core.bazi_core import BaZiChart
+from core.runtime.executor import ComputeSaturatedError
+from core.runtime.store import JsonlRuntimeStore, RuntimeLockTimeout, get_runtime_store
+from core.session_index import session_index
+from core.user_index import USERS_DOCUMENT, UserIndex, user_index
 
 app = main.app
 
@@ -21,11 +31,16 @@ class TestApiValidation(unittest.TestCase):
                 "USER_STORE_PATH": self.temp_dir.name + "/users.json",
                 "SESSION_STORE_PATH": self.temp_dir.name + "/sessions.json",
                 "CONSULT_HISTORY_PATH": self.temp_dir.name + "/consult_history.jsonl",
+                "CONSULT_TRACE_PATH": self.temp_dir.name + "/consult_traces.jsonl",
                 "DECISION_LOG_PATH": self.temp_dir.name + "/decision_logs.jsonl",
                 "WEIGHT_TUNING_PATH": self.temp_dir.name + "/weight_tuning.jsonl",
+                "REVOKED_TOKEN_PATH": self.temp_dir.name + "/revoked_tokens.json",
+                "AUTH_TOKEN_SECRET_PATH": self.temp_dir.name + "/auth_token_secret",
             },
         )
         self.env_patch.start()
+        login_ip_limiter.reset()
+        login_email_limiter.reset()
 
     def tearDown(self):
         self.env_patch.stop()
@@ -111,6 +126,95 @@ class TestApiValidation(unittest.TestCase):
         self.assertEqual(resp.status_code, 200)
         self.assert_success_envelope(resp)
 
+    def test_bazi_compact_view_skips_calc_trace_and_fields_project_subtrees(self):
+        body = {"year": 1990, "month": 1, "day": 1, "hour": 12, "minute": 0, "gender": "男"}
+        with patch.object(BaZiChart, "get_calc_trace") as get_calc_trace:
+            compact = self.assert_success_envelope(self.request("POST", "/api/bazi?view=compact", json=body))["data"]
+        get_calc_trace.assert_not_called()
+        self.assertNotIn("calc_trace", compact)
+        self.assertNotIn("advanced_analysis", compact)
+        self.assertIn("analysis", compact)
+
+        projected = self.assert_success_envelope(self.request("POST", "/api/bazi?fields=bazi.day,gender_missing", json=body))["data"]
+        self.assertEqual(projected, {"bazi": {"day": BaZiChart(1990, 1, 1, 12, 0, "男").day_pillar}})
+
+        full = self.assert_success_envelope(self.request("POST", "/api/bazi?view=unknown", json=body))["data"]
+        self.assertIn("calc_trace", full)
+
+        for raw in (".", ",,", "..,."):
+            unprojected = self.assert_success_envelope(self.request("POST", f"/api/bazi?fields={raw}", json=body))["data"]
+            self.assertIn("calc_trace", unprojected)
+
+    def test_fields_projection_descends_into_lists(self):
+        resp = self.request("GET", "/api/zeri/range?start=2026-03-15&end=2026-06-14&purpose=结婚&limit=3&fields=days.score,purpose")
+        data = self.assert_success_envelope(resp)["data"]
+        self.assertEqual(set(data), {"days", "purpose"})
+        self.assertEqual(len(data["days"]), 3)
+        self.assertTrue(all(set(day) == {"score"} for day in data["days"]))
+
+    def test_bazi_batch_streams_ndjson_lines(self):
+        resp = self.request(
+            "POST",
+            "/api/bazi/batch",
+            json={
+                "births": [
+                    {"year": 1990, "month": 1, "day": 1, "hour": 12, "minute": 0, "gender": "男"},
+                    {"year": 2026, "month": 2, "day": 30, "hour": 8, "gender": "女"},
+                    {"year": 2026, "month": 2, "day": 4, "hour": 23, "gender": "女"},
+                ]
+            },
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.headers["content-type"].startswith("application/x-ndjson"))
+        self.assertEqual(resp.headers["x-batch-count"], "3")
+        lines = [json.loads(line) for line in resp.text.splitlines()]
+        self.assertEqual([line["index"] for line in lines], [0, 1, 2])
+        self.assertTrue(lines[0]["success"])
+        self.assertEqual(lines[0]["data"]["bazi"], BaZiChart(1990, 1, 1, 12, 0, "男").get_pillars())
+        self.assertFalse(lines[1]["success"])
+        self.assertEqual(lines[1]["error"]["code"], "bad_request")
+        self.assertEqual(lines[2]["data"]["bazi"], BaZiChart(2026, 2, 4, 23, 0, "女").get_pillars())
+
+    def test_bazi_batch_rejects_empty_births(self):
+        resp = self.request("POST", "/api/bazi/batch", json={"births": []})
+        self.assertEqual(resp.status_code, 422)
+        self.assert_error_envelope(resp, "validation_error")
+
+    def test_bazi_returns_429_with_retry_after_when_executor_saturated(self):
+        with patch("api.common.compute_executor.run", side_effect=ComputeSaturatedError(7, 20, 20)):
+            resp = self.request(
+                "POST",
+                "/api/bazi",
+                json={"year": 1990, "month": 1, "day": 1, "hour": 12, "gender": "男"},
+            )
+        self.assertEqual(resp.status_code, 429)
+        self.assertEqual(resp.headers["retry-after"], "7")
+        payload = self.assert_error_envelope(resp, "compute_saturated")
+        self.assertTrue(payload["error"]["retryable"])
+
+    def test_system_runtime_reports_executor_stats(self):
+        resp = self.request("GET", "/api/system/runtime")
+        self.assertEqual(resp.status_code, 200)
+        stats = self.assert_success_envelope(resp)["data"]["compute_executor"]
+        self.assertIn(stats["kind"], ("thread", "process"))
+        self.assertIn("queue_depth", stats)
+        self.assertIn("wait_seconds", stats)
+        file_locks = self.assert_success_envelope(resp)["data"]["file_locks"]
+        self.assertFalse([name for name in file_locks if "/" in name or "\\" in name])
+
+    def test_runtime_lock_timeout_returns_503_storage_busy(self):
+        with patch("core.auth.get_runtime_store") as get_store:
+            get_store.return_value.update_document.side_effect = RuntimeLockTimeout(Path("users.json"), False, 0.5)
+            resp = self.request(
+                "POST",
+                "/api/auth/register",
+                json={"email": "busy@example.com", "password": "password123", "display_name": "忙"},
+            )
+        self.assertEqual(resp.status_code, 503)
+        self.assertEqual(resp.headers.get("retry-after"), "1")
+        payload = self.assert_error_envelope(resp, "storage_busy")
+        self.assertTrue(payload["error"]["retryable"])
+
     def test_ziwei_valid_payload_returns_200(self):
         resp = self.request(
             "POST",
@@ -264,6 +368,62 @@ class TestApiValidation(unittest.TestCase):
         resp = self.request("GET", "/api/zeri/auspicious?year=2026&month=2&days=1000")
         self.assertEqual(resp.status_code, 422)
 
+    def test_zeri_range_returns_top_days(self):
+        resp = self.request("GET", "/api/zeri/range?start=2026-03-15&end=2027-09-14&purpose=结婚&limit=5")
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()["data"]
+        self.assertEqual(data["scanned_days"], 549)
+        self.assertEqual(len(data["days"]), 5)
+        self.assertGreaterEqual(data["matched_count"], 5)
+        scores = [item["score"] for item in data["days"]]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_zeri_range_rejects_reversed_or_oversized_span(self):
+        resp = self.request("GET", "/api/zeri/range?start=2026-03-15&end=2026-03-01")
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.json()["error"]["code"], "bad_request")
+        resp = self.request("GET", "/api/zeri/range?start=2020-01-01&end=2030-01-01")
+        self.assertEqual(resp.status_code, 400)
+
+    def test_zeri_search_intersects_purposes_and_excludes_dates(self):
+        base = "/api/zeri/search?start=2026-01-01&end=2026-12-31&limit=100"
+        resp = self.request("GET", base + "&purposes=签约")
+        self.assertEqual(resp.status_code, 200)
+        first = resp.json()["data"]["days"][0]
+
+        month, day = first["date"].split("年")[1].rstrip("日").split("月")
+        excluded = f"2026-{int(month):02d}-{int(day):02d}"
+        resp = self.request("GET", base + f"&purposes=签约,出行&exclude={excluded}")
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()["data"]
+        self.assertEqual(data["purposes"], ["签约", "出行"])
+        self.assertEqual(data["excluded"], [excluded])
+        self.assertNotIn(first["date"], [item["date"] for item in data["days"]])
+        for item in data["days"]:
+            self.assertNotIn("出行", item["avoid"])
+
+    def test_zeri_search_rejects_unknown_purpose_and_bad_exclude(self):
+        base = "/api/zeri/search?start=2026-01-01&end=2026-03-31"
+        resp = self.request("GET", base + "&purposes=签约,飞天")
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("飞天", resp.json()["error"]["message"])
+        resp = self.request("GET", base + "&exclude=2026-02-30")
+        self.assertEqual(resp.status_code, 400)
+
+    def test_zeri_hours_returns_ranked_slots_with_direction(self):
+        resp = self.request("GET", "/api/zeri/hours?start=2026-03-01&end=2026-05-31&matter_type=求财&limit=5")
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()["data"]
+        self.assertEqual(len(data["slots"]), 5)
+        scores = [slot["score"] for slot in data["slots"]]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        slot = data["slots"][0]
+        self.assertIn(slot["shichen"], [f"{zhi}时" for zhi in "子丑寅卯辰巳午未申酉戌亥"])
+        self.assertTrue(slot["direction"]["方位"])
+
+        resp = self.request("GET", "/api/zeri/hours?start=2026-03-01&end=2026-03-31&matter_type=算命")
+        self.assertEqual(resp.status_code, 400)
+
     def test_zeri_invalid_real_date_returns_400(self):
         resp = self.request("GET", "/api/zeri/date/2026/2/31")
         self.assertEqual(resp.status_code, 400)
@@ -286,6 +446,287 @@ class TestApiValidation(unittest.TestCase):
         self.assertEqual(resp.status_code, 401)
         self.assert_error_envelope(resp, "unauthorized")
 
+    def test_session_index_follows_external_writes_and_sweeps_expired_sessions(self):
+        register_resp = self.request(
+            "POST",
+            "/api/auth/register",
+            json={"email": "session@example.com", "password": "password123", "display_name": "会话"},
+        )
+        token = self.assert_success_envelope(register_resp)["data"]["token"]
+        headers = {"Authorization": "Bearer " + token}
+        sessions_path = Path(self.temp_dir.name, "sessions.json")
+
+        self.assertEqual(self.request("GET", "/api/auth/me", headers=headers).status_code, 200)
+        before = sessions_path.stat().st_mtime_ns
+        self.assertEqual(self.request("GET", "/api/auth/me", headers=headers).status_code, 200)
+        self.assertEqual(sessions_path.stat().st_mtime_ns, before)
+
+        # 模拟另一个 worker 把会话改成已过期
+        payload = json.loads(sessions_path.read_text(encoding="utf-8"))
+        payload["sessions"][0]["expires_at"] = "2000-01-01T00:00:00+00:00"
+        sessions_path.write_text(json.dumps(payload), encoding="utf-8")
+        self.assertEqual(self.request("GET", "/api/auth/me", headers=headers).status_code, 401)
+
+        self.assertEqual(session_index.stats()["sessions"], 0)
+        sweep_expired_sessions()
+        self.assertEqual(json.loads(sessions_path.read_text(encoding="utf-8"))["sessions"], [])
+
+    def test_user_index_reloads_when_users_document_changes(self):
+        register_resp = self.request(
+            "POST",
+            "/api/auth/register",
+            json={"email": "index@example.com", "password": "password123", "display_name": "索引"},
+        )
+        self.assert_success_envelope(register_resp)
+        duplicate_resp = self.request(
+            "POST",
+            "/api/auth/register",
+            json={"email": "INDEX@example.com", "password": "password123"},
+        )
+        self.assertEqual(duplicate_resp.status_code, 409)
+
+        # 模拟另一个 worker 修改邮箱：旧邮箱失效，新邮箱可登录
+        users_path = Path(self.temp_dir.name, "users.json")
+        payload = json.loads(users_path.read_text(encoding="utf-8"))
+        payload["users"][0]["email"] = "renamed@example.com"
+        users_path.write_text(json.dumps(payload), encoding="utf-8")
+
+        old_login = self.request("POST", "/api/auth/login", json={"email": "index@example.com", "password": "password123"})
+        new_login = self.request("POST", "/api/auth/login", json={"email": "renamed@example.com", "password": "password123"})
+        self.assertEqual(old_login.status_code, 401)
+        self.assertEqual(self.assert_success_envelope(new_login)["data"]["user"]["email"], "renamed@example.com")
+
+    def test_user_index_sees_other_worker_writes_within_refresh_interval(self):
+        writer, reader = UserIndex(), UserIndex()
+        store = get_runtime_store()
+
+        def add_user(payload):
+            payload["users"].append({"user_id": "u1", "email": "fresh@example.com", "password_hash": "old"})
+            return payload
+
+        def change_password(payload):
+            payload["users"][0]["password_hash"] = "new"
+            return payload
+
+        with patch.dict("os.environ", {"RUNTIME_DOCUMENT_REFRESH_SECONDS": "60"}):
+            self.assertIsNone(reader.by_email("fresh@example.com"))
+            store.update_document(USERS_DOCUMENT, {"users": []}, add_user)
+            writer.invalidate()
+
+            # 未命中跳过节流重查：另一个 worker 刚注册的账号立即可见
+            self.assertEqual(writer.by_id("u1")["email"], "fresh@example.com")
+            self.assertEqual(reader.by_email("fresh@example.com")["user_id"], "u1")
+            self.assertEqual(reader.by_id("u1")["password_hash"], "old")
+
+            store.update_document(USERS_DOCUMENT, {"users": []}, change_password)
+            writer.invalidate()
+
+            # 命中时仍走节流缓存，登录用的 fresh 查找总是重新检查
+            self.assertEqual(reader.by_id("u1")["password_hash"], "old")
+            self.assertEqual(reader.by_email("fresh@example.com", fresh=True)["password_hash"], "new")
+
+    def test_login_is_rate_limited_per_email(self):
+        self.assert_success_envelope(self.request(
+            "POST",
+            "/api/auth/register",
+            json={"email": "limit@example.com", "password": "password123"},
+        ))
+        statuses = [
+            self.request("POST", "/api/auth/login", json={"email": "limit@example.com", "password": "wrongpass1"}).status_code
+            for _ in range(int(login_email_limiter.capacity))
+        ]
+        self.assertEqual(set(statuses), {401})
+
+        limited = self.request("POST", "/api/auth/login", json={"email": "limit@example.com", "password": "password123"})
+        self.assertEqual(limited.status_code, 429)
+        self.assertTrue(int(limited.headers["retry-after"]) >= 1)
+        self.assert_error_envelope(limited, "rate_limited")
+
+        other = self.request("POST", "/api/auth/login", json={"email": "other@example.com", "password": "password123"})
+        self.assertEqual(other.status_code, 401)
+
+    def test_login_rehashes_password_when_iterations_change(self):
+        with patch.dict("os.environ", {"PASSWORD_HASH_ITERATIONS": "1000"}):
+            self.assert_success_envelope(self.request(
+                "POST",
+                "/api/auth/register",
+                json={"email": "rehash@example.com", "password": "password123"},
+            ))
+        users_path = Path(self.temp_dir.name, "users.json")
+        stored = json.loads(users_path.read_text(encoding="utf-8"))["users"][0]
+        self.assertEqual(stored["password_iterations"], 1000)
+
+        login_resp = self.request("POST", "/api/auth/login", json={"email": "rehash@example.com", "password": "password123"})
+        self.assert_success_envelope(login_resp)
+        upgraded = json.loads(users_path.read_text(encoding="utf-8"))["users"][0]
+        self.assertEqual(upgraded["password_iterations"], 120000)
+        self.assertNotEqual(upgraded["password_hash"], stored["password_hash"])
+
+        relogin = self.request("POST", "/api/auth/login", json={"email": "rehash@example.com", "password": "password123"})
+        self.assert_success_envelope(relogin)
+
+    def test_signed_token_mode_skips_session_store_and_supports_logout(self):
+        with patch.dict("os.environ", {"AUTH_TOKEN_MODE": "signed"}):
+            register_resp = self.request(
+                "POST",
+                "/api/auth/register",
+                json={"email": "signed@example.com", "password": "password123"},
+            )
+            token = self.assert_success_envelope(register_resp)["data"]["token"]
+            self.assertTrue(token.startswith("st1."))
+            self.assertFalse(Path(self.temp_dir.name, "sessions.json").exists())
+
+            me_resp = self.request("GET", "/api/auth/me", headers={"Authorization": "Bearer " + token})
+            self.assertEqual(self.assert_success_envelope(me_resp)["data"]["user"]["email"], "signed@example.com")
+
+            tampered = token[:-2] + ("AA" if not token.endswith("AA") else "BB")
+            tampered_resp = self.request("GET", "/api/auth/me", headers={"Authorization": "Bearer " + tampered})
+            self.assertEqual(tampered_resp.status_code, 401)
+
+            logout_resp = self.request("POST", "/api/auth/logout", headers={"Authorization": "Bearer " + token})
+            self.assert_success_envelope(logout_resp)
+
+        # 切回 session 模式后，已吊销的签名令牌仍然无效
+        revoked_resp = self.request("GET", "/api/auth/me", headers={"Authorization": "Bearer " + token})
+        self.assertEqual(revoked_resp.status_code, 401)
+        revoked = json.loads(Path(self.temp_dir.name, "revoked_tokens.json").read_text(encoding="utf-8"))
+        self.assertEqual(len(revoked["revoked"]), 1)
+
+    def test_signed_token_validation_skips_document_checks_within_refresh_interval(self):
+        with patch.dict("os.environ", {"AUTH_TOKEN_MODE": "signed", "RUNTIME_DOCUMENT_REFRESH_SECONDS": "60"}):
+            register_resp = self.request(
+                "POST",
+                "/api/auth/register",
+                json={"email": "nostat@example.com", "password": "password123"},
+            )
+            token = self.assert_success_envelope(register_resp)["data"]["token"]
+            headers = {"Authorization": "Bearer " + token}
+            self.assert_success_envelope(self.request("GET", "/api/auth/me", headers=headers))
+
+            with patch.object(JsonlRuntimeStore, "document_generation", side_effect=AssertionError("document stat")):
+                me_resp = self.request("GET", "/api/auth/me", headers=headers)
+        user = self.assert_success_envelope(me_resp)["data"]["user"]
+        self.assertEqual(user["email"], "nostat@example.com")
+
+        looked_up = user_index.by_id(user["user_id"])
+        looked_up["email"] = "mutated@example.com"
+        self.assertEqual(user_index.by_id(user["user_id"])["email"], "nostat@example.com")
+
+    def test_auth_and_history_flow_on_sqlite_runtime_store(self):
+        with patch.dict(
+            "os.environ",
+            {
+                "RUNTIME_STORE_BACKEND": "sqlite",
+                "RUNTIME_STORE_SQLITE_PATH": self.temp_dir.name + "/runtime.sqlite3",
+            },
+        ):
+            register_resp = self.request(
+                "POST",
+                "/api/auth/register",
+                json={"email": "sqlite@example.com", "password": "password123", "display_name": "库用户"},
+            )
+            token = self.assert_success_envelope(register_resp)["data"]["token"]
+            headers = {"Authorization": "Bearer " + token}
+
+            consult_resp = self.request("POST", "/api/system/consult", headers=headers, json={"question": "我现在适合换工作吗？"})
+            self.assertTrue(self.assert_success_envelope(consult_resp)["data"]["account_history"]["saved"])
+
+            history_resp = self.request("GET", "/api/auth/history", headers=headers)
+            history_payload = self.assert_success_envelope(history_resp)
+            self.assertEqual(history_payload["data"]["count"], 1)
+            history_id = history_payload["data"]["items"][0]["history_id"]
+
+            detail_resp = self.request("GET", "/api/auth/history/" + history_id, headers=headers)
+            self.assertIn("换工作", self.assert_success_envelope(detail_resp)["data"]["item"]["question"])
+
+        self.assertFalse(Path(self.temp_dir.name, "users.json").exists())
+        self.assertFalse(Path(self.temp_dir.name, "consult_history.jsonl").exists())
+
+    def test_consult_timings_are_opt_in_and_exported_as_metrics(self):
+        register_resp = self.request(
+            "POST",
+            "/api/auth/register",
+            json={"email": "timing@example.com", "password": "password123", "display_name": "计时"},
+        )
+        headers = {"Authorization": "Bearer " + self.assert_success_envelope(register_resp)["data"]["token"]}
+
+        plain_resp = self.request("POST", "/api/system/consult", headers=headers, json={"question": "我现在适合换工作吗？"})
+        self.assertNotIn("timings", self.assert_success_envelope(plain_resp)["data"])
+
+        timed_resp = self.request(
+            "POST", "/api/system/consult?timings=true", headers=headers, json={"question": "我现在适合换工作吗？"}
+        )
+        timings = self.assert_success_envelope(timed_resp)["data"]["timings"]
+        for stage in ("modules", "summarizers", "world_model", "arbitration", "decision_log", "account_history", "trace_inputs"):
+            self.assertIn(stage, timings["stages"])
+        self.assertEqual(timings["modules"]["liuyao"]["status"], "ok")
+
+        metrics_resp = self.request("GET", "/api/system/metrics")
+        self.assertEqual(metrics_resp.status_code, 200)
+        self.assertTrue(metrics_resp.headers["content-type"].startswith("text/plain"))
+        text = metrics_resp.text
+        self.assertIn("# TYPE xuanxue_consult_stage_seconds histogram", text)
+        self.assertIn('xuanxue_consult_stage_seconds_bucket{stage="arbitration",le="+Inf"}', text)
+        self.assertIn('xuanxue_executor_wait_seconds_count{executor="password"}', text)
+
+        # 同一指标族的样本必须连续，且不暴露锁文件的绝对路径
+        family_order = []
+        for line in text.splitlines():
+            if line.startswith("# TYPE "):
+                family_order.append(line.split()[2])
+            elif not line.startswith("#"):
+                self.assertTrue(line.startswith(family_order[-1]), line)
+        self.assertEqual(len(family_order), len(set(family_order)))
+        self.assertIn("xuanxue_executor_completed_total", family_order)
+        self.assertNotIn(str(Path(tempfile.gettempdir())), text)
+
+    def test_consult_view_compact_and_fields_prune_response(self):
+        register_resp = self.request("POST", "/api/auth/register", json={"email": "compact@example.com", "password": "password123", "display_name": "精简"})
+        headers = {"Authorization": "Bearer " + self.assert_success_envelope(register_resp)["data"]["token"]}
+        body = {"question": "我现在适合换工作吗？"}
+
+        compact = self.assert_success_envelope(self.request("POST", "/api/system/consult?view=compact", headers=headers, json=body))["data"]
+        for key in ("modules", "trace", "effective_weights"):
+            self.assertNotIn(key, compact)
+        self.assertNotIn("world_model", compact["decision_kernel"])
+        self.assertIn("arbitration", compact["decision_kernel"])
+        self.assertIn("liuyao", compact["module_summaries"])
+        self.assertTrue(compact["account_history"]["saved"])
+
+        projected = self.assert_success_envelope(
+            self.request("POST", "/api/system/consult?fields=answer,intent.modules&trace=true", headers=headers, json=body)
+        )["data"]
+        self.assertEqual(set(projected), {"answer", "intent"})
+        self.assertEqual(set(projected["intent"]), {"modules"})
+
+    def test_consult_trace_is_built_on_demand_and_scoped_to_owner(self):
+        tokens = []
+        for email in ("trace@example.com", "other@example.com"):
+            resp = self.request("POST", "/api/auth/register", json={"email": email, "password": "password123", "display_name": "追溯"})
+            tokens.append(self.assert_success_envelope(resp)["data"]["token"])
+        headers = {"Authorization": "Bearer " + tokens[0]}
+
+        consult_resp = self.request("POST", "/api/system/consult", headers=headers, json={"question": "我现在适合换工作吗？"})
+        trace = self.assert_success_envelope(consult_resp)["data"]["trace"]
+        self.assertTrue(trace["deferred"])
+        self.assertNotIn("steps", trace)
+        self.assertIn("module_timings", trace)
+
+        trace_resp = self.request("GET", trace["url"], headers=headers)
+        built = self.assert_success_envelope(trace_resp)["data"]["trace"]
+        self.assertIn("flowchart TD", built["mermaid"])
+        self.assertEqual(built["steps"][-1]["id"], "answer")
+        self.assertEqual(self.request("GET", trace["url"], headers=headers).json()["data"]["trace"], built)
+
+        other_resp = self.request("GET", trace["url"], headers={"Authorization": "Bearer " + tokens[1]})
+        self.assertEqual(other_resp.status_code, 404)
+        self.assert_error_envelope(other_resp, "not_found")
+
+        inline_resp = self.request("POST", "/api/system/consult?trace=true", headers=headers, json={"question": "我现在适合换工作吗？"})
+        inline = self.assert_success_envelope(inline_resp)["data"]["trace"]
+        self.assertIn("flowchart TD", inline["mermaid"])
+        self.assertNotIn("url", inline)
+
     def test_auth_register_login_profile_and_history_flow(self):
         register_resp = self.request(
             "POST",
@@ -438,7 +879,7 @@ class TestApiValidation(unittest.TestCase):
 
     def test_ai_chat_upstream_empty_returns_502(self):
         with patch("main.llm_helper.is_available", return_value=True), patch(
-            "main.llm_helper.chat", return_value=None
+            "main.llm_helper.achat", return_value=None
         ):
             resp = self.request("POST", "/api/ai/chat?question=你好")
         self.assertEqual(resp.status_code, 502)
@@ -446,7 +887,7 @@ class TestApiValidation(unittest.TestCase):
 
     def test_ai_chat_success_returns_200(self):
         with patch("main.llm_helper.is_available", return_value=True), patch(
-            "main.llm_helper.chat", return_value="测试回复"
+            "main.llm_helper.achat", return_value="测试回复"
         ):
             resp = self.request("POST", "/api/ai/chat?question=你好")
         self.assertEqual(resp.status_code, 200)
@@ -455,7 +896,7 @@ class TestApiValidation(unittest.TestCase):
 
     def test_ai_chat_accepts_json_body(self):
         with patch("main.llm_helper.is_available", return_value=True), patch(
-            "main.llm_helper.chat", return_value="Body回复"
+            "main.llm_helper.achat", return_value="Body回复"
         ):
             resp = self.request(
                 "POST",
@@ -468,12 +909,92 @@ class TestApiValidation(unittest.TestCase):
         self.assertEqual(payload.get("data", {}).get("context"), "上下文")
         self.assertEqual(payload.get("data", {}).get("answer"), "Body回复")
 
+    def parse_sse_events(self, response: httpx.Response) -> list:
+        events = []
+        for block in response.text.strip().split("\n\n"):
+            fields = dict(line.split(": ", 1) for line in block.splitlines())
+            events.append((fields["event"], json.loads(fields["data"])))
+        return events
+
+    def test_ai_chat_stream_emits_deltas_and_done_envelope(self):
+        async def fake_stream(question, context=None):
+            for text in ("你", "好"):
+                yield text
+
+        with patch("main.llm_helper.is_available", return_value=True), patch(
+            "main.llm_helper.astream_chat", side_effect=fake_stream
+        ):
+            resp = self.request("POST", "/api/ai/chat/stream", json={"question": "流式提问"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.headers["content-type"].startswith("text/event-stream"))
+        events = self.parse_sse_events(resp)
+        self.assertEqual([name for name, _ in events], ["start", "delta", "delta", "done"])
+        done = events[-1][1]
+        self.assertTrue(done["success"])
+        self.assertEqual(done["data"]["answer"], "你好")
+        self.assertTrue(done["meta"]["request_id"])
+
+    def test_ai_chat_stream_unavailable_returns_503_before_streaming(self):
+        with patch("main.llm_helper.is_available", return_value=False):
+            resp = self.request("POST", "/api/ai/chat/stream?question=你好")
+        self.assertEqual(resp.status_code, 503)
+        self.assert_error_envelope(resp, "ai_unconfigured")
+
+    def test_ai_enhance_bazi_stream_sends_base_then_done(self):
+        async def fake_stream(bazi_data):
+            yield "AI八字"
+
+        with patch("main.llm_helper.is_available", return_value=True), patch(
+            "main.llm_helper.astream_enhance_bazi_analysis", side_effect=fake_stream
+        ):
+            resp = self.request(
+                "POST",
+                "/api/ai/enhance-bazi/stream",
+                json={"year": 1990, "month": 1, "day": 1, "hour": 12, "gender": "男"},
+            )
+        self.assertEqual(resp.status_code, 200)
+        events = self.parse_sse_events(resp)
+        self.assertEqual([name for name, _ in events], ["base", "delta", "done"])
+        self.assertIn("bazi", events[0][1])
+        done = events[-1][1]
+        self.assertTrue(done["ai_enhanced"])
+        self.assertEqual(done["data"]["ai_analysis"], "AI八字")
+
+    def test_ai_streams_end_with_error_when_upstream_fails_midway(self):
+        async def failing_chat(question, context=None):
+            yield "半截"
+            raise RuntimeError("upstream reset")
+
+        async def failing_bazi(bazi_data):
+            yield "AI八"
+            raise RuntimeError("upstream reset")
+
+        with patch("main.llm_helper.is_available", return_value=True), patch(
+            "main.llm_helper.astream_chat", side_effect=failing_chat
+        ), patch("main.llm_helper.astream_enhance_bazi_analysis", side_effect=failing_bazi):
+            chat = self.parse_sse_events(self.request("POST", "/api/ai/chat/stream", json={"question": "流式提问"}))
+            bazi = self.parse_sse_events(self.request(
+                "POST",
+                "/api/ai/enhance-bazi/stream",
+                json={"year": 1990, "month": 1, "day": 1, "hour": 12, "gender": "男"},
+            ))
+
+        self.assertEqual([name for name, _ in chat], ["start", "delta", "error"])
+        self.assertEqual([name for name, _ in bazi], ["base", "delta", "error"])
+        for _, payload in (chat[-1], bazi[-1]):
+            self.assertFalse(payload["success"])
+            self.assertEqual(payload["error"]["code"], "ai_upstream_error")
+            self.assertTrue(payload["error"]["retryable"])
+        self.assertEqual(main.AI_RUNTIME_STATE["last_error"], "enhancement_stream_interrupted")
+        main.AI_RUNTIME_STATE["last_error"] = None
+        main.AI_RUNTIME_STATE["last_error_at"] = None
+
     def test_ai_visual_insight_accepts_uploaded_image(self):
         with patch("main.llm_helper.is_available", return_value=True), patch(
-            "main.llm_helper.extract_visual_structure",
+            "main.llm_helper.aextract_visual_structure",
             return_value={"lighting": "balanced"},
         ), patch(
-            "main.llm_helper.analyze_visual_insight",
+            "main.llm_helper.aanalyze_visual_insight",
             return_value="视觉分析结果",
         ):
             resp = self.request(
@@ -503,6 +1024,7 @@ class TestApiValidation(unittest.TestCase):
         payload = self.assert_success_envelope(resp).get("data", {})
         self.assertEqual(payload.get("status"), "available")
         self.assertTrue(payload.get("available"))
+        self.assertIn("hit_rate", payload.get("cache", {}))
 
     def test_ai_status_unconfigured_enum(self):
         with patch("main.llm_helper.is_available", return_value=False):
@@ -548,7 +1070,7 @@ class TestApiValidation(unittest.TestCase):
 
     def test_ai_enhance_bazi_upstream_empty_has_warning(self):
         with patch("main.llm_helper.is_available", return_value=True), patch(
-            "main.llm_helper.enhance_bazi_analysis", return_value=None
+            "main.llm_helper.aenhance_bazi_analysis", return_value=None
         ):
             resp = self.request(
                 "POST",
@@ -571,7 +1093,7 @@ class TestApiValidation(unittest.TestCase):
 
     def test_ai_enhance_liuyao_success_sets_ai_enhanced(self):
         with patch("main.llm_helper.is_available", return_value=True), patch(
-            "main.llm_helper.enhance_liuyao_interpretation", return_value="AI解读"
+            "main.llm_helper.aenhance_liuyao_interpretation", return_value="AI解读"
         ):
             resp = self.request("POST", "/api/ai/enhance-liuyao?question=测试")
         self.assertEqual(resp.status_code, 200)
@@ -582,7 +1104,7 @@ class TestApiValidation(unittest.TestCase):
 
     def test_ai_enhance_liuyao_accepts_json_body(self):
         with patch("main.llm_helper.is_available", return_value=True), patch(
-            "main.llm_helper.enhance_liuyao_interpretation", return_value="AI解读"
+            "main.llm_helper.aenhance_liuyao_interpretation", return_value="AI解读"
         ):
             resp = self.request(
                 "POST",
@@ -596,7 +1118,7 @@ class TestApiValidation(unittest.TestCase):
 
     def test_ai_enhance_qimen_upstream_empty_has_warning(self):
         with patch("main.llm_helper.is_available", return_value=True), patch(
-            "main.llm_helper.enhance_qimen_interpretation", return_value=None
+            "main.llm_helper.aenhance_qimen_interpretation", return_value=None
         ):
             resp = self.request(
                 "POST",
@@ -610,7 +1132,7 @@ class TestApiValidation(unittest.TestCase):
 
     def test_ai_enhance_qimen_accepts_json_body(self):
         with patch("main.llm_helper.is_available", return_value=True), patch(
-            "main.llm_helper.enhance_qimen_interpretation", return_value="AI奇门解读"
+            "main.llm_helper.aenhance_qimen_interpretation", return_value="AI奇门解读"
         ):
             resp = self.request(
                 "POST",
@@ -637,6 +1159,25 @@ class TestApiValidation(unittest.TestCase):
         self.assertFalse(payload.get("ai_enabled"))
         self.assertIn("date", payload.get("data", {}))
 
+    def test_dumps_json_matches_stdlib_fallback(self):
+        payload = {"data": {1: "甲子", "items": ("a", "b"), "tags": {"x"}, "big": 2 ** 70}, "model": BaZiRequest(year=1990, month=1, day=1, hour=1)}
+        fast = json.loads(dumps_json(payload))
+        with patch("api.common.orjson", None):
+            fallback = json.loads(dumps_json(payload))
+        self.assertEqual(fast, fallback)
+        self.assertEqual(fast["data"]["1"], "甲子")
+        self.assertEqual(fast["data"]["big"], 2 ** 70)
+        self.assertEqual(fast["model"]["gender"], "男")
+
+    def test_dumps_json_encodes_non_finite_floats_as_null_on_every_path(self):
+        payload = {"score": float("nan"), "items": [float("inf"), -float("inf"), 1.5]}
+        expected = {"score": None, "items": [None, None, 1.5]}
+        self.assertEqual(json.loads(dumps_json(payload)), expected)
+        # 超长整数让 orjson 抛 TypeError，走标准库回退
+        self.assertEqual(json.loads(dumps_json({**payload, "big": 2 ** 70})), {**expected, "big": 2 ** 70})
+        with patch("api.common.orjson", None):
+            self.assertEqual(json.loads(dumps_json(payload)), expected)
+
     def test_main_exports_runtime_state_and_app_after_router_split(self):
         self.assertTrue(hasattr(main, "app"))
         self.assertTrue(hasattr(main, "llm_helper"))
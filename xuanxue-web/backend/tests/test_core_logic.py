@@ -1,14 +1,31 @@
 import sys
+import asyncio
+import tempfile
 import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
 
 sys.path.append('/home/alfred/multiproject/xuanxue/xuanxue-web/backend')
 
 from core.bazi_core import BaZiChart
 from core.liuyao import divine
-from core.qimen import QiMenChart
-from core.zeri import DateSelection
+from core.qimen import QIMEN_LAYOUTS, QiMenChart
+from core.almanac_index import ACTIVITY_INDEX, search_auspicious_days
+from core.almanac_table import AlmanacTable, build_almanac_table, get_almanac_table, reset_almanac_table, validate_almanac_table
+from core.zeri import DateSelection, _purpose_jianxing_flags, almanac_day, find_auspicious_days, scan_almanac
+from core.zeshi import SHICHEN_HOURS, search_auspicious_hours
+from core.ziwei import ZiWeiChart
 from core.ganzhi import get_month_ganzhi, get_hour_ganzhi
 from core.calendar import solar_to_lunar, lunar_to_solar, get_solar_term_date
+from core.calendar import _compute_solar_term_date, find_solar_term_interval, get_prev_next_jie
+from core.calendar import solar_to_lunar_batch
+from core.chart_cache import ChartCache
+from core.charts import build_ziwei_result
+from core.llm_cache import LLMCache
+from core.llm_helper import LLMHelper
+from core.llm_helper import llm_helper
+from datetime import date, datetime, timedelta
 
 
 class TestCoreLogic(unittest.TestCase):
@@ -70,11 +87,135 @@ class TestCoreLogic(unittest.TestCase):
         # 大凶应至少按 -2 计分，不应被“凶”分支提前吞掉
         self.assertLessEqual(analysis['吉凶分数'], -2)
 
+    def test_qimen_layout_table_covers_every_hour_and_isolates_charts(self):
+        for hour in range(24):
+            chart = QiMenChart(2026, 4, 10, hour)
+            layout = QIMEN_LAYOUTS[QiMenChart.layout_key(4, 10, hour)]
+            self.assertEqual(layout, QiMenChart.arrange_layout(*QiMenChart.layout_key(4, 10, hour)))
+            self.assertEqual([palace['八门'] for palace in chart.chart.values()], [item[4] for item in layout])
+
+        first = QiMenChart(2026, 4, 10, 9)
+        second = QiMenChart(2026, 4, 10, 9)
+        first.chart['坎宫']['门吉凶']['type'] = '大凶'
+        self.assertNotEqual(second.chart['坎宫']['门吉凶']['type'], '大凶')
+        self.assertEqual(QiMenChart.GATE_FORTUNE[second.chart['坎宫']['八门']], second.chart['坎宫']['门吉凶'])
+
     def test_zeri_shier_shen_changes_by_day(self):
         a = DateSelection(2026, 2, 28).get_shier_shen()
         b = DateSelection(2026, 3, 1).get_shier_shen()
         self.assertNotEqual(a, b)
 
+    def test_almanac_day_matches_analyze_day(self):
+        day = date(2025, 12, 20)
+        while day < date(2027, 3, 1):
+            record = almanac_day(day)
+            self.assertEqual(record.pop('weekday'), ['周一', '周二', '周三', '周四', '周五', '周六', '周日'][day.weekday()])
+            self.assertEqual(record, DateSelection(day.year, day.month, day.day).analyze_day())
+            day += timedelta(days=3)
+
+    def test_scan_almanac_top_k_matches_full_sort(self):
+        start, end = date(2026, 3, 15), date(2027, 9, 14)
+        total, top = scan_almanac(start, end, '结婚', limit=10)
+        full_total, full = scan_almanac(start, end, '结婚')
+        self.assertEqual(total, full_total)
+        self.assertEqual(top, full[:10])
+        self.assertTrue(all(item['score'] >= 60 or '嫁娶' in item['suitable'] for item in full))
+        self.assertEqual([item['date'] for item in find_auspicious_days(2026, 3, '结婚', 20)],
+                         [item['date'] for item in scan_almanac(date(2026, 3, 1), date(2026, 3, 20), '结婚')[1]])
+        with self.assertRaises(ValueError):
+            scan_almanac(end, start)
+
+    def test_scan_almanac_unknown_purposes_share_the_generic_cache_entry(self):
+        start, end = date(2026, 3, 1), date(2026, 5, 31)
+        generic = scan_almanac(start, end, '通用')
+        before = _purpose_jianxing_flags.cache_info().currsize
+        for index in range(20):
+            self.assertEqual(scan_almanac(start, end, f'未知用途{index}'), generic)
+        self.assertEqual(_purpose_jianxing_flags.cache_info().currsize, before)
+        self.assertLessEqual(_purpose_jianxing_flags.cache_info().maxsize, 10)
+
+    def test_almanac_index_matches_scan_and_intersects_purposes(self):
+        start, end = date(2026, 1, 1), date(2027, 6, 30)
+        for purpose in ('通用', '结婚', '签约', '出行'):
+            self.assertEqual(search_auspicious_days(start, end, [purpose], limit=20),
+                             scan_almanac(start, end, purpose, limit=20))
+
+        self.assertEqual(ACTIVITY_INDEX['婚姻'], ACTIVITY_INDEX['结婚'])
+        _, both = search_auspicious_days(start, end, ['签约', '出行'], limit=100)
+        signing = {item['date'] for item in scan_almanac(start, end, '签约')[1]}
+        travel = {item['date'] for item in scan_almanac(start, end, '出行')[1]}
+        self.assertTrue(both)
+        self.assertTrue({item['date'] for item in both} <= signing & travel)
+
+        top = both[0]['date']
+        year, rest = top.split('年')
+        month, day = rest.rstrip('日').split('月')
+        _, without = search_auspicious_days(start, end, ['签约', '出行'], exclude=[date(int(year), int(month), int(day))], limit=100)
+        self.assertNotIn(top, [item['date'] for item in without])
+        with self.assertRaises(ValueError):
+            search_auspicious_days(start, end, ['飞天'])
+
+    def test_zeshi_hour_search_matches_per_slot_charts(self):
+        start, end = date(2026, 6, 1), date(2026, 6, 20)
+        total, top = search_auspicious_hours(start, end, '出行', limit=500)
+        self.assertEqual(total, len(top))
+
+        expected = []
+        for offset in range(20):
+            day = start + timedelta(days=offset)
+            _, matched = scan_almanac(day, day, '出行')
+            if not matched:
+                continue
+            for hour in SHICHEN_HOURS:
+                chart = QiMenChart(day.year, day.month, day.day, hour)
+                prediction = chart.predict_matter('出行')
+                if '最佳宫位' not in prediction:
+                    continue
+                fortune = chart.analyze_palace(prediction['最佳宫位'])['吉凶分数']
+                score = round(matched[0]['score'] * 0.5 + (fortune + 4) * 12.5 * 0.5, 1)
+                expected.append((score, matched[0]['date'], hour, chart.find_best_direction()['最佳方位']))
+        expected.sort(key=lambda item: -item[0])
+        self.assertEqual(expected, [(slot['score'], slot['date'], slot['hour'], slot['direction']['宫位']) for slot in top])
+
+    def test_almanac_table_round_trips_live_results(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / 'almanac_table.bin'
+            report = build_almanac_table(path)
+            self.assertEqual(report['days'], 73414)
+            self.assertEqual(validate_almanac_table(path, step=89)['mismatches'], 0)
+
+            table = AlmanacTable(path)
+            try:
+                self.assertIsNone(table.row(date(1899, 12, 31)))
+                cached = DateSelection(2026, 10, 1, table=table)
+                live = DateSelection(2026, 10, 1, live=True)
+                self.assertIsNotNone(cached._row)
+                self.assertEqual(cached.analyze_day(), live.analyze_day())
+                self.assertEqual(cached.get_calc_trace(), live.get_calc_trace())
+            finally:
+                table.close()
+
+            path.write_bytes(path.read_bytes()[:100])
+            with self.assertRaises(ValueError):
+                AlmanacTable(path)
+
+    def test_almanac_table_missing_file_falls_back_to_live(self):
+        self.addCleanup(reset_almanac_table)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with patch.dict('os.environ', {'ALMANAC_TABLE_PATH': str(Path(temp_dir) / 'missing.bin')}):
+                reset_almanac_table()
+                self.assertIsNone(get_almanac_table())
+                selector = DateSelection(2026, 10, 1)
+                self.assertIsNone(selector._row)
+                self.assertEqual(selector.analyze_day()['date'], '2026年10月1日')
+
+                # 节流期内不重新打开；间隔到了之后能读到后来 build 的表
+                build_almanac_table(Path(temp_dir) / 'missing.bin')
+                self.assertIsNone(get_almanac_table())
+                with patch.dict('os.environ', {'ALMANAC_TABLE_RECHECK_SECONDS': '0'}):
+                    self.assertIsNotNone(get_almanac_table())
+                self.assertIsNotNone(DateSelection(2026, 10, 1)._row)
+
     def test_liuyao_use_time_is_deterministic_in_same_minute(self):
         r1 = divine('测试', use_time=True)
         r2 = divine('测试', use_time=True)
@@ -97,11 +238,235 @@ class TestCoreLogic(unittest.TestCase):
         solar = lunar_to_solar(2024, 1, 1, False)
         self.assertEqual(solar, (2024, 2, 10))
 
+    def test_calendar_leap_month_first_day(self):
+        # 2023 年闰二月：闰二月初一为 2023-03-22，三月初一为 2023-04-20
+        self.assertEqual(solar_to_lunar(2023, 3, 22), (2023, 2, 1, True))
+        self.assertEqual(solar_to_lunar(2023, 4, 20), (2023, 3, 1, False))
+        self.assertEqual(lunar_to_solar(2023, 2, 1, True), (2023, 3, 22))
+
+    def test_calendar_roundtrip_full_range(self):
+        current = date(1900, 1, 31)
+        while current <= date(2100, 12, 31):
+            lunar = solar_to_lunar(current.year, current.month, current.day)
+            self.assertEqual(lunar_to_solar(*lunar), (current.year, current.month, current.day))
+            current += timedelta(days=1)
+
+    def test_solar_to_lunar_batch_matches_single_conversion(self):
+        dates = [date(2024, 2, 10), (2090, 6, 1), datetime(1900, 1, 31, 12, 0)]
+        self.assertEqual(
+            solar_to_lunar_batch(dates),
+            [solar_to_lunar(2024, 2, 10), solar_to_lunar(2090, 6, 1), solar_to_lunar(1900, 1, 31)],
+        )
+        with self.assertRaises(ValueError):
+            solar_to_lunar_batch([(1900, 1, 30)])
+
     def test_solar_term_dates_use_year_specific_adjustments(self):
         self.assertEqual(get_solar_term_date(2026, 3).date().isoformat(), "2026-02-18")
         self.assertEqual(get_solar_term_date(2021, 23).date().isoformat(), "2021-12-21")
         self.assertEqual(get_solar_term_date(2024, 6).date().isoformat(), "2024-04-04")
 
+    def test_solar_term_table_matches_formula_for_full_range(self):
+        for year in range(1900, 2101):
+            for term_index in range(24):
+                self.assertEqual(
+                    get_solar_term_date(year, term_index),
+                    _compute_solar_term_date(year, term_index),
+                )
+
+    def test_find_solar_term_interval_bisects_term_boundaries(self):
+        lichun = get_solar_term_date(2026, 2)
+        interval = find_solar_term_interval(lichun)
+        self.assertEqual((interval.year, interval.term_index, interval.name), (2026, 2, '立春'))
+        self.assertEqual(interval.end, get_solar_term_date(2026, 3))
+
+        before = find_solar_term_interval(lichun - timedelta(minutes=1))
+        self.assertEqual(before.term_index, 1)
+
+        prev_jie, next_jie = get_prev_next_jie(datetime(2026, 2, 20, 12, 0))
+        self.assertEqual(prev_jie, get_solar_term_date(2026, 2))
+        self.assertEqual(next_jie, get_solar_term_date(2026, 4))
+
+        with self.assertRaises(ValueError):
+            find_solar_term_interval(datetime(1900, 1, 1))
+
+
+    def test_llm_helper_async_chat_joins_length_continuation(self):
+        def completion(content, finish_reason):
+            message = SimpleNamespace(content=content)
+            return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason=finish_reason)])
+
+        responses = [completion("前半段", "length"), completion("后半段", "stop")]
+        with patch.object(llm_helper, "is_available", return_value=True), patch.object(
+            llm_helper, "_acreate", new=AsyncMock(side_effect=responses)
+        ) as acreate:
+            answer = asyncio.run(llm_helper.achat("问题", "上下文"))
+
+        self.assertEqual(answer, "前半段\n后半段")
+        self.assertEqual(acreate.await_count, 2)
+        continuation_messages = acreate.await_args_list[1].args[0]["messages"]
+        self.assertEqual(continuation_messages[-2], {"role": "assistant", "content": "前半段"})
+
+
+    def test_llm_helper_stream_chat_continues_within_same_stream(self):
+        calls = []
+
+        async def fake_astream(request):
+            calls.append(request)
+            chunks = [("前半", None), ("段", "length")] if len(calls) == 1 else [("后半段", "stop")]
+            for chunk in chunks:
+                yield chunk
+
+        async def collect():
+            return [text async for text in llm_helper.astream_chat("问题")]
+
+        with patch.object(llm_helper, "is_available", return_value=True), patch.object(
+            llm_helper, "_astream", side_effect=fake_astream
+        ):
+            pieces = asyncio.run(collect())
+
+        self.assertEqual("".join(pieces), "前半段\n后半段")
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(calls[1]["messages"][-2], {"role": "assistant", "content": "前半段"})
+
+
+    def test_llm_helper_stream_raises_when_upstream_fails_midway(self):
+        async def failing_astream(request):
+            yield "前半", None
+            raise RuntimeError("upstream reset")
+
+        pieces = []
+
+        async def collect():
+            async for text in llm_helper.astream_enhance_bazi_analysis({
+                "bazi": {"year": "甲子", "month": "乙丑", "day": "丙寅", "hour": "丁卯"},
+                "wuxing_count": {},
+            }):
+                pieces.append(text)
+
+        with patch.object(llm_helper, "is_available", return_value=True), patch.object(
+            llm_helper, "_astream", side_effect=failing_astream
+        ), patch.object(llm_helper.cache, "aget", new=AsyncMock(return_value=None)), patch.object(
+            llm_helper.cache, "aset", new=AsyncMock()
+        ) as aset:
+            with self.assertRaises(RuntimeError):
+                asyncio.run(collect())
+
+        self.assertEqual(pieces, ["前半"])
+        aset.assert_not_awaited()
+
+    def test_llm_async_client_is_closed_per_event_loop(self):
+        class FakeAsyncClient:
+            def __init__(self, **kwargs):
+                self.closed = False
+
+            async def close(self):
+                self.closed = True
+
+        with patch.dict('os.environ', {'LLM_API_KEY': 'test-key'}):
+            helper = LLMHelper()
+
+        async def get_and_close():
+            client = helper.async_client
+            self.assertIs(helper.async_client, client)
+            await helper.aclose()
+            return client
+
+        async def get_without_close():
+            return helper.async_client
+
+        with patch('core.llm_helper.AsyncOpenAI', FakeAsyncClient):
+            first = asyncio.run(get_and_close())
+            second = asyncio.run(get_and_close())
+            self.assertEqual(helper._async_clients, {})
+            # 未关闭的客户端留在已关闭的循环上，下一次在新循环上取客户端时被清掉
+            leaked = asyncio.run(get_without_close())
+            self.assertEqual(len(helper._async_clients), 1)
+            third = asyncio.run(get_and_close())
+        self.assertEqual(len({id(first), id(second), id(leaked), id(third)}), 4)
+        self.assertTrue(first.closed and second.closed and third.closed)
+        self.assertFalse(leaked.closed)
+        self.assertEqual(helper._async_clients, {})
+
+    def test_llm_cache_lru_falls_back_to_disk_and_expires(self):
+        first = {"model": "m", "messages": [{"role": "user", "content": "甲"}], "temperature": 0.7}
+        second = {"model": "m", "messages": [{"role": "user", "content": "乙"}], "temperature": 0.7}
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = LLMCache(temp_dir, max_entries=1, enabled=True)
+            cache.set("bazi", first, "甲解读")
+            cache.set("bazi", second, "乙解读")
+            self.assertEqual(cache.get("bazi", second), "乙解读")
+            self.assertEqual(cache.get("bazi", first), "甲解读")
+            self.assertEqual(LLMCache(temp_dir, enabled=True).get("bazi", first), "甲解读")
+            self.assertIsNone(cache.get("bazi", dict(first, temperature=0.1)))
+            self.assertIsNone(cache.get("chat", first))
+
+            with patch("core.llm_cache.time.time", return_value=4102444800.0):
+                cache.clear_memory()
+                self.assertIsNone(cache.get("bazi", first))
+            stats = cache.stats()
+
+        self.assertEqual(stats["memory_hits"], 1)
+        self.assertEqual(stats["disk_hits"], 1)
+        self.assertEqual(stats["evictions"], 2)
+        self.assertEqual(stats["expired"], 1)
+        self.assertEqual(stats["misses"], 2)
+
+    def test_llm_helper_reuses_cached_enhancement(self):
+        message = SimpleNamespace(content="AI八字解读")
+        response = SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")])
+        bazi_data = BaZiChart(1990, 1, 1, 12, 0, '男').to_dict()
+
+        async def enhance_twice():
+            return [await llm_helper.aenhance_bazi_analysis(bazi_data) for _ in range(2)]
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with patch.object(llm_helper, "cache", LLMCache(temp_dir, enabled=True)), patch.object(
+                llm_helper, "is_available", return_value=True
+            ), patch.object(llm_helper, "_acreate", new=AsyncMock(return_value=response)) as acreate:
+                results = asyncio.run(enhance_twice())
+                stats = llm_helper.cache.stats()
+
+        self.assertEqual(results, ["AI八字解读", "AI八字解读"])
+        self.assertEqual(acreate.await_count, 1)
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["stores"], 1)
+
+    def test_chart_cache_returns_copies_and_expires_and_evicts(self):
+        cache = ChartCache(max_entries=2, ttl_seconds=60)
+        builds = []
+
+        def builder(value):
+            def build():
+                builds.append(value)
+                return {"pillars": {"day": value}}
+            return build
+
+        first = cache.get_or_build("bazi", (1990, 1, 1, 12, 0, "男"), builder("丙寅"))
+        first["pillars"]["day"] = "被改写"
+        again = cache.get_or_build("bazi", (1990, 1, 1, 12, 0, "男"), builder("丙寅"))
+        self.assertEqual(again, {"pillars": {"day": "丙寅"}})
+        self.assertEqual(builds, ["丙寅"])
+
+        cache.get_or_build("bazi", (1990, 1, 1, 12, 0, "女"), builder("女"))
+        cache.get_or_build("ziwei", (1990, 1, 1, 12, 0, "男"), builder("紫微"))
+        with patch("core.chart_cache.time.monotonic", return_value=10 ** 9):
+            cache.get_or_build("ziwei", (1990, 1, 1, 12, 0, "男"), builder("紫微"))
+        stats = cache.stats()
+
+        self.assertEqual(stats["entries"], 2)
+        self.assertEqual(stats["kinds"]["bazi"], {"hits": 1, "misses": 2, "evictions": 1, "expired": 0, "hit_rate": 0.3333})
+        self.assertEqual(stats["kinds"]["ziwei"]["expired"], 1)
+        self.assertEqual(builds, ["丙寅", "女", "紫微", "紫微"])
+
+    def test_build_ziwei_result_reuses_cached_chart(self):
+        with patch("core.charts.chart_cache", ChartCache(max_entries=4, ttl_seconds=60)), \
+                patch("core.charts.ZiWeiChart", wraps=ZiWeiChart) as chart_cls:
+            first = build_ziwei_result(1990, 1, 1, 12, 0, "男")
+            second = build_ziwei_result(1990, 1, 1, 12, 0, "男")
+        self.assertEqual(chart_cls.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertIsNot(first, second)
+
 
 if __name__ == '__main__':
     unittest.main()
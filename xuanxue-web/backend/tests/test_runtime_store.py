@@ -1,16 +1,30 @@
+import asyncio
 import json
 import sys
 import tempfile
+import threading
+import time
 import unittest
 from pathlib import Path
+from unittest.mock import patch
 
 sys.path.append('/home/alfred/multiproject/xuanxue/xuanxue-web/backend')
 
+from core.runtime.executor import ComputeExecutor, ComputeSaturatedError
+from core.runtime.metrics import HistogramFamily, PrometheusWriter, SpanRecorder
+from core.runtime.migrate import migrate_jsonl_to_sqlite
 from core.runtime.store import (
+    JsonlRuntimeStore,
+    RuntimeLockTimeout,
+    RuntimeStore,
+    SqliteRuntimeStore,
+    _iter_lines_reversed,
     append_jsonl,
     read_json_file,
     read_jsonl,
     read_recent_jsonl,
+    runtime_file_lock,
+    runtime_lock_stats,
     update_json_file,
     write_json_file,
 )
@@ -56,6 +70,39 @@ class TestRuntimeStore(unittest.TestCase):
 
         self.assertEqual(items, [{"id": 1}, {"id": 2}])
 
+    def test_read_recent_jsonl_reads_tail_across_block_boundaries(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "tail.jsonl"
+            for index in range(50):
+                append_jsonl(path, {"id": index, "text": "长文本" * (index % 7)})
+
+            with path.open("rb") as file:
+                lines = list(_iter_lines_reversed(file, block_size=7))
+            items = read_recent_jsonl(path, limit=3)
+
+        self.assertEqual([json.loads(line)["id"] for line in lines if line][:3], [49, 48, 47])
+        self.assertEqual(len([line for line in lines if line]), 50)
+        self.assertEqual([item["id"] for item in items], [47, 48, 49])
+
+    def test_jsonl_store_query_stops_at_limit_and_since(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with patch.dict("os.environ", {"CONSULT_HISTORY_PATH": temp_dir + "/consult_history.jsonl"}):
+                store = JsonlRuntimeStore()
+                for index in range(6):
+                    store.append("consult_history", {
+                        "history_id": f"h{index}",
+                        "user_id": "u1" if index % 2 == 0 else "u2",
+                        "created_at": f"2024-01-0{index + 1}",
+                    })
+
+                newest_u1 = store.query("consult_history", {"user_id": "u1"}, limit=2)
+                since = store.query("consult_history", since="2024-01-05")
+                oldest = store.query("consult_history", {"user_id": "u2"}, limit=1, newest_first=False)
+
+        self.assertEqual([item["history_id"] for item in newest_u1], ["h4", "h2"])
+        self.assertEqual([item["history_id"] for item in since], ["h5", "h4"])
+        self.assertEqual(oldest[0]["history_id"], "h1")
+
     def test_read_jsonl_returns_all_valid_entries(self):
         with tempfile.TemporaryDirectory() as temp_dir:
             path = Path(temp_dir) / "items.jsonl"
@@ -89,3 +136,213 @@ class TestRuntimeStore(unittest.TestCase):
 
         self.assertEqual(result, {"items": [{"id": 1}]})
         self.assertEqual(stored, result)
+
+    def test_shared_locks_coexist_and_exclusive_lock_times_out(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "users.json"
+            with runtime_file_lock(path, shared=True):
+                with runtime_file_lock(path, shared=True, timeout=0.05):
+                    pass
+                with self.assertRaises(RuntimeLockTimeout):
+                    with runtime_file_lock(path, timeout=0.05):
+                        pass
+            with runtime_file_lock(path, timeout=0.05):
+                with self.assertRaises(RuntimeLockTimeout):
+                    with runtime_file_lock(path, shared=True, timeout=0.05):
+                        pass
+
+            stats = runtime_lock_stats()[str(path) + ".lock"]
+
+        self.assertEqual(stats["contended"], 2)
+        self.assertEqual(stats["timeouts"], 2)
+        self.assertEqual(stats["wait_seconds"]["shared"]["count"], 3)
+        self.assertEqual(stats["wait_seconds"]["exclusive"]["count"], 2)
+        self.assertGreaterEqual(stats["wait_seconds"]["exclusive"]["max"], 0.05)
+
+    def test_exclusive_lock_waits_for_shared_reader_to_release(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "history.jsonl"
+            reader_holding = threading.Event()
+            release_reader = threading.Event()
+
+            def reader():
+                with runtime_file_lock(path, shared=True):
+                    reader_holding.set()
+                    release_reader.wait(5)
+
+            thread = threading.Thread(target=reader)
+            thread.start()
+            reader_holding.wait(5)
+            threading.Timer(0.05, release_reader.set).start()
+            with runtime_file_lock(path, timeout=5):
+                acquired_after_release = release_reader.is_set()
+            thread.join()
+
+        self.assertTrue(acquired_after_release)
+
+    def test_sqlite_store_appends_queries_by_index_and_updates_documents(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = SqliteRuntimeStore(Path(temp_dir) / "runtime.sqlite3")
+            for index in range(5):
+                store.append("consult_history", {
+                    "history_id": f"h{index}",
+                    "user_id": "u1" if index % 2 == 0 else "u2",
+                    "created_at": f"2024-01-0{index + 1}T00:00:00+00:00",
+                })
+
+            recent = store.recent("consult_history", limit=2)
+            newest_u1 = store.query("consult_history", {"user_id": "u1"}, limit=2)
+            since = store.query("consult_history", since="2024-01-04", newest_first=False)
+            detail = store.query("consult_history", {"user_id": "u2", "history_id": "h3"}, limit=1)
+
+            self.assertIsNone(store.document_generation("users")[1])
+            store.write_document("users", {"users": []})
+            store.update_document("users", {"users": []}, lambda payload: payload["users"].append({"id": "u1"}))
+            users = store.read_document("users", {})
+            generation = store.document_generation("users")
+            journal_mode = store._connection().execute("PRAGMA journal_mode").fetchone()[0]
+
+        self.assertEqual([item["history_id"] for item in recent], ["h3", "h4"])
+        self.assertEqual([item["history_id"] for item in newest_u1], ["h4", "h2"])
+        self.assertEqual([item["history_id"] for item in since], ["h3", "h4"])
+        self.assertEqual(detail[0]["history_id"], "h3")
+        self.assertEqual(users, {"users": [{"id": "u1"}]})
+        self.assertEqual(generation, (str(Path(temp_dir) / "runtime.sqlite3"), 2))
+        self.assertEqual(journal_mode, "wal")
+
+    def test_runtime_store_backend_missing_methods_fails_on_construction(self):
+        class PartialStore(RuntimeStore):
+            def append(self, collection, record):
+                pass
+
+        with self.assertRaises(TypeError):
+            PartialStore()
+
+    def test_migrate_jsonl_to_sqlite_imports_once_unless_forced(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            env = {
+                "DECISION_LOG_PATH": temp_dir + "/decision_logs.jsonl",
+                "WEIGHT_TUNING_PATH": temp_dir + "/weight_tuning.jsonl",
+                "CONSULT_HISTORY_PATH": temp_dir + "/consult_history.jsonl",
+                "CONSULT_TRACE_PATH": temp_dir + "/consult_traces.jsonl",
+                "USER_STORE_PATH": temp_dir + "/users.json",
+                "SESSION_STORE_PATH": temp_dir + "/sessions.json",
+            }
+            with patch.dict("os.environ", env):
+                append_jsonl(Path(env["DECISION_LOG_PATH"]), {"log_id": "l1", "logged_at": "2024-01-01", "snapshot": {}})
+                append_jsonl(Path(env["DECISION_LOG_PATH"]), {"feedback_id": "f1", "logged_at": "2024-01-02", "feedback": {}})
+                append_jsonl(Path(env["CONSULT_HISTORY_PATH"]), {"history_id": "h1", "user_id": "u1", "created_at": "2024-01-03"})
+                write_json_file(Path(env["USER_STORE_PATH"]), {"users": [{"id": "u1"}]})
+
+                target = SqliteRuntimeStore(Path(temp_dir) / "runtime.sqlite3")
+                first = migrate_jsonl_to_sqlite(target, JsonlRuntimeStore())
+                second = migrate_jsonl_to_sqlite(target, JsonlRuntimeStore())
+                forced = migrate_jsonl_to_sqlite(target, JsonlRuntimeStore(), force=True)
+
+                logs = target.recent("decision_logs", limit=10)
+                history = target.query("consult_history", {"user_id": "u1"})
+                users = target.read_document("users", {})
+
+        self.assertEqual(first["collections"]["decision_logs"], {"status": "imported", "imported": 2, "source": env["DECISION_LOG_PATH"]})
+        self.assertEqual(first["documents"]["users"]["status"], "imported")
+        self.assertEqual(first["documents"]["sessions"]["status"], "missing")
+        self.assertEqual(second["collections"]["decision_logs"]["status"], "skipped")
+        self.assertEqual(second["documents"]["users"]["status"], "skipped")
+        self.assertEqual(forced["collections"]["decision_logs"]["imported"], 2)
+        self.assertEqual([item.get("log_id") or item.get("feedback_id") for item in logs], ["l1", "f1"])
+        self.assertEqual(history[0]["history_id"], "h1")
+        self.assertEqual(users, {"users": [{"id": "u1"}]})
+
+    def test_compute_executor_runs_off_loop_and_records_metrics(self):
+        executor = ComputeExecutor(kind="thread", workers=2, max_queue=2)
+
+        async def _run():
+            return await asyncio.gather(*(executor.run(pow, value, 2) for value in range(4)))
+
+        try:
+            results = asyncio.run(_run())
+            stats = executor.stats()
+        finally:
+            executor.shutdown()
+
+        self.assertEqual(results, [0, 1, 4, 9])
+        self.assertEqual(stats["completed"], 4)
+        self.assertEqual(stats["pending"], 0)
+        self.assertEqual(stats["wait_seconds"]["count"], 4)
+        self.assertEqual(stats["run_seconds"]["buckets"][-1]["count"], 4)
+
+    def test_compute_executor_rejects_when_saturated(self):
+        executor = ComputeExecutor(kind="thread", workers=1, max_queue=0)
+        release = threading.Event()
+
+        async def _run():
+            blocked = asyncio.ensure_future(executor.run(release.wait, 5))
+            await asyncio.sleep(0)
+            try:
+                with self.assertRaises(ComputeSaturatedError) as ctx:
+                    await executor.run(pow, 2, 2)
+            finally:
+                release.set()
+                await blocked
+            return ctx.exception
+
+        try:
+            error = asyncio.run(_run())
+            stats = executor.stats()
+        finally:
+            executor.shutdown()
+
+        self.assertGreaterEqual(error.retry_after, 1)
+        self.assertEqual(error.capacity, 1)
+        self.assertEqual(stats["rejected"], 1)
+        self.assertEqual(stats["completed"], 1)
+
+    def test_span_recorder_accumulates_and_prometheus_writer_renders_histograms(self):
+        spans = SpanRecorder()
+        with spans.span("load"):
+            pass
+        spans.add("load", 0.5)
+        timings = spans.to_dict()
+        self.assertGreaterEqual(timings["stages"]["load"], 0.5)
+        self.assertGreaterEqual(timings["total_seconds"], 0.0)
+
+        family = HistogramFamily("demo_seconds", "Demo latency.", ("stage",), buckets=(0.1, 1.0))
+        family.labels("load").observe(0.5)
+        writer = PrometheusWriter()
+        writer.family(family)
+        writer.sample("demo_total", "counter", "Demo counter.", 3, {"path": 'a"b'})
+        lines = writer.render().splitlines()
+
+        self.assertEqual(lines.count("# TYPE demo_seconds histogram"), 1)
+        self.assertIn('demo_seconds_bucket{stage="load",le="0.1"} 0', lines)
+        self.assertIn('demo_seconds_bucket{stage="load",le="1.0"} 1', lines)
+        self.assertIn('demo_seconds_bucket{stage="load",le="+Inf"} 1', lines)
+        self.assertIn('demo_seconds_count{stage="load"} 1', lines)
+        self.assertIn('demo_total{path="a\\"b"} 3', lines)
+
+    def test_prometheus_writer_keeps_each_family_contiguous(self):
+        writer = PrometheusWriter()
+        for executor in ("compute", "password"):
+            writer.sample("demo_pending", "gauge", "Demo gauge.", 1, {"executor": executor})
+            writer.sample("demo_completed_total", "counter", "Demo counter.", 2, {"executor": executor})
+        lines = writer.render().splitlines()
+
+        self.assertEqual(lines, [
+            "# HELP demo_pending Demo gauge.",
+            "# TYPE demo_pending gauge",
+            'demo_pending{executor="compute"} 1',
+            'demo_pending{executor="password"} 1',
+            "# HELP demo_completed_total Demo counter.",
+            "# TYPE demo_completed_total counter",
+            'demo_completed_total{executor="compute"} 2',
+            'demo_completed_total{executor="password"} 2',
+        ])
+
+    def test_span_recorder_excludes_nested_stage_time_from_parent(self):
+        spans = SpanRecorder()
+        with spans.span("outer"):
+            with spans.span("inner"):
+                time.sleep(0.02)
+        stages = spans.to_dict()["stages"]
+        self.assertGreaterEqual(stages["inner"], 0.02)
+        self.assertLess(stages["outer"], 0.02)
@@ -2,11 +2,14 @@ import sys
 import unittest
 import tempfile
 import json
+import time
 import core.system_engine as legacy_system_engine
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import patch
 
 sys.path.append('/home/alfred/multiproject/xuanxue/xuanxue-web/backend')
 
+from core.consult.fanout import ModuleTask, run_module_graph
 from core.system_engine import UnifiedConsultRequest, consultation_engine
 from core.decision_log import append_feedback_log, read_recent_decision_logs
 from core.weight_tuning import DEFAULT_WEIGHT_PRESETS, record_weight_tuning, resolve_effective_weight_presets
@@ -134,6 +137,77 @@ class TestSystemEngine(unittest.TestCase):
         self.assertIn("fengshui", result["module_summaries"])
         self.assertTrue(any(step["id"] == "fengshui_judge" for step in result["trace"]["steps"]))
 
+    def test_consultation_engine_degrades_slow_or_failing_modules(self):
+        payload = UnifiedConsultRequest(
+            question="我现在适合换工作吗？应该怎么做更稳？",
+            year=1990,
+            month=1,
+            day=1,
+            hour=12,
+            minute=0,
+            gender="男",
+        )
+
+        def slow_ziwei(*args):
+            time.sleep(0.5)
+            return {}, {}
+
+        with patch.dict("os.environ", {"CONSULT_MODULE_TIMEOUT_ZIWEI": "0.05"}), \
+                patch("core.consult.engine.run_ziwei_module", slow_ziwei), \
+                patch("core.consult.engine.run_liuyao_module", side_effect=RuntimeError("boom")), \
+                patch("core.system_engine.llm_helper.is_available", return_value=False):
+            result = consultation_engine.consult(payload)
+
+        timings = result["trace"]["module_timings"]
+        self.assertEqual(timings["ziwei"]["status"], "timeout")
+        self.assertEqual(timings["liuyao"]["status"], "error")
+        self.assertEqual(timings["bazi"]["status"], "ok")
+        self.assertIn("run_seconds", timings["qimen"])
+        self.assertNotIn("ziwei", result["module_summaries"])
+        self.assertNotIn("liuyao", result["modules"])
+        self.assertEqual(list(result["modules"]), ["bazi", "qimen"])
+        self.assertTrue(result["answer"])
+
+    def test_module_graph_runs_dependents_after_their_inputs(self):
+        order = []
+
+        def record(name):
+            order.append(name)
+            return name
+
+        def fail():
+            raise ValueError("bad input")
+
+        results, timings = run_module_graph({
+            "base": ModuleTask("base", record, ("base",)),
+            "derived": ModuleTask("derived", record, ("derived",), depends_on=("base",)),
+            "broken": ModuleTask("broken", fail),
+            "blocked": ModuleTask("blocked", record, ("blocked",), depends_on=("broken",)),
+        })
+
+        self.assertEqual(results, {"base": "base", "derived": "derived"})
+        self.assertLess(order.index("base"), order.index("derived"))
+        self.assertEqual(timings["broken"]["status"], "error")
+        self.assertEqual(timings["blocked"], {"status": "skipped", "seconds": 0.0, "blocked_by": ["broken"]})
+
+    def test_module_timeout_counts_from_start_not_submission(self):
+        pool = ThreadPoolExecutor(max_workers=1)
+        try:
+            with patch.dict("os.environ", {"CONSULT_MODULE_TIMEOUT_SECONDS": "0.4", "CONSULT_MODULE_TIMEOUT_HUNG": "0.1"}):
+                results, timings = run_module_graph({
+                    "hung": ModuleTask("hung", time.sleep, (0.3,)),
+                    "queued": ModuleTask("queued", time.sleep, (0.3,)),
+                }, executor=pool)
+        finally:
+            pool.shutdown()
+
+        # hung 超时后被放弃但仍占着唯一的 worker；queued 等它返回才开始，排队时间不计入超时
+        self.assertEqual(timings["hung"]["status"], "timeout")
+        self.assertNotIn("queued", timings["hung"])
+        self.assertEqual(timings["queued"]["status"], "ok")
+        self.assertGreaterEqual(timings["queued"]["seconds"], 0.55)
+        self.assertEqual(set(results), {"queued"})
+
     def test_consultation_engine_writes_decision_log_snapshot(self):
         payload = UnifiedConsultRequest(question="今天适合开业吗？")
 
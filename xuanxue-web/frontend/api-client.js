@@ -25,8 +25,7 @@
         return url.toString();
     }
 
-    async function request(path, options) {
-        var opts = options || {};
+    function buildInit(opts) {
         var method = opts.method || 'GET';
         var headers = Object.assign({}, opts.headers || {});
         var body = opts.body;
@@ -47,11 +46,30 @@
             headers.Authorization = 'Bearer ' + token;
         }
 
-        var response = await fetch(buildUrl(path, opts.query), {
+        return {
             method: method,
             headers: headers,
             body: body
-        });
+        };
+    }
+
+    function buildError(status, payload) {
+        var structured = payload && payload.error ? payload.error : null;
+        var detail = structured
+            ? (structured.message || structured.detail)
+            : (payload && (payload.detail || payload.message));
+        var err = new Error(detail || ('API请求失败 (' + status + ')'));
+        err.status = status;
+        err.payload = payload;
+        if (structured && structured.code) {
+            err.code = structured.code;
+        }
+        return err;
+    }
+
+    async function request(path, options) {
+        var opts = options || {};
+        var response = await fetch(buildUrl(path, opts.query), buildInit(opts));
 
         var payload = null;
         try {
@@ -61,24 +79,82 @@
         }
 
         if (!response.ok) {
-            var structured = payload && payload.error ? payload.error : null;
-            var detail = structured
-                ? (structured.message || structured.detail)
-                : (payload && (payload.detail || payload.message));
-            var err = new Error(detail || ('API请求失败 (' + response.status + ')'));
-            err.status = response.status;
-            err.payload = payload;
-            if (structured && structured.code) {
-                err.code = structured.code;
-            }
-            throw err;
+            throw buildError(response.status, payload);
         }
 
         return payload;
     }
 
+    // SSE 流式请求：逐个事件回调 onEvent(name, data)，返回 done 事件里的完整响应外壳
+    async function stream(path, options, onEvent) {
+        var opts = options || {};
+        var init = buildInit(opts);
+        init.headers.Accept = 'text/event-stream';
+        var response = await fetch(buildUrl(path, opts.query), init);
+
+        if (!response.ok) {
+            var payload = null;
+            try {
+                payload = await response.json();
+            } catch (_err) {
+                payload = null;
+            }
+            throw buildError(response.status, payload);
+        }
+
+        var reader = response.body.getReader();
+        var decoder = new TextDecoder('utf-8');
+        var buffer = '';
+        var finalPayload = null;
+
+        function dispatch(block) {
+            var eventName = 'message';
+            var dataLines = [];
+            block.split('\n').forEach(function (line) {
+                if (line.indexOf('event: ') === 0) {
+                    eventName = line.slice(7);
+                } else if (line.indexOf('data: ') === 0) {
+                    dataLines.push(line.slice(6));
+                }
+            });
+            if (!dataLines.length) {
+                return;
+            }
+            var data = JSON.parse(dataLines.join('\n'));
+            if (eventName === 'error') {
+                throw buildError(response.status, data);
+            }
+            if (eventName === 'done') {
+                finalPayload = data;
+            }
+            if (onEvent) {
+                onEvent(eventName, data);
+            }
+        }
+
+        while (true) {
+            var chunk = await reader.read();
+            if (chunk.done) {
+                break;
+            }
+            buffer += decoder.decode(chunk.value, { stream: true });
+            var boundary = buffer.indexOf('\n\n');
+            while (boundary !== -1) {
+                dispatch(buffer.slice(0, boundary));
+                buffer = buffer.slice(boundary + 2);
+                boundary = buffer.indexOf('\n\n');
+            }
+        }
+        if (buffer.trim()) {
+            dispatch(buffer);
+        }
+
+        return finalPayload;
+    }
+
     window.apiClient = {
         request: request,
+        stream: stream,
         get: function (path, query) {
             return request(path, { method: 'GET', query: query });
         },
@@ -1000,6 +1000,36 @@
         }
     }
 
+    function renderTrace(trace, elements) {
+        if (elements.consultTraceSummary) {
+            elements.consultTraceSummary.innerHTML = buildTraceSummary(trace);
+        }
+        if (window.tracePanel && elements.consultTraceDiagram && elements.consultTraceSteps) {
+            window.tracePanel.renderDiagram(trace, elements.consultTraceDiagram);
+            window.tracePanel.renderSteps(trace, elements.consultTraceSteps);
+        }
+    }
+
+    // 统一问事默认不内联追溯图，打开“计算流程”时再按 trace.url 拉取并回写会话缓存
+    async function loadDeferredTrace(data, elements) {
+        var trace = data && data.trace;
+        if (!trace || !trace.deferred || !trace.url || trace.mermaid || !window.apiClient) {
+            return;
+        }
+        try {
+            var response = await window.apiClient.get(trace.url);
+            var built = response && response.data && response.data.trace;
+            if (!built || !built.mermaid) {
+                return;
+            }
+            data.trace = Object.assign({}, built, { module_timings: trace.module_timings });
+            window.sessionStorage.setItem(CONSULT_RESULT_STORAGE_KEY, JSON.stringify(data));
+            renderTrace(data.trace, elements);
+        } catch (_error) {
+            // 拉取失败时保留前端合成的流程图
+        }
+    }
+
     function renderConsultation(data, elements) {
         var payload = data || {};
         var summaries = payload.module_summaries || {};
@@ -1021,10 +1051,6 @@
             .concat([payload.ai && payload.ai.synthesized ? '<span class="result-chip">AI 已综合</span>' : '<span class="result-chip">基础综合</span>'])
             .filter(Boolean)
             .join('');
-        if (elements.consultTraceSummary) {
-            elements.consultTraceSummary.innerHTML = buildTraceSummary(trace);
-        }
-
         var summaryKeys = Object.keys(summaries);
         elements.consultModuleGrid.innerHTML = summaryKeys.length
             ? summaryKeys.map(function (moduleName) {
@@ -1045,10 +1071,7 @@
         if (window.decisionPanel && elements.consultDecisionGrid) {
             window.decisionPanel.render(payload, elements.consultDecisionGrid);
         }
-        if (window.tracePanel && elements.consultTraceDiagram && elements.consultTraceSteps) {
-            window.tracePanel.renderDiagram(trace, elements.consultTraceDiagram);
-            window.tracePanel.renderSteps(trace, elements.consultTraceSteps);
-        }
+        renderTrace(trace, elements);
         if (elements.consultResult && elements.consultResult.classList) {
             elements.consultResult.classList.add('show');
         }
@@ -1161,7 +1184,11 @@
         if (tabsRoot && panelsRoot) {
             Array.prototype.forEach.call(tabsRoot.querySelectorAll('[data-result-tab]'), function (button) {
                 button.addEventListener('click', function () {
-                    activateResultTab(button.getAttribute('data-result-tab'), tabsRoot, panelsRoot);
+                    var tabId = button.getAttribute('data-result-tab');
+                    activateResultTab(tabId, tabsRoot, panelsRoot);
+                    if (tabId === 'trace') {
+                        loadDeferredTrace(data, elements);
+                    }
                 });
             });
             activateResultTab('summary', tabsRoot, panelsRoot);